@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+bitparallel.py
+
+Pure python edit distances, computed bit-parallel, for when
+python-Levenshtein is not available.
+
+The pattern string is encoded as one bit mask per character, and the other
+string is scanned one character at a time, updating a bit vector with a few
+integer operations (Myers 1999, Hyyro 2004). Python ints are arbitrary
+precision, so there is no pattern length limit. With numpy, lcs_lengths
+scores one pattern against many strings at once.
+
+ratio() matches python-Levenshtein: 2 * lcs / (len1 + len2), the indel
+(insertions and deletions) similarity. Matching blocks and opcodes still
+come from difflib.
+"""
+from __future__ import division
+
+import difflib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#: bit count of every byte, for numpy popcounts
+_BYTE_BITS = None
+
+
+def pattern_masks(pattern):
+    """Return {character: bit mask of its positions in pattern}."""
+    masks = {}
+    bit = 1
+    for char in pattern:
+        masks[char] = masks.get(char, 0) | bit
+        bit <<= 1
+    return masks
+
+
+def _lcs_length(masks, length, text):
+    """Longest common subsequence length of a pattern and text."""
+    if not length or not text:
+        return 0
+    full = (1 << length) - 1
+    vector = full
+    get = masks.get
+    for char in text:
+        matches = vector & get(char, 0)
+        vector = ((vector + matches) | (vector - matches)) & full
+    return length - bin(vector).count('1')
+
+
+def _levenshtein(masks, length, text):
+    """Levenshtein distance of a pattern and text."""
+    if not length:
+        return len(text)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    positive, negative = full, 0
+    score = length
+    get = masks.get
+    for char in text:
+        equal = get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        h_positive = negative | ~(horizontal | positive)
+        h_negative = positive & horizontal
+        if h_positive & last:
+            score += 1
+        elif h_negative & last:
+            score -= 1
+        h_positive = (h_positive << 1) | 1
+        h_negative <<= 1
+        positive = (h_negative | ~(vertical | h_positive)) & full
+        negative = h_positive & vertical & full
+    return score
+
+
+def lcs_length(s1, s2):
+    """Longest common subsequence length."""
+    return _lcs_length(pattern_masks(s2), len(s2), s1)
+
+
+def indel_distance(s1, s2):
+    """Edit distance with insertions and deletions only."""
+    return len(s1) + len(s2) - 2 * lcs_length(s1, s2)
+
+
+def distance(s1, s2):
+    """Levenshtein distance, insertions, deletions and substitutions."""
+    if len(s1) > len(s2):
+        s1, s2 = s2, s1
+    return _levenshtein(pattern_masks(s2), len(s2), s1)
+
+
+def ratio(s1, s2):
+    """Indel similarity between 0 and 1, as python-Levenshtein ratio."""
+    lensum = len(s1) + len(s2)
+    if not lensum:
+        return 1.0
+    return 2.0 * lcs_length(s1, s2) / lensum
+
+
+class EncodedTexts(object):
+    """Texts encoded once, to score them against many patterns.
+
+    With numpy, the texts are a matrix of character codes, one column per
+    text, padded with 0.
+    """
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.lengths = [len(text) for text in self.texts]
+        self.alphabet = {}
+        self.codes = None
+        if numpy is None or not self.texts:
+            return
+        self.codes = numpy.zeros((max(self.lengths), len(self.texts)),
+                                 dtype=numpy.int32)
+        alphabet = self.alphabet
+        for column, text in enumerate(self.texts):
+            self.codes[:len(text), column] = [
+                alphabet.setdefault(char, len(alphabet) + 1) for char in text]
+
+    def __len__(self):
+        return len(self.texts)
+
+
+def lcs_lengths(pattern, texts):
+    """
+    Longest common subsequence length of a pattern and many texts.
+
+    Uses numpy uint64 vectors for patterns up to 64 characters, all the
+    texts are scanned together. Falls back to one text at a time.
+    texts can be a list, or EncodedTexts to reuse for many patterns.
+    """
+    global _BYTE_BITS
+    if not isinstance(texts, EncodedTexts):
+        texts = EncodedTexts(texts)
+    length = len(pattern)
+    masks = pattern_masks(pattern)
+    if texts.codes is None or length > 64:
+        return [_lcs_length(masks, length, text) for text in texts.texts]
+    if not length:
+        return numpy.zeros(len(texts), dtype=numpy.int64)
+    if _BYTE_BITS is None:
+        _BYTE_BITS = numpy.array([bin(i).count('1') for i in range(256)],
+                                 dtype=numpy.int64)
+    # Pattern mask per character code, code 0 is the padding, its 0 mask
+    # leaves the vectors unchanged.
+    code_masks = numpy.zeros(len(texts.alphabet) + 1, dtype=numpy.uint64)
+    for char, mask in masks.items():
+        code = texts.alphabet.get(char)
+        if code is not None:
+            code_masks[code] = mask
+    full = numpy.uint64((1 << length) - 1)
+    vectors = numpy.full(len(texts), full, dtype=numpy.uint64)
+    for row in code_masks[texts.codes]:
+        matches = vectors & row
+        vectors = ((vectors + matches) | (vectors - matches)) & full
+    ones = _BYTE_BITS[vectors.view(numpy.uint8)].reshape(-1, 8).sum(axis=1)
+    return length - ones
+
+
+def ratios(pattern, texts):
+    """ratio() of a pattern and many texts, see lcs_lengths."""
+    if not isinstance(texts, EncodedTexts):
+        texts = EncodedTexts(texts)
+    lcs = lcs_lengths(pattern, texts)
+    return [2.0 * common / (len(pattern) + length)
+            if len(pattern) + length else 1.0
+            for common, length in zip(lcs, texts.lengths)]
+
+
+class BitParallelMatcher(object):
+    """A SequenceMatcher-like class, with bit-parallel ratio and distance.
+
+    The bit masks are built for seq2, so set_seq2 once and set_seq1 many
+    times to compare many strings against the same one.
+    """
+
+    def _reset_cache(self):
+        self._ratio = self._distance = None
+        self._difflib = None
+
+    def __init__(self, isjunk=None, seq1='', seq2=''):
+        if isjunk:
+            raise NotImplementedError('isjunk is not supported')
+        self._str1 = seq1
+        self.set_seq2(seq2)
+
+    def set_seqs(self, seq1, seq2):
+        self._str1 = seq1
+        self.set_seq2(seq2)
+
+    def set_seq1(self, seq1):
+        self._str1 = seq1
+        self._reset_cache()
+
+    def set_seq2(self, seq2):
+        self._str2 = seq2
+        self._masks = pattern_masks(seq2)
+        self._reset_cache()
+
+    def _sequence_matcher(self):
+        if self._difflib is None:
+            self._difflib = difflib.SequenceMatcher(None, self._str1,
+                                                    self._str2)
+        return self._difflib
+
+    def get_opcodes(self):
+        return self._sequence_matcher().get_opcodes()
+
+    def get_matching_blocks(self):
+        return self._sequence_matcher().get_matching_blocks()
+
+    def ratio(self):
+        if self._ratio is None:
+            lensum = len(self._str1) + len(self._str2)
+            if lensum:
+                common = _lcs_length(self._masks, len(self._str2),
+                                     self._str1)
+                self._ratio = 2.0 * common / lensum
+            else:
+                self._ratio = 1.0
+        return self._ratio
+
+    quick_ratio = ratio
+
+    def real_quick_ratio(self):
+        len1, len2 = len(self._str1), len(self._str2)
+        if not len1 + len2:
+            return 1.0
+        return 2.0 * min(len1, len2) / (len1 + len2)
+
+    def distance(self):
+        if self._distance is None:
+            self._distance = _levenshtein(self._masks, len(self._str2),
+                                          self._str1)
+        return self._distance
+
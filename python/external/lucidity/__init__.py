@@ -8,6 +8,7 @@ import imp
 
 from ._version import __version__
 from .template import Template, Resolver
+from .dispatcher import Dispatcher
 from .error import ParseError, FormatError, NotFound
 
 
@@ -68,6 +69,9 @@ def parse(path, templates):
     Raise :py:class:`~lucidity.error.ParseError` if *path* is not
     parseable by any of the supplied *templates*.
 
+    To parse many paths against the same templates use a
+    :py:class:`~lucidity.dispatcher.Dispatcher` instead.
+
     '''
     for template in templates:
         try:
@@ -0,0 +1,168 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2013 Martin Pengelly-Phillips
+# :license: See LICENSE.txt.
+
+import re
+
+import lucidity.error
+from lucidity.template import Template
+
+
+class Dispatcher(object):
+    '''Parse paths against many templates, only trying the candidate ones.
+
+    Templates are indexed by the literal text of their patterns. A path is
+    only tried against templates whose literal prefix (when anchored at the
+    start), literal suffix (when anchored at the end) and other literal
+    parts are present in the path. Templates with a literal extension are
+    also indexed by it, so only templates for the path extension are
+    considered at all.
+
+    Templates are tried in order, so the result is the same as
+    :py:func:`lucidity.parse`.
+
+    '''
+
+    _PLACEHOLDER_REGEX = re.compile(r'{.+?}')
+
+    def __init__(self, templates):
+        '''Initialise with *templates*.
+
+        *templates* should be a list of :py:class:`~lucidity.template.Template`
+        instances in the order that they should be tried.
+
+        '''
+        super(Dispatcher, self).__init__()
+        self._templates = list(templates)
+        self._keys = None
+        self._index = None
+
+    @property
+    def templates(self):
+        '''Return templates in the order they are tried.'''
+        return list(self._templates)
+
+    def _candidate(self, template):
+        '''Return candidate entry for *template*.
+
+        The entry is a ``(prefix, suffix, literals, extension, template,
+        regex, groups)`` tuple.
+
+        '''
+        regex, groups = template._compiled_expression()
+        specification = template._construct_format_specification(
+            template.expanded_pattern()
+        )
+        literals = [
+            literal
+            for literal in self._PLACEHOLDER_REGEX.split(specification)
+            if literal
+        ]
+
+        anchor = template._anchor or 0
+        prefix = ''
+        suffix = ''
+        if anchor & Template.ANCHOR_START and \
+                not specification.startswith('{'):
+            prefix = literals[0]
+        if anchor & Template.ANCHOR_END and not specification.endswith('}'):
+            suffix = literals[-1]
+
+        extension = None
+        if suffix and '.' in suffix:
+            extension = suffix.rsplit('.', 1)[1]
+            if not extension:
+                extension = None
+
+        # A $ anchor also matches before a trailing newline.
+        if suffix:
+            suffix = (suffix, suffix + '\n')
+
+        # Longest literals first, they are the less likely to be found.
+        literals.sort(key=len, reverse=True)
+        return (prefix, suffix, literals, extension, template, regex, groups)
+
+    def _build(self):
+        '''Build the candidates index, if any template changed.'''
+        keys = [template._expansion_key() for template in self._templates]
+        if keys == self._keys:
+            return self._index
+
+        candidates = [self._candidate(template) for template in self._templates]
+
+        # Templates that accept any extension are candidates for all paths.
+        any_extension = [
+            candidate for candidate in candidates if candidate[3] is None
+        ]
+        by_extension = {}
+        for candidate in candidates:
+            extension = candidate[3]
+            if extension is not None and extension not in by_extension:
+                by_extension[extension] = [
+                    other for other in candidates
+                    if other[3] is None or other[3] == extension
+                ]
+
+        self._keys = keys
+        self._index = (by_extension, any_extension)
+        return self._index
+
+    def _parse(self, path, index):
+        '''Return ``(data, template)`` for *path* or None.'''
+        by_extension, any_extension = index
+        candidates = any_extension
+        if by_extension:
+            extension = path.rsplit('.', 1)[-1]
+            if extension.endswith('\n'):
+                extension = extension[:-1]
+            candidates = by_extension.get(extension, any_extension)
+
+        for prefix, suffix, literals, _, template, regex, groups in candidates:
+            if prefix and not path.startswith(prefix):
+                continue
+            if suffix and not path.endswith(suffix):
+                continue
+            for literal in literals:
+                if literal not in path:
+                    break
+            else:
+                match = regex.search(path)
+                if match is None:
+                    continue
+                try:
+                    return (template._extract(match, groups), template)
+                except lucidity.error.ParseError:
+                    continue
+
+        return None
+
+    def parse(self, path):
+        '''Parse *path* against the templates.
+
+        Return ``(data, template)`` from the first template, in order, that
+        parses *path*.
+
+        Raise :py:class:`~lucidity.error.ParseError` if *path* is not
+        parseable by any of the templates.
+
+        '''
+        result = self._parse(path, self._build())
+        if result is None:
+            raise lucidity.error.ParseError(
+                'Path {0!r} did not match any of the supplied template '
+                'patterns.'.format(path)
+            )
+
+        return result
+
+    def parse_many(self, paths):
+        '''Parse each path in *paths* against the templates.
+
+        Yield ``(data, template)`` per path, in the same order as *paths*, or
+        ``None`` for paths that are not parsable by any of the templates.
+        Templates are only checked for changes once per call.
+
+        '''
+        index = self._build()
+        for path in paths:
+            yield self._parse(path, index)
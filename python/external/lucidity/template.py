@@ -59,11 +59,15 @@ class Template(object):
         self._period_code = '_LPD_'
         self._at_code = '_WXV_'
         self._name = name
-        self._pattern = pattern
         self._anchor = anchor
 
+        # Compiled regular expression cache. Rebuilt only when the pattern
+        # or the expansion of a referenced template changes.
+        self._revision = 0
+        self._compiled = None
+
         # Check that supplied pattern is valid and able to be compiled.
-        self._construct_regular_expression(self.pattern)
+        self.pattern = pattern
 
     def __repr__(self):
         '''Return unambiguous representation of template.'''
@@ -81,6 +85,17 @@ class Template(object):
         '''Return template pattern.'''
         return self._pattern
 
+    @pattern.setter
+    def pattern(self, pattern):
+        '''Set template *pattern* and invalidate the compiled expression.'''
+        self._construct_regular_expression(pattern)
+        self._pattern = pattern
+        self._references = sorted(
+            self._TEMPLATE_REFERENCE_REGEX.findall(pattern)
+        )
+        self._revision += 1
+        self._compiled = None
+
     def expanded_pattern(self):
         '''Return pattern with all referenced templates expanded recursively.
 
@@ -111,6 +126,52 @@ class Template(object):
 
         return template.expanded_pattern()
 
+    def _expansion_key(self):
+        '''Return key identifying the current expansion of the pattern.
+
+        The key changes when this template pattern, the template resolver or
+        any of the referenced templates change.
+
+        '''
+        if not self._references:
+            return (self._revision,)
+
+        resolver = self.template_resolver
+        key = [self._revision, id(resolver)]
+        if resolver is not None:
+            for reference in self._references:
+                template = resolver.get(reference)
+                if template is None:
+                    key.append((reference, None))
+                else:
+                    key.append(
+                        (reference, id(template), template._expansion_key())
+                    )
+
+        return tuple(key)
+
+    def _compiled_expression(self):
+        '''Return compiled regular expression and placeholder groups.
+
+        The groups are a list of ``(group, key, parts)`` tuples, sorted by
+        group name, where *key* is the placeholder name with the unique
+        number stripped and *parts* are the dot notation components of it.
+
+        '''
+        key = self._expansion_key()
+        if self._compiled is None or self._compiled[0] != key:
+            regex = self._construct_regular_expression(self.expanded_pattern())
+            groups = []
+            for group in sorted(regex.groupindex):
+                # Strip number that was added to make group name unique.
+                placeholder = group[:-3]
+                groups.append(
+                    (group, placeholder, placeholder.split(self._period_code))
+                )
+            self._compiled = (key, regex, groups)
+
+        return self._compiled[1], self._compiled[2]
+
     def parse(self, path):
         '''Return dictionary of data extracted from *path* using this template.
 
@@ -118,47 +179,73 @@ class Template(object):
         parsable by this template.
 
         '''
-        # Construct regular expression for expanded pattern.
-        regex = self._construct_regular_expression(self.expanded_pattern())
-
-        # Parse.
-        parsed = {}
+        regex, groups = self._compiled_expression()
 
         match = regex.search(path)
         if match:
-            data = {}
-            for key, value in sorted(match.groupdict().items()):
-                # Strip number that was added to make group name unique.
-                key = key[:-3]
+            return self._extract(match, groups)
 
-                # If strict mode enabled for duplicate placeholders, ensure that
-                # all duplicate placeholders extract the same value.
-                if self.duplicate_placeholder_mode == self.STRICT:
-                    if key in parsed:
-                        if parsed[key] != value:
-                            raise lucidity.error.ParseError(
-                                'Different extracted values for placeholder '
-                                '{0!r} detected. Values were {1!r} and {2!r}.'
-                                .format(key, parsed[key], value)
-                            )
-                    else:
-                        parsed[key] = value
+        else:
+            raise lucidity.error.ParseError(
+                'Path {0!r} did not match template pattern.'.format(path)
+            )
 
-                # Expand dot notation keys into nested dictionaries.
-                target = data
+    def parse_many(self, paths):
+        '''Parse each path in *paths* using this template.
 
-                parts = key.split(self._period_code)
-                for part in parts[:-1]:
-                    target = target.setdefault(part, {})
+        Yield a dictionary of extracted data per path, in the same order as
+        *paths*, or ``None`` for paths that are not parsable by this template.
+        The regular expression is compiled once for the whole iterable.
 
-                target[parts[-1]] = value
+        '''
+        regex, groups = self._compiled_expression()
+        search = regex.search
 
-            return data
+        for path in paths:
+            match = search(path)
+            if match is None:
+                yield None
+                continue
 
-        else:
-            raise lucidity.error.ParseError(
-                'Path {0!r} did not match template pattern.'.format(path)
-            )
+            try:
+                yield self._extract(match, groups)
+            except lucidity.error.ParseError:
+                yield None
+
+    def _extract(self, match, groups):
+        '''Return dictionary of data extracted from regular expression *match*.
+
+        *groups* should be the placeholder groups of the compiled expression.
+
+        '''
+        parsed = {}
+        data = {}
+        values = match.groupdict()
+        for group, key, parts in groups:
+            value = values[group]
+
+            # If strict mode enabled for duplicate placeholders, ensure that
+            # all duplicate placeholders extract the same value.
+            if self.duplicate_placeholder_mode == self.STRICT:
+                if key in parsed:
+                    if parsed[key] != value:
+                        raise lucidity.error.ParseError(
+                            'Different extracted values for placeholder '
+                            '{0!r} detected. Values were {1!r} and {2!r}.'
+                            .format(key, parsed[key], value)
+                        )
+                else:
+                    parsed[key] = value
+
+            # Expand dot notation keys into nested dictionaries.
+            target = data
+
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+
+            target[parts[-1]] = value
+
+        return data
 
     def format(self, data):
         '''Return a path formatted by applying *data* to this template.
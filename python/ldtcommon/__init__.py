@@ -6,14 +6,23 @@
 
 """
 
-import lucidity
 import logging
+import tempfile
+import sys
 import os
 
 logger = logging.getLogger(__name__)
 
 LOOKDEVTOOLS_FOLDER = os.environ['LOOKDEVTOOLS']
 
+# Make the external packages available without importing ldt, for ie:
+# when running headless tools on render nodes
+LOOKDEVTOOLS_EXTERNAL = os.path.join(LOOKDEVTOOLS_FOLDER, 'python', 'external')
+if LOOKDEVTOOLS_EXTERNAL not in sys.path:
+    sys.path.append(LOOKDEVTOOLS_EXTERNAL)
+
+import lucidity
+
 #: Attributes for tagging meshes for surfacing and texture-to-mesh matching
 ATTR_SURFACING_PROJECT = "surfacing_project"
 ATTR_SURFACING_OBJECT = "surfacing_object"
@@ -33,6 +42,67 @@ TEXTURE_CHANNEL_MATCHING_RATIO = 90
 #: Texture file template, ANCHOR RIGHT
 TEXTURE_FILE_PATTERN = '{surfacing_project}_{surfacing_object}_{channel}_{colorspace}.{udim}.{extension}'
 
+#: Udim tiles range, and the token that replaces the tile in udim merged paths
+UDIM_START = 1001
+UDIM_END = 1999
+UDIM_TOKEN = 'udim'
+
+#: Texture lists bigger than this are parsed in chunks, in a process pool
+TEXTURE_TABLE_CHUNK_SIZE = 50000
+
+#: Texture conversion manifest file name, one per source textures folder
+CONVERSION_MANIFEST_NAME = '.ldt_conversions.json'
+
+#: File search, threads used to list folders, file names to skip, for
+#: ie: maya swatches and conversion manifests, and folder names to never
+#: search into.
+FILE_SEARCH_THREADS = 8
+FILE_SEARCH_EXCLUDE = ('*.maya*', CONVERSION_MANIFEST_NAME)
+FILE_SEARCH_PRUNE = ()
+
+#: Persistent caches folder, for ie: texture indexes
+CACHE_FOLDER = os.environ.get(
+    'LOOKDEVTOOLS_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'lookdevtools'))
+
+#: Texture library watcher, polling interval and events settle time in
+#: seconds, and file systems where inotify events are not reliable.
+LIBRARY_WATCHER_INTERVAL = 5.0
+LIBRARY_WATCHER_SETTLE = 0.5
+NETWORK_FILESYSTEMS = ('nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'afs',
+                       'fuse.sshfs', 'lustre', 'gpfs', 'beegfs')
+
+#: Texture conversion queue, retries of a failed conversion, and delay in
+#: seconds before the first retry, doubled on each retry.
+CONVERSION_RETRIES = 3
+CONVERSION_RETRY_DELAY = 5.0
+
+#: Sources smaller than this, in bytes, are converted in batches, when the
+#: converter supports many files per invocation.
+CONVERSION_BATCH_MAX_SIZE = 4 * 1024 * 1024
+
+#: Conversion staging, local scratch folder, concurrent network storage
+#: transfers, and their total bandwidth in bytes per second, None for no
+#: limit.
+CONVERSION_SCRATCH_FOLDER = os.environ.get('LOOKDEVTOOLS_SCRATCH',
+                                           tempfile.gettempdir())
+CONVERSION_IO_TRANSFERS = 4
+CONVERSION_IO_BANDWIDTH = None
+
+#: Shared conversion queues, seconds between claim heartbeats, and seconds
+#: without heartbeat before a claim is stale and its job is reclaimed.
+SHARED_QUEUE_HEARTBEAT = 30.0
+SHARED_QUEUE_TIMEOUT = 300.0
+
+#: Headless maya batch jobs, mayapy executable, and seconds before a job
+#: is killed, None for no limit.
+MAYAPY_EXEC = os.environ.get(
+    'LOOKDEVTOOLS_MAYAPY', 'mayapy.exe' if os.name == 'nt' else 'mayapy')
+MAYA_BATCH_TIMEOUT = None
+
+#: Colors kept in the get_random_color cache
+COLOR_CACHE_SIZE = 4096
+
 #: Default shader node to use
 DEFAULT_SHADER = 'PxrSurface'
 
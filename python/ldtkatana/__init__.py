@@ -87,8 +87,9 @@ def create_viewer_settings(attribute_name):
         selected_node, attribute_name)
     position_y = 0
 
-    for attribute_value in attribute_values:
-        random_color = utils.get_random_color(attribute_value)
+    attribute_values = list(attribute_values)
+    random_colors = utils.get_random_colors(attribute_values)
+    for attribute_value, random_color in zip(attribute_values, random_colors):
         viewer_settings = NodegraphAPI.CreateNode(
             "ViewerObjectSettings", rootNode)
         viewer_settings.setName("viewerColor_%s" % attribute_value)
@@ -146,7 +147,9 @@ def create_materials(attribute_name, assign_random_color=False):
     attribute_values = katana.get_objects_attribute_values(
         selected_node, attribute_name)
     position_y = 0
-    for attribute_value in attribute_values:
+    attribute_values = list(attribute_values)
+    random_colors = utils.get_random_colors(attribute_values)
+    for attribute_value, random_color in zip(attribute_values, random_colors):
         material_group = NodegraphAPI.CreateNode("Group", rootNode)
         material_group.setName("EZMtl_%s" % attribute_value)
         material_group_inputPort = material_group.addInputPort("in")
@@ -179,8 +182,6 @@ def create_materials(attribute_name, assign_random_color=False):
 
         NodegraphAPI.SetNodePosition(material_network, (250, -100))
 
-        random_color = utils.get_random_color(attribute_value)
-
         PxrSurface = NodegraphAPI.CreateNode("PrmanShadingNode", rootNode)
         PxrSurface_nodeType = PxrSurface.getParameter("nodeType")
         PxrSurface_nodeType.setValue("PxrSurface", 0)
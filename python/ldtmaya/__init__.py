@@ -8,6 +8,9 @@
 
 import ldtcommon
 import ldtutils
+import ldttextures
+from ldtcommon import DEFAULT_SHADER
+from ldtcommon import TEXTURE_FILE_PATTERN
 from ldtcommon import ATTR_SURFACING_PROJECT
 from ldtcommon import ATTR_SURFACING_OBJECT
 from ldtcommon import ATTR_MATERIAL
@@ -21,7 +24,6 @@ from Qt.QtWidgets import QApplication, QWidget, QLabel, QMainWindow
 import os
 import sys
 import traceback
-import random
 import logging
 
 import pymel.core as pm
@@ -656,8 +658,8 @@ def set_wireframe_colors_per_project():
     set_wifreframe_color_black()
     projects = get_surfacing_projects()
     for project in projects:
-        random.seed(project)
-        wire_color = random.randint(1, 31)
+        # Maya index colors 1 to 31, from the project color hash
+        wire_color = 1 + int(ldtutils.get_random_color(project)[0] * 31) % 31
         for surfacingObject in get_surfacing_objects(project):
             for mesh in surfacingObject.members():
                 mesh_shape = mesh.getShape()
@@ -885,59 +887,173 @@ def import_surfacing_textures():
                         the parsed files key to use for import
 
     """
-    import pymel.core as pm
-    from ldtcommon import TEXTURE_FILE_PATTERN
-    import ldtmaya
-    import ldtutils
-    import ldttextures
     textures_folder = '/run/media/ezequielm/misc/wrk/current/cabinPixar/textures'
     texture_list = ldtutils.get_files_in_folder(
         textures_folder, recursive=True, pattern='.tex')
     texture_finder = ldttextures.TextureFinder(
-        TEXTURE_FILE_PATTERN, texture_list)
-    texture_finder.get_channel_plug(texture_list[0])
+        texture_list, TEXTURE_FILE_PATTERN)
 
-    for surfPrj in ldtmaya.get_surfacing_projects():
-        for surfObj in ldtmaya.get_surfacing_objects(surfPrj):
+    for surfPrj in get_surfacing_projects():
+        for surfObj in get_surfacing_objects(surfPrj):
             # Find texture files with a matching surfacing_project, get udim paths
             texture_files = texture_finder.find_key_values(
                 surfacing_project=surfPrj, merge_udims=True)
             if texture_files:
-                print surfObj
                 # create and assign the material to each surfacing_object
                 pm.select(surfObj)
                 meshes = pm.ls(sl=True)
-                shader, shading_group = ldtmaya.create_shader()
+                shader, shading_group = create_shader()
                 shader.rename('%s_%s' % (surfObj, 'material'))
                 pm.sets(shading_group, forceElement=meshes)
                 pm.select(None)
                 for texture_file in texture_files:
-                    # get the shader plug input, to connect the texture to
-                    shader_plug = texture_finder.get_channel_plug(texture_file)
-                    if shader_plug:
-                        shader_plug = pm.PyNode(
-                            '%s.%s' % (shader.name(), shader_plug))
-                        # create image nodes
-                        file_node = ldtmaya.create_file_node(
-                            '%s_%s' % (surfObj, shader_plug))
-                        # paths come with 'udim', replac this with the prman <UDIM>
-                        file_node.fileTextureName.set(
-                            texture_file.replace('udim', '<UDIM>'))
-                        pm.setAttr('%s.%s' % (file_node, 'uvTilingMode'), 3)
-                        pm.setAttr('%s.%s' %
-                                   (file_node, 'alphaIsLuminance'), 1)
-                        # TODO Query the shader plug, connect RGB or single channel
-                        # TODO if a normal or bump, create the inbetween node
-                        # if shader_plug == "normal" or shader_plug == "bump"
-                        print "plug %s -->%s" % (texture_file, shader_plug)
-                        if len(shader_plug.elements()) == 4:
-                            if "bump" in shader_plug.name():
-                                bump_node = pm.shadingNode(
-                                    'bump2d', asTexture=True)
-                                bump_node.rename('%s_%s' % (surfObj, 'bump'))
-                                file_node.outAlpha.connect(bump_node.bumpValue)
-                                bump_node.outNormal.connect(shader_plug)
-                            else:
-                                file_node.outColor.connect(shader_plug)
-                        else:
-                            file_node.outAlpha.connect(shader_plug)
+                    connect_texture(shader, texture_file, texture_finder,
+                                    str(surfObj))
+
+
+def get_surfacing_object_name(transform):
+    """
+    Get the surfacing object a transform was exported from.
+
+    Uses the surfacing object attribute when the alembic kept it, or the
+    merged geometry name, with its "_geo" suffix removed.
+
+    Args:
+        transform (PyNode): mesh transform node.
+
+    Returns:
+        str. Surfacing object name.
+
+    """
+    if transform.hasAttr(ATTR_SURFACING_OBJECT):
+        name = transform.getAttr(ATTR_SURFACING_OBJECT)
+        if name:
+            return name
+    name = transform.nodeName().split(':')[-1]
+    if name.endswith('_geo'):
+        name = name[:-len('_geo')]
+    return name
+
+
+def connect_texture(shader, texture_file, texture_finder, name,
+                    shader_type=DEFAULT_SHADER):
+    """
+    Create a file node for a texture, and connect it to its shader plug.
+
+    Args:
+        shader (PyNode): shader node.
+        texture_file (str): texture path, with merged udims.
+        texture_finder (TextureFinder): finder the texture was found with.
+        name (str): file node names prefix.
+
+    Kwargs:
+        shader_type (str): shader type, used to match the texture channel.
+
+    Returns:
+        PyNode. The file node, None if no shader plug matched the texture.
+
+    """
+    shader_plug = texture_finder.get_channel_plug(texture_file, shader_type)
+    if not shader_plug:
+        logger.warning('No shader plug found for: %s' % texture_file)
+        return None
+    shader_plug = pm.PyNode('%s.%s' % (shader.name(), shader_plug))
+    file_node = create_file_node('%s_%s' % (name, shader_plug.plugAttr()))
+    file_node.fileTextureName.set(
+        ldttextures.format_udim(texture_file, '<UDIM>'))
+    file_node.uvTilingMode.set(3)
+    file_node.alphaIsLuminance.set(1)
+    logger.info('plug %s --> %s' % (texture_file, shader_plug))
+    if len(shader_plug.elements()) == 4:
+        if 'bump' in shader_plug.name():
+            bump_node = pm.shadingNode('bump2d', asTexture=True)
+            bump_node.rename('%s_%s' % (name, 'bump'))
+            file_node.outAlpha.connect(bump_node.bumpValue)
+            bump_node.outNormal.connect(shader_plug)
+        else:
+            file_node.outColor.connect(shader_plug)
+    else:
+        file_node.outAlpha.connect(shader_plug)
+    return file_node
+
+
+def assign_surfacing_textures(texture_list, transforms=None,
+                              shader_type=DEFAULT_SHADER):
+    """
+    Create a material per surfacing object, with its textures connected.
+
+    Textures are matched to the transforms by their surfacing_object token.
+
+    Args:
+        texture_list (list): texture file paths.
+
+    Kwargs:
+        transforms (list): mesh transforms, defaults to all in the scene.
+        shader_type (str): type of material shader to create.
+
+    Returns:
+        dict. Shading group per surfacing object name.
+
+    """
+    if transforms is None:
+        transforms = get_mesh_transforms(pm.ls(assemblies=True))
+    texture_finder = ldttextures.TextureFinder(
+        texture_list, TEXTURE_FILE_PATTERN)
+    shading_groups = {}
+    for transform in transforms:
+        name = get_surfacing_object_name(transform)
+        if name in shading_groups:
+            pm.sets(shading_groups[name], forceElement=[transform])
+            continue
+        texture_files = texture_finder.find_key_values(
+            surfacing_object=name, merge_udims=True)
+        if not texture_files:
+            logger.warning('No textures found for: %s' % name)
+            continue
+        shader, shading_group = create_shader(type=shader_type)
+        shader.rename('%s_%s' % (name, 'material'))
+        pm.sets(shading_group, forceElement=[transform])
+        pm.setAttr('%s.%s' % (shading_group, ATTR_MATERIAL),
+                   'obj', force=True)
+        pm.setAttr('%s.%s' % (shading_group, ATTR_MATERIAL_ASSIGN),
+                   name, force=True)
+        for texture_file in texture_files:
+            connect_texture(shader, texture_file, texture_finder, name,
+                            shader_type)
+        shading_groups[name] = shading_group
+    return shading_groups
+
+
+def assemble_textured_scene(alembic_path, textures, scene_path,
+                            shader_type=DEFAULT_SHADER):
+    """
+    Import an alembic, assign its textures, and save it as a new scene.
+
+    Used by the headless maya batch jobs, see ldtutils.mayabatch.
+
+    Args:
+        alembic_path (str): alembic file to import.
+        textures (list or str): texture file paths, or a folder to search
+                                for textures in.
+        scene_path (str): maya scene to save.
+
+    Kwargs:
+        shader_type (str): type of material shader to create.
+
+    Returns:
+        dict. Shading group per surfacing object name.
+
+    """
+    if not mc.pluginInfo('AbcImport', query=True, loaded=True):
+        mc.loadPlugin('AbcImport')
+    mc.file(new=True, force=True)
+    mc.AbcImport(alembic_path, mode='import')
+    if isinstance(textures, basestring):
+        textures = ldtutils.get_files_in_folder(textures, recursive=True)
+    shading_groups = assign_surfacing_textures(
+        textures, shader_type=shader_type)
+    mc.file(rename=scene_path)
+    mc.file(save=True, force=True,
+            type='mayaAscii' if scene_path.endswith('.ma') else 'mayaBinary')
+    logger.info('Saved scene: %s' % scene_path)
+    return shading_groups
@@ -88,8 +88,11 @@ class MayaTextureImport(IPlugin):
         search_folder = qtutils.get_folder_path()
         if search_folder:
             logger.info('Search folder: %s' % search_folder)
-            file_list = ldtutils.get_files_in_folder(
-                search_folder, recursive=True, pattern=self.ln_pattern.text())
+            texture_index = ldttextures.TextureIndex(search_folder)
+            texture_index.update()
+            file_list = texture_index.file_list(
+                recursive=True, pattern=self.ln_pattern.text())
+            texture_index.close()
         self.populate_form(file_list)
 
     def populate_form(self, file_list):
@@ -119,6 +122,6 @@ class MayaTextureImport(IPlugin):
 
     def import_texture(self, file_path):
         """ Creates a maya file node with the given file_path."""
-        file_path = file_path.replace('udim', '<UDIM>')
+        file_path = ldttextures.format_udim(file_path, '<UDIM>')
         file_node = ldtmaya.create_file_node(name=os.path.basename(file_path))
         file_node.fileTextureName.set(file_path)
@@ -13,6 +13,7 @@ from yapsy.IPlugin import IPlugin
 
 import ldtprman
 import ldtutils
+import ldttextures
 from ldtui import qtutils
 from Qt import QtGui, QtWidgets, QtCore
 from Qt.QtWidgets import QApplication, QWidget, QLabel, QMainWindow
@@ -38,7 +39,6 @@ class TxMake(IPlugin):
 
     def build_ui(self):
         """Build the Plug-in UI and append it to the main ui as a tab."""
-        # TODO (eze): add a QtLineEdit where to add the arguments list
         self.plugin_layout = QtWidgets.QWidget()
         main_layout = QtWidgets.QVBoxLayout()
         txmake_layout = QtWidgets.QVBoxLayout()
@@ -52,6 +52,7 @@ class TxMake(IPlugin):
         self.lbl_arguments = QtWidgets.QLabel("comma separated arguments")
         self.line_arguments = QtWidgets.QLineEdit("")
         self.cbox_recursive = QtWidgets.QCheckBox("search subdirectories")
+        self.cbox_force = QtWidgets.QCheckBox("convert up to date textures")
         self.btn_txmake = QtWidgets.QPushButton(
             "Select a folder"
         )
@@ -65,6 +66,7 @@ class TxMake(IPlugin):
         txmake_layout.addWidget(self.lbl_arguments)
         txmake_layout.addWidget(self.line_arguments)
         txmake_layout.addWidget(self.cbox_recursive)
+        txmake_layout.addWidget(self.cbox_force)
         txmake_layout.addWidget(self.btn_txmake)
 
         # Set main layout
@@ -77,10 +79,21 @@ class TxMake(IPlugin):
 
     def run(self):
         """Convert textures."""
-        # TODO (eze) use job dispatcher from Anant when ready
         folder_path = qtutils.get_folder_path()
-        file_list = ldtutils.get_files_in_folder(folder_path,
-                                                 recursive=self.cbox_recursive.checkState(),
-                                                 pattern=self.line_extension.text()
-                                                 )
-        ldtprman.convert_to_tx(file_list)
+        recursive = bool(self.cbox_recursive.checkState())
+        if recursive:
+            texture_index = ldttextures.TextureIndex(folder_path)
+            texture_index.update()
+            file_list = texture_index.file_list(
+                recursive=True, pattern=self.line_extension.text())
+            texture_index.close()
+        else:
+            # Indexing always searches subdirectories, list the folder only
+            file_list = ldtutils.get_files_in_folder(
+                folder_path, recursive=False,
+                pattern=self.line_extension.text())
+        args = [arg.strip() for arg in self.line_arguments.text().split(',')
+                if arg.strip()]
+        ldtprman.convert_to_tx(file_list, args=args or None,
+                               force=bool(self.cbox_force.checkState()),
+                               queue_path=ldtprman.get_queue_path(folder_path))
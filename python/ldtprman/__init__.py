@@ -8,47 +8,808 @@
 
 import os
 import sys
+import time
+import heapq
+import random
+import hashlib
 import logging
-import platform
-import subprocess
+import itertools
+import functools
+import threading
+import multiprocessing
+
+import ldtutils
+from ldttextures import split_udim
+from ldttextures.imageinfo import ImageInfo, read_image_infos
+from ldtcommon import CACHE_FOLDER
+from ldtcommon import CONVERSION_BATCH_MAX_SIZE
+from ldtcommon import CONVERSION_IO_TRANSFERS
+from ldtcommon import FILE_SEARCH_EXCLUDE
+from ldtcommon import SHARED_QUEUE_HEARTBEAT
+from ldtcommon import SHARED_QUEUE_TIMEOUT
+from ldtprman.converters import TXMAKE_EXEC, TXMAKE_ARGS, CONVERTERS
+from ldtprman.converters import ConversionResult, ConversionJob
+from ldtprman.converters import Converter, get_converter
+from ldtprman.manifest import ConversionManifest, ManifestCache
+from ldtprman.jobqueue import ConversionQueue
+from ldtprman.staging import StagingArea
+from ldtprman.sharedqueue import SharedQueue, Heartbeat
 
 logger = logging.getLogger(__name__)
 
-# Were are assuming txmake exists in the PATH, and is all ready to go.
-PLATFORM = platform.system()
-if PLATFORM == 'Windows':
-    TXMAKE_EXEC = 'txmake.exe'
-else:
-    TXMAKE_EXEC = 'txmake'
 
+def get_tex_path(file_path):
+    """
+    Get the .tex file path of a texture, next to the source file.
+
+    Args:
+        file_path (str): source texture file path.
+
+    Returns:
+        str. tex file path.
 
-def convert_to_tx(file_list):
     """
-    Convert a list of full path files into tx textures.
+    folder = os.path.dirname(file_path)
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(folder, (file_name + '.tex'))
+
+
+def get_queue_path(folder, cache_folder=None):
+    """
+    Get the conversion queue database path of a textures folder.
+
+    Args:
+        folder (str): textures folder.
+
+    Kwargs:
+        cache_folder (str): defaults to the CACHE_FOLDER.
+
+    Returns:
+        str. Queue database file path.
+
+    """
+    folder_hash = hashlib.sha1(
+        os.path.abspath(folder).encode('utf-8')).hexdigest()
+    return os.path.join(cache_folder or CACHE_FOLDER,
+                        'txmake_queue_%s.db' % folder_hash)
+
+
+def get_worker_count(workers=None):
+    """
+    Get the number of conversions to run concurrently.
+
+    Kwargs:
+        workers (int): override, defaults to the cpu count.
+
+    Returns:
+        int. Worker count, at least 1.
+
+    """
+    if not workers:
+        try:
+            workers = multiprocessing.cpu_count()
+        except NotImplementedError:
+            workers = 1
+    return max(1, int(workers))
+
+
+def convert_file(file_path, tex_file_path=None, args=None, converter=None):
+    """
+    Convert a single file into a tex texture.
+
+    Args:
+        file_path (str): source texture file path.
+
+    Kwargs:
+        tex_file_path (str): converted file path, defaults to the converter
+                             target, next to the source.
+        args (list): converter arguments, defaults to the converter ones.
+        converter (str or Converter): backend, defaults to txmake.
+
+    Returns:
+        ConversionResult. Skipped, with the source as target, if the
+        file already has the converter extension.
+
+    """
+    converter = get_converter(converter)
+    if converter.is_converted(file_path):
+        logger.info('%s is already a %s file, not converting it' %
+                    (file_path, converter.extension))
+        return ConversionResult(file_path, file_path, returncode=0,
+                                skipped=True)
+    if tex_file_path is None:
+        tex_file_path = converter.get_target(file_path)
+    if args is None:
+        args = converter.default_args
+    return converter.convert(
+        [ConversionJob(file_path, tex_file_path, args)])[0]
+
+
+def plan_conversions(file_list, args=None, force=False, use_hash=False,
+                     manifests=None, converter=None, precheck=True):
+    """
+    Split a list of files into conversions to run, and up to date ones.
 
     Args:
         file_list (list): list of file paths.
 
-    Raises:
-        OSError.
+    Kwargs:
+        args (list): converter arguments, defaults to the converter ones.
+        force (bool): convert all files, even if they are up to date.
+        use_hash (bool): compare the content hash of touched sources.
+        manifests (ManifestCache): manifests to check against.
+        converter (str or Converter): backend, defaults to txmake.
+        precheck (bool): read the sources headers, sources that are
+                         already tiled and mipmapped are not converted,
+                         and the properties of the others are kept in
+                         their jobs.
+
+    Returns:
+        tuple. (list of ConversionJob to run, list of up to date
+        ConversionJob). Jobs of sources that are already textures, already
+        have the converter extension, or are skipped by the file search
+        exclusions, as conversion manifests, have the source as target.
 
     """
+    converter = get_converter(converter)
+    if args is None:
+        args = converter.default_args
+    if manifests is None:
+        manifests = ManifestCache()
+    jobs = []
+    up_to_date = []
     for file_path in file_list:
-        file_basename = os.path.basename(file_path)
-        basename = os.path.basename(file_path)
-        file_name = os.path.splitext(basename)[0]
-        folder = os.path.dirname(file_path)
-        tex_file_path = os.path.join(folder, (file_name+'.tex'))
-        try:
-            # example command line
-            # txmake -compression dwaa -mode periodic in.tif out.tex
-            logger.info('Converting %s into .tex format' % basename)
-            subprocess.call([TXMAKE_EXEC,
-                             '-compression',
-                             'dwaa',
-                             '-mode',
-                             'periodic',
-                             file_path,
-                             tex_file_path])
-        except OSError:
-            logger.error('txmake was not found in the PATH!')
+        if ldtutils.matches_any(os.path.basename(file_path),
+                                FILE_SEARCH_EXCLUDE):
+            logger.info('%s is not a texture, not converting it' % file_path)
+            up_to_date.append(ConversionJob(file_path, file_path, args))
+            continue
+        if converter.is_converted(file_path):
+            # Converting a converter output would overwrite it
+            logger.info('%s is already a %s file, not converting it' %
+                        (file_path, converter.extension))
+            up_to_date.append(ConversionJob(file_path, file_path, args))
+            continue
+        job = ConversionJob(file_path, converter.get_target(file_path), args)
+        if not force and manifests.get(file_path).is_up_to_date(
+                job.source, job.target, job.args, use_hash=use_hash):
+            up_to_date.append(job)
+        else:
+            jobs.append(job)
+    if precheck and jobs:
+        infos = read_image_infos([job.source for job in jobs])
+        pending = []
+        for job in jobs:
+            job.info = infos.get(job.source)
+            if job.info is not None and job.info.is_texture:
+                logger.info('%s is already tiled and mipmapped, not '
+                            'converting it' % job.source)
+                job.target = job.source
+                up_to_date.append(job)
+            else:
+                pending.append(job)
+        jobs = pending
+    return jobs, up_to_date
+
+
+def dedupe_conversions(jobs, threads=None):
+    """
+    Group conversions of byte identical sources.
+
+    Args:
+        jobs (list): list of ConversionJob.
+
+    Kwargs:
+        threads (int): files hashed concurrently.
+
+    Returns:
+        tuple. (list of ConversionJob to run, dict of duplicate
+        ConversionJob lists by the source of the job to run).
+
+    """
+    kwargs = {'threads': threads} if threads else {}
+    jobs_by_source = dict((job.source, job) for job in jobs)
+    skip = set()
+    duplicates = {}
+    for group in ldtutils.find_duplicate_files(
+            [job.source for job in jobs], **kwargs):
+        leader = jobs_by_source[group[0]]
+        for source in group[1:]:
+            job = jobs_by_source[source]
+            if job.target == leader.target:
+                continue
+            duplicates.setdefault(leader.source, []).append(job)
+            skip.add(source)
+    return [job for job in jobs if job.source not in skip], duplicates
+
+
+def link_duplicates(result, duplicates):
+    """
+    Link the converted file of a conversion to its duplicates.
+
+    Args:
+        result (ConversionResult): conversion of the duplicated source.
+        duplicates (list): duplicate ConversionJob list.
+
+    Returns:
+        list. ConversionResult per duplicate.
+
+    """
+    results = []
+    for job in duplicates:
+        duplicate = ConversionResult(job.source, job.target,
+                                     returncode=result.returncode,
+                                     duplicate_of=result.source)
+        if not result.succeeded:
+            duplicate.stderr = 'Duplicate of a failed conversion: %s' % \
+                result.source
+        else:
+            try:
+                ldtutils.link_file(result.target, job.target)
+            except (IOError, OSError) as error:
+                logger.error('Failed to link %s to %s: %s' %
+                             (result.target, job.target, error))
+                duplicate.returncode = None
+                duplicate.stderr = str(error)
+        results.append(duplicate)
+    return results
+
+
+def get_conversion_report(results):
+    """
+    Summarize a list of conversion results.
+
+    Time saved by deduplication is the conversion time of the source
+    each duplicate was linked from.
+
+    Args:
+        results (list): list of ConversionResult.
+
+    Returns:
+        dict. converted, skipped, deduplicated and failed file counts,
+        and bytes_saved and seconds_saved by deduplication.
+
+    """
+    report = {'converted': 0, 'skipped': 0, 'deduplicated': 0, 'failed': 0,
+              'bytes_saved': 0, 'seconds_saved': 0.0}
+    durations = dict((result.source, result.duration) for result in results)
+    for result in results:
+        if not result.succeeded:
+            report['failed'] += 1
+        elif result.skipped:
+            report['skipped'] += 1
+        elif result.duplicate_of:
+            report['deduplicated'] += 1
+            report['seconds_saved'] += durations.get(result.duplicate_of, 0.0)
+            try:
+                report['bytes_saved'] += os.path.getsize(result.source)
+            except OSError:
+                pass
+        else:
+            report['converted'] += 1
+    return report
+
+
+def schedule_conversions(jobs):
+    """
+    Order conversions longest first, keeping udim sets together.
+
+    Source sizes estimate the conversion times, the uncompressed pixels
+    size if the job has the source ImageInfo. Udim sets are ordered by
+    their biggest tile, then by their total size, and their tiles run one
+    after the other, biggest first. Starting the longest conversions first
+    (LPT scheduling) avoids a big texture running alone at the end of the
+    batch, and each texture set completes as a unit.
+
+    Args:
+        jobs (list): list of ConversionJob.
+
+    Returns:
+        list. ConversionJob list, in dispatch order.
+
+    """
+    udim_sets = {}
+    order = []
+    for job in jobs:
+        if job.info is not None:
+            size = job.info.pixel_bytes
+        else:
+            try:
+                size = os.path.getsize(job.source)
+            except OSError:
+                size = 0
+        key = split_udim(job.source)[0]
+        udim_set = udim_sets.get(key)
+        if udim_set is None:
+            udim_set = udim_sets[key] = []
+            order.append(key)
+        udim_set.append((size, job))
+    scheduled = []
+    for key in sorted(order, key=lambda key: (
+            -max(size for size, job in udim_sets[key]),
+            -sum(size for size, job in udim_sets[key]))):
+        udim_set = sorted(udim_sets[key], key=lambda item: -item[0])
+        scheduled.extend(job for size, job in udim_set)
+    return scheduled
+
+
+def get_makespan(durations, workers):
+    """
+    Simulate a pool of workers running jobs in order.
+
+    Args:
+        durations (list): job durations, in dispatch order.
+        workers (int): concurrent jobs.
+
+    Returns:
+        float. Time until the last job finishes.
+
+    """
+    finish_times = [0.0] * max(1, workers)
+    for duration in durations:
+        heapq.heapreplace(finish_times, finish_times[0] + duration)
+    return max(finish_times)
+
+
+def _synthetic_texture_jobs(rng, sets, get_resolutions):
+    """
+    Get conversion jobs of synthetic udim sets, in file order.
+
+    Args:
+        rng (random.Random): random generator.
+        sets (int): udim sets count.
+        get_resolutions (function): returns the resolution of each tile of
+                                    a set.
+
+    Returns:
+        list. ConversionJob list, sorted by source path.
+
+    """
+    channels = ['baseColor', 'roughness', 'normal', 'displacement',
+                'metallic']
+    jobs = []
+    for index in range(sets):
+        name = 'asset_object%04d_%s%s' % (index // len(channels),
+                                          rng.choice(channels), index)
+        info = (rng.choice([1, 3]), rng.choice([8, 16, 32]))
+        for tile, resolution in enumerate(get_resolutions()):
+            source = '/textures/%s.%d.exr' % (name, 1001 + tile)
+            jobs.append(ConversionJob(
+                source, source[:-len('.exr')] + '.tex', TXMAKE_ARGS,
+                info=ImageInfo('exr', resolution, resolution, *info)))
+    return sorted(jobs, key=lambda job: job.source)
+
+
+def benchmark_scheduling(count=300, workers=16, seed=0):
+    """
+    Compare the makespan of file order, and schedule_conversions order.
+
+    Jobs are synthetic udim sets, their durations are proportional to
+    their uncompressed pixels size, as schedule_conversions estimates
+    them. Longest first, ignoring the udim sets, is a reference: keeping
+    the tiles of a set together can make the batch longer.
+
+    Kwargs:
+        count (int): udim sets per library.
+        workers (int): concurrent jobs.
+        seed (int): random seed.
+
+    Returns:
+        dict. (file order, schedule_conversions, longest first) makespans,
+        by library.
+
+    """
+    rng = random.Random(seed)
+
+    def get_resolution():
+        # Mostly 2k maps, a few 4k, and rare 16k hero textures
+        return rng.choice([2048] * 80 + [4096] * 19 + [16384])
+
+    libraries = {
+        'single tiles': lambda: [get_resolution()],
+        'udim sets': lambda: [get_resolution()] * rng.randint(1, 20),
+        # A hero tile, and many small background tiles
+        'hero tiles': lambda: [8192] + [1024] * rng.randint(1, 39),
+    }
+    results = {}
+    for name, get_resolutions in sorted(libraries.items()):
+        jobs = _synthetic_texture_jobs(rng, count, get_resolutions)
+
+        def get_durations(jobs):
+            return [job.info.pixel_bytes / 1048576.0 for job in jobs]
+
+        results[name] = (
+            get_makespan(get_durations(jobs), workers),
+            get_makespan(get_durations(schedule_conversions(jobs)), workers),
+            get_makespan(sorted(get_durations(jobs), reverse=True), workers))
+        logger.info('%s: %s jobs, file order %.1f, schedule_conversions '
+                    '%.1f, longest first %.1f' %
+                    ((name, len(jobs)) + results[name]))
+    return results
+
+
+def batch_conversions(jobs, batch_size, max_size=CONVERSION_BATCH_MAX_SIZE):
+    """
+    Group small conversions into batches, run in a single invocation.
+
+    Batches keep the jobs order, each one is placed where its first job is.
+
+    Args:
+        jobs (list): (ConversionJob, source size) tuples.
+        batch_size (int): maximum jobs per batch.
+
+    Kwargs:
+        max_size (int): sources bigger than this, in bytes, are converted
+                        alone.
+
+    Returns:
+        list. ConversionJob lists.
+
+    """
+    batches = []
+    open_batches = {}
+    for job, size in jobs:
+        if batch_size <= 1 or size is None or size > max_size:
+            batches.append([job])
+            continue
+        key = tuple(job.args)
+        batch = open_batches.get(key)
+        if batch is None or len(batch) >= batch_size:
+            batch = open_batches[key] = []
+            batches.append(batch)
+        batch.append(job)
+    return batches
+
+
+def run_queue(queue, workers=None, callback=None, converter=None,
+              staging=None):
+    """
+    Run the conversions of a queue, until no job is pending.
+
+    Failed conversions are retried, after the queue retry delay. Missing
+    converters are not retried. Small sources are converted in batches,
+    if the converter supports it.
+
+    Args:
+        queue (ConversionQueue): conversions to run.
+
+    Kwargs:
+        workers (int): concurrent conversions, defaults to the cpu count.
+        callback (function): called with the ConversionResult of each
+                             finished job, succeeded or out of retries.
+        converter (str or Converter): backend, defaults to txmake.
+        staging (StagingArea): convert in a local scratch folder.
+
+    Returns:
+        dict. Last ConversionResult of each job, by source file path.
+
+    """
+    converter = get_converter(converter)
+    convert = converter.convert
+    if staging is not None:
+        convert = functools.partial(staging.convert, converter)
+    results = {}
+    with ldtutils.Dispatcher(workers=get_worker_count(workers),
+                             name='Conversion') as dispatcher:
+        while True:
+            jobs = queue.claim()
+            if not jobs:
+                next_attempt = queue.next_attempt()
+                if next_attempt is None:
+                    break
+                time.sleep(max(0.0, next_attempt - time.time()))
+                continue
+            batches = batch_conversions(
+                [(ConversionJob(source, target, args), size)
+                 for source, target, args, size in jobs],
+                converter.batch_size)
+            for result in itertools.chain.from_iterable(
+                    dispatcher.map(convert, batches, ordered=False)):
+                results[result.source] = result
+                if result.succeeded:
+                    queue.done(result.source)
+                elif queue.fail(result.source, result.stderr,
+                                retry=result.returncode is not None):
+                    logger.warning('Conversion of %s will be retried' %
+                                   result.source)
+                    continue
+                if callback:
+                    callback(result)
+    return results
+
+
+def convert_to_tx(file_list, args=None, workers=None, force=False,
+                  dry_run=False, use_hash=False, dedupe=True,
+                  queue_path=None, callback=None, converter=None,
+                  staging=None, precheck=True):
+    """
+    Convert a list of full path files into tx textures.
+
+    Conversions run concurrently, in a pool of workers. Files converted
+    with the same arguments, and unchanged since, are skipped. Each
+    source folder keeps its conversion records in a ConversionManifest.
+    Byte identical sources are converted once, and the converted file is
+    hardlinked, or copied, to the other targets.
+
+    Jobs run from a ConversionQueue, failed conversions are retried. If
+    the queue is persistent, converting the same files again after an
+    interrupted batch only runs the unfinished conversions.
+
+    Args:
+        file_list (list): list of file paths.
+
+    Kwargs:
+        args (list): converter arguments, defaults to the converter ones.
+        workers (int): concurrent conversions, defaults to the cpu count.
+        force (bool): convert all files, even if they are up to date.
+        dry_run (bool): only plan the conversions, do not run them.
+        use_hash (bool): record source content hashes, and compare them
+                         when a source was touched but not modified.
+        dedupe (bool): convert byte identical sources once.
+        queue_path (str): persistent queue database, for ie:
+                          get_queue_path(folder), defaults to in memory.
+        callback (function): called with each file ConversionResult, as
+                             soon as the file is finished.
+        converter (str or Converter): backend, for ie: 'maketx', defaults
+                                      to txmake.
+        staging (StagingArea): convert in a local scratch folder, and move
+                               the converted files into place. True for
+                               the default StagingArea.
+        precheck (bool): do not convert sources that are already tiled
+                         and mipmapped, their result target is the source.
+
+    Returns:
+        list. ConversionResult per file, in the file_list order, or the
+        list of ConversionJob to run if dry_run.
+
+    """
+    file_list = list(file_list)
+    converter = get_converter(converter)
+    if args is None:
+        args = converter.default_args
+    if staging is True:
+        staging = StagingArea()
+    manifests = ManifestCache()
+    jobs, up_to_date = plan_conversions(file_list, args=args, force=force,
+                                        use_hash=use_hash,
+                                        manifests=manifests,
+                                        converter=converter,
+                                        precheck=precheck)
+    if dry_run:
+        for job in jobs:
+            logger.info('Would convert %s' % job.source)
+        logger.info('%s files to convert, %s up to date' %
+                    (len(jobs), len(up_to_date)))
+        return jobs
+    results = {}
+
+    def finished(result):
+        results[result.source] = result
+        if result.succeeded and not result.skipped:
+            manifests.get(result.source).record(
+                result.source, result.target, args, use_hash=use_hash)
+        if callback:
+            callback(result)
+
+    for job in up_to_date:
+        finished(ConversionResult(job.source, job.target, returncode=0,
+                                  skipped=True))
+    if not jobs:
+        manifests.save()
+        logger.info('All %s files are up to date' % len(up_to_date))
+        return [results[file_path] for file_path in file_list]
+
+    start = time.time()
+    duplicates = {}
+    if dedupe and len(jobs) > 1:
+        jobs, duplicates = dedupe_conversions(jobs)
+    jobs = schedule_conversions(jobs)
+    workers = min(get_worker_count(workers), len(jobs))
+    logger.info('Converting %s files, %s workers, %s duplicates, '
+                '%s up to date' % (len(jobs), workers,
+                                   sum(map(len, duplicates.values())),
+                                   len(up_to_date)))
+
+    def converted(result):
+        finished(result)
+        for duplicate in link_duplicates(
+                result, duplicates.get(result.source, [])):
+            finished(duplicate)
+
+    queue = ConversionQueue(queue_path or ':memory:')
+    try:
+        # Conversions finished before an interrupted batch
+        for job in queue.submit(jobs):
+            converted(ConversionResult(job.source, job.target, returncode=0))
+        run_queue(queue, workers=workers, callback=converted,
+                  converter=converter, staging=staging)
+        for source, error in queue.failed():
+            logger.error('Conversion of %s failed after retries' % source)
+        manifests.save()
+        # Finished conversions are in the manifests now
+        queue.clear()
+    finally:
+        queue.close()
+    results = [results[file_path] for file_path in file_list]
+    report = get_conversion_report(results)
+    logger.info('Converted %s files in %.2f seconds, %s failed, '
+                '%s up to date' % (report['converted'], time.time() - start,
+                                   report['failed'], report['skipped']))
+    if report['deduplicated']:
+        logger.info('Linked %s duplicate files, saving %s bytes and %.2f '
+                    'seconds of conversion' %
+                    (report['deduplicated'], report['bytes_saved'],
+                     report['seconds_saved']))
+    return results
+
+
+def submit_shared(file_list, queue_folder, args=None, force=False,
+                  use_hash=False, dedupe=True, converter=None,
+                  precheck=True):
+    """
+    Plan the conversions of a list of files into a SharedQueue.
+
+    Up to date files are skipped, duplicates are linked by the worker
+    converting their source, and jobs are queued longest first.
+
+    Args:
+        file_list (list): list of file paths.
+        queue_folder (str): shared queue folder.
+
+    Kwargs:
+        args (list): converter arguments, defaults to the converter ones.
+        force (bool): convert all files, even if they are up to date.
+        use_hash (bool): record source content hashes.
+        dedupe (bool): convert byte identical sources once.
+        converter (str or Converter): backend, defaults to txmake. Workers
+                                      use it, unless they set their own.
+        precheck (bool): do not queue sources that are already tiled and
+                         mipmapped.
+
+    Returns:
+        int. Number of queued jobs.
+
+    """
+    converter = get_converter(converter)
+    if args is None:
+        args = converter.default_args
+    jobs, up_to_date = plan_conversions(file_list, args=args, force=force,
+                                        use_hash=use_hash,
+                                        converter=converter,
+                                        precheck=precheck)
+    duplicates = {}
+    if dedupe and len(jobs) > 1:
+        jobs, duplicates = dedupe_conversions(jobs)
+    jobs = schedule_conversions(jobs)
+    queue = SharedQueue(queue_folder)
+    queue.submit(jobs, duplicates=duplicates,
+                 settings={'converter': converter.name, 'use_hash': use_hash})
+    logger.info('Queued %s conversions in %s, %s duplicates, %s up to date'
+                % (len(jobs), queue_folder,
+                   sum(map(len, duplicates.values())), len(up_to_date)))
+    return len(jobs)
+
+
+def run_shared_worker(queue_folder, workers=None, converter=None,
+                      staging=None, callback=None, poll_interval=5.0,
+                      timeout=SHARED_QUEUE_TIMEOUT):
+    """
+    Run the conversions of a SharedQueue, until no job is left.
+
+    Any number of workers, on any host, can run the same queue. Jobs of
+    other workers are waited for, and reclaimed if their claims go stale.
+
+    Args:
+        queue_folder (str): shared queue folder.
+
+    Kwargs:
+        workers (int): concurrent conversions, defaults to the cpu count.
+        converter (str or Converter): backend, defaults to the one the
+                                      jobs were submitted with.
+        staging (StagingArea): convert in a local scratch folder.
+        callback (function): called with each file ConversionResult, as
+                             soon as the file is finished.
+        poll_interval (float): seconds to wait for other workers jobs.
+        timeout (float): seconds without heartbeat before a claim is stale.
+
+    Returns:
+        list. ConversionResult of the files converted by this worker.
+
+    """
+    queue = SharedQueue(queue_folder, timeout=timeout)
+    if converter is None:
+        converter = queue.get_settings().get('converter')
+    converter = get_converter(converter)
+    convert = converter.convert
+    if staging is not None:
+        convert = functools.partial(staging.convert, converter)
+    results = []
+    results_lock = threading.Lock()
+
+    def finished(job_id, job, result):
+        duplicates = [ConversionJob(source, target, job['args'])
+                      for source, target in job.get('duplicates', [])]
+        job_results = [result]
+        if result.succeeded:
+            job_results += link_duplicates(result, duplicates)
+            queue.done(job_id, job, job_results)
+        elif queue.fail(job_id, job, result.stderr,
+                        retry=result.returncode is not None):
+            logger.warning('Conversion of %s will be retried' %
+                           result.source)
+            return
+        else:
+            job_results += link_duplicates(result, duplicates)
+        with results_lock:
+            results.extend(job_results)
+            if callback:
+                for job_result in job_results:
+                    callback(job_result)
+
+    def work():
+        while True:
+            claimed = queue.claim(converter.batch_size)
+            if not claimed:
+                progress = queue.progress()
+                if progress['finished']:
+                    return
+                if progress['stale']:
+                    queue.reclaim()
+                time.sleep(poll_interval)
+                continue
+            jobs = dict((job['source'], (job_id, job))
+                        for job_id, job in claimed)
+            for batch in batch_conversions(
+                    [(ConversionJob(job['source'], job['target'],
+                                    job['args']), job['size'])
+                     for job_id, job in claimed], converter.batch_size):
+                for result in convert(batch):
+                    finished(*(jobs[result.source] + (result,)))
+
+    heartbeat = Heartbeat(
+        queue, interval=min(SHARED_QUEUE_HEARTBEAT, timeout / 3.0))
+    heartbeat.start()
+    workers = get_worker_count(workers)
+    try:
+        with ldtutils.Dispatcher(workers=workers,
+                                 name='SharedConversion') as dispatcher:
+            for future in [dispatcher.submit(work) for i in range(workers)]:
+                future.result()
+    finally:
+        heartbeat.stop()
+    return results
+
+
+def finish_shared(queue_folder):
+    """
+    Record the finished conversions of a SharedQueue in their manifests.
+
+    Args:
+        queue_folder (str): shared queue folder.
+
+    Returns:
+        list. ConversionResult of every finished file.
+
+    """
+    queue = SharedQueue(queue_folder)
+    use_hash = queue.get_settings().get('use_hash', False)
+    manifests = ManifestCache()
+    results = []
+    for state in ('done', 'failed'):
+        for job_id, job in queue.jobs(state):
+            for data in job.get('results') or [
+                    {'source': job['source'], 'target': job['target'],
+                     'returncode': 1, 'error': job.get('error')}]:
+                result = ConversionResult(
+                    data['source'], data['target'],
+                    returncode=data.get('returncode'),
+                    stderr=data.get('error') or '',
+                    duration=data.get('duration') or 0.0,
+                    duplicate_of=data.get('duplicate_of'))
+                if result.succeeded:
+                    manifests.get(result.source).record(
+                        result.source, result.target, job['args'],
+                        use_hash=use_hash)
+                results.append(result)
+    manifests.save()
+    return results
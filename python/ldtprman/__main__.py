@@ -0,0 +1,324 @@
+"""
+.. module:: ldtprman.__main__
+   :synopsis: Headless texture conversion command line.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+Convert the textures in folders to .tex, streaming a json object per line
+to stdout, with the progress of each file. Only requires the LOOKDEVTOOLS
+environment variable, no dcc, Qt or display.
+
+Example:
+    python -m ldtprman /textures/asset -r -e .exr -e .tif -w 16
+
+Many hosts can share a conversion through a queue in a shared folder,
+submitting the jobs once, running workers on each host, and reporting
+the progress from any of them:
+    python -m ldtprman /textures/asset -r --shared /nas/queues/asset
+    python -m ldtprman --shared /nas/queues/asset --work
+    python -m ldtprman --shared /nas/queues/asset --progress --wait
+
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import logging
+import argparse
+
+import ldtutils
+import ldtprman
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line arguments.
+
+    Kwargs:
+        argv (list): arguments, defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace.
+
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m ldtprman',
+        description='Convert textures to .tex renderman format.')
+    parser.add_argument('folders', nargs='*',
+                        help='folders to search textures in')
+    parser.add_argument('-e', '--extension', action='append',
+                        dest='extensions',
+                        help='file extension to convert, for ie: .exr, '
+                             'can be repeated. Defaults to all files')
+    parser.add_argument('-p', '--pattern',
+                        help='only convert file names containing this')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='search subdirectories')
+    parser.add_argument('--include-converted', action='store_true',
+                        help='also list files with a converter extension, '
+                             'as .tex and .tx, they are skipped by default')
+    parser.add_argument('-c', '--converter',
+                        choices=sorted(ldtprman.CONVERTERS),
+                        help='converter backend, defaults to txmake')
+    parser.add_argument('-a', '--args',
+                        help='converter arguments, defaults to "%s" for '
+                             'txmake' % ' '.join(ldtprman.TXMAKE_ARGS))
+    parser.add_argument('-b', '--batch-size', type=int,
+                        help='small textures converted per invocation, '
+                             'if the converter supports it')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='concurrent conversions, defaults to the cpu '
+                             'count')
+    parser.add_argument('-s', '--stage', action='store_true',
+                        help='convert in a local scratch folder, and move '
+                             'the converted textures into place')
+    parser.add_argument('--scratch',
+                        help='local scratch folder, implies --stage')
+    parser.add_argument('--io-transfers', type=int,
+                        help='concurrent network storage transfers when '
+                             'staging, defaults to %s' %
+                             ldtprman.CONVERSION_IO_TRANSFERS)
+    parser.add_argument('--io-bandwidth', type=float,
+                        help='network storage MB per second when staging, '
+                             'defaults to no limit')
+    parser.add_argument('-t', '--file-timeout', type=float,
+                        help='seconds before a conversion is killed, per '
+                             'file')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='convert up to date textures')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='only list the textures to convert, nothing '
+                             'is queued or converted with --shared')
+    parser.add_argument('--hash', action='store_true',
+                        help='compare content hashes of touched textures')
+    parser.add_argument('--no-precheck', action='store_true',
+                        help='convert textures that are already tiled and '
+                             'mipmapped')
+    parser.add_argument('--no-dedupe', action='store_true',
+                        help='convert byte identical textures separately')
+    parser.add_argument('--shared',
+                        help='shared queue folder, folders conversions are '
+                             'queued there instead of converted')
+    parser.add_argument('--work', action='store_true',
+                        help='convert the shared queue jobs, until none is '
+                             'left')
+    parser.add_argument('--progress', action='store_true',
+                        help='report the shared queue progress')
+    parser.add_argument('--wait', action='store_true',
+                        help='with --progress, report it until the queue '
+                             'is finished, then record the conversions')
+    parser.add_argument('--timeout', type=float,
+                        default=ldtprman.SHARED_QUEUE_TIMEOUT,
+                        help='seconds without heartbeat before a shared '
+                             'queue claim is reclaimed')
+    parser.add_argument('--interval', type=float, default=10.0,
+                        help='seconds between --wait progress reports')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='log to stderr')
+    options = parser.parse_args(argv)
+    if not options.folders and not (options.shared and
+                                    (options.work or options.progress)):
+        parser.error('folders are required, unless running --work or '
+                     '--progress on a --shared queue')
+    return options
+
+
+def get_source_files(folder, options):
+    """
+    Search the textures to convert in a folder.
+
+    Files with a converter extension, as .tex and .tx, are converted
+    textures, and skipped unless --include-converted is set.
+
+    Args:
+        folder (str): folder to search textures in.
+        options (argparse.Namespace): command line options.
+
+    Returns:
+        list. File paths.
+
+    """
+    file_list = ldtutils.get_files_in_folder(
+        folder, recursive=options.recursive, pattern=options.pattern,
+        extensions=options.extensions)
+    if options.include_converted:
+        return file_list
+    converted = set(converter.extension
+                    for converter in ldtprman.CONVERTERS.values())
+    return [file_path for file_path in file_list
+            if os.path.splitext(file_path)[1].lower() not in converted]
+
+
+def create_converter(options, name=None):
+    """
+    Create a converter backend, with the command line batch size and
+    timeout.
+
+    Args:
+        options (argparse.Namespace): command line options.
+
+    Kwargs:
+        name (str): backend name, defaults to the command line one, or
+                    txmake.
+
+    Returns:
+        Converter.
+
+    """
+    kwargs = {'timeout': options.file_timeout}
+    # Keep the converter default batch size, unless one was given
+    if options.batch_size:
+        kwargs['batch_size'] = options.batch_size
+    return ldtprman.get_converter(name or options.converter, **kwargs)
+
+
+def emit(event, **data):
+    """
+    Write a progress event to stdout, as a json line.
+
+    Args:
+        event (str): event name.
+
+    Kwargs:
+        data: event data.
+
+    """
+    data['event'] = event
+    data['time'] = time.time()
+    sys.stdout.write(json.dumps(data, sort_keys=True) + '\n')
+    sys.stdout.flush()
+
+
+def emit_result(result):
+    """Write a ConversionResult progress event to stdout."""
+    emit('file', source=result.source, target=result.target,
+         returncode=result.returncode, duration=result.duration,
+         skipped=result.skipped, duplicate_of=result.duplicate_of,
+         error=(result.stderr or None) if not result.succeeded else None)
+
+
+def main(argv=None):
+    """
+    Run the command line.
+
+    Kwargs:
+        argv (list): arguments, defaults to sys.argv.
+
+    Returns:
+        int. Exit code, 1 if any conversion failed.
+
+    """
+    options = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if options.verbose else logging.WARNING,
+        stream=sys.stderr)
+    args = shlex.split(options.args) if options.args is not None else None
+    converter = create_converter(options)
+    staging = None
+    if options.stage or options.scratch:
+        kwargs = {}
+        if options.scratch:
+            kwargs['folder'] = options.scratch
+        if options.io_transfers:
+            kwargs['transfers'] = options.io_transfers
+        if options.io_bandwidth:
+            kwargs['bandwidth'] = options.io_bandwidth * 1024 * 1024
+        staging = ldtprman.StagingArea(**kwargs)
+    if options.shared:
+        return main_shared(options, args, converter, staging)
+    failed = 0
+    for folder in options.folders:
+        file_list = get_source_files(folder, options)
+        emit('folder', folder=folder, files=len(file_list))
+        if options.dry_run:
+            for job in ldtprman.convert_to_tx(
+                    file_list, args=args, force=options.force,
+                    dry_run=True, use_hash=options.hash,
+                    converter=converter,
+                    precheck=not options.no_precheck):
+                emit('planned', source=job.source, target=job.target,
+                     args=job.args)
+            continue
+        start = time.time()
+        results = ldtprman.convert_to_tx(
+            file_list, args=args, workers=options.workers,
+            force=options.force, use_hash=options.hash,
+            dedupe=not options.no_dedupe,
+            queue_path=ldtprman.get_queue_path(folder),
+            callback=emit_result, converter=converter, staging=staging,
+            precheck=not options.no_precheck)
+        report = ldtprman.get_conversion_report(results)
+        failed += report['failed']
+        emit('done', folder=folder, duration=time.time() - start, **report)
+    return 1 if failed else 0
+
+
+def main_shared(options, args, converter, staging):
+    """
+    Run the shared queue command line.
+
+    Args:
+        options (argparse.Namespace): command line options.
+        args (list): converter arguments.
+        converter (Converter): converter backend.
+        staging (StagingArea): local scratch staging, or None.
+
+    Returns:
+        int. Exit code, 1 if any conversion failed.
+
+    """
+    for folder in options.folders:
+        file_list = get_source_files(folder, options)
+        if options.dry_run:
+            emit('folder', folder=folder, files=len(file_list))
+            for job in ldtprman.convert_to_tx(
+                    file_list, args=args, force=options.force,
+                    dry_run=True, use_hash=options.hash,
+                    converter=converter,
+                    precheck=not options.no_precheck):
+                emit('planned', source=job.source, target=job.target,
+                     args=job.args)
+            continue
+        queued = ldtprman.submit_shared(
+            file_list, options.shared, args=args, force=options.force,
+            use_hash=options.hash, dedupe=not options.no_dedupe,
+            converter=converter, precheck=not options.no_precheck)
+        emit('queued', folder=folder, files=len(file_list), jobs=queued)
+    failed = 0
+    if options.work and not options.dry_run:
+        start = time.time()
+        if not options.converter:
+            # Convert with the backend the jobs were submitted with
+            converter = create_converter(
+                options, ldtprman.SharedQueue(
+                    options.shared).get_settings().get('converter'))
+        results = ldtprman.run_shared_worker(
+            options.shared, workers=options.workers, converter=converter,
+            staging=staging, callback=emit_result, timeout=options.timeout,
+            poll_interval=min(5.0, options.timeout / 2.0))
+        report = ldtprman.get_conversion_report(results)
+        failed += report['failed']
+        emit('worker_done', queue=options.shared,
+             duration=time.time() - start, **report)
+    if options.progress:
+        queue = ldtprman.SharedQueue(options.shared, timeout=options.timeout)
+        progress = queue.progress()
+        emit('progress', queue=options.shared, **progress)
+        while options.wait and not progress['finished']:
+            time.sleep(options.interval)
+            progress = queue.progress()
+            emit('progress', queue=options.shared, **progress)
+        if options.wait:
+            report = ldtprman.get_conversion_report(
+                ldtprman.finish_shared(options.shared))
+            failed += report['failed']
+            emit('done', queue=options.shared, **report)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
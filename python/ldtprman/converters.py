@@ -0,0 +1,395 @@
+"""
+.. module:: converters
+   :synopsis: Texture converter backends, txmake, maketx and oiiotool.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+"""
+
+import os
+import sys
+import logging
+import platform
+
+import ldtutils
+
+logger = logging.getLogger(__name__)
+
+# Were are assuming txmake exists in the PATH, and is all ready to go.
+PLATFORM = platform.system()
+if PLATFORM == 'Windows':
+    TXMAKE_EXEC = 'txmake.exe'
+else:
+    TXMAKE_EXEC = 'txmake'
+
+#: Default txmake arguments
+# example command line
+# txmake -compression dwaa -mode periodic in.tif out.tex
+TXMAKE_ARGS = ['-compression', 'dwaa', '-mode', 'periodic']
+
+
+class ConversionResult(object):
+    """
+    Result of a texture conversion.
+
+    Args:
+        source (str): source texture file path.
+        target (str): converted texture file path.
+
+    Kwargs:
+        command (list): converter command line.
+        returncode (int): converter exit code, None if it could not run.
+        stdout (str): converter standard output.
+        stderr (str): converter standard error, or the error message
+                      if it could not run.
+        duration (float): conversion wall time in seconds.
+        skipped (bool): True if the converted file was up to date.
+        duplicate_of (str): source file path this file is identical to,
+                            its converted file was linked instead.
+
+    """
+
+    def __init__(self, source, target, command=None, returncode=None,
+                 stdout='', stderr='', duration=0.0, skipped=False,
+                 duplicate_of=None):
+        """Initialize the ConversionResult."""
+        self.source = source
+        self.target = target
+        self.command = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.skipped = skipped
+        self.duplicate_of = duplicate_of
+
+    def __repr__(self):
+        return 'ConversionResult(%r, returncode=%r, duration=%.2f%s)' % (
+            self.source, self.returncode, self.duration,
+            ', skipped=True' if self.skipped else '')
+
+    @property
+    def succeeded(self):
+        """bool. True if the converter exited without errors."""
+        return self.returncode == 0
+
+
+class ConversionJob(object):
+    """
+    A planned texture conversion.
+
+    Args:
+        source (str): source texture file path.
+        target (str): converted texture file path.
+        args (list): converter arguments.
+
+    Kwargs:
+        info (ImageInfo): source image properties, if they were read.
+
+    """
+
+    def __init__(self, source, target, args, info=None):
+        """Initialize the ConversionJob."""
+        self.source = source
+        self.target = target
+        self.args = list(args)
+        self.info = info
+
+    def __repr__(self):
+        return 'ConversionJob(%r, %r)' % (self.source, self.target)
+
+
+def is_same_file(source, target):
+    """Return True if both paths are the same file, or the same path."""
+    if os.path.normcase(os.path.abspath(source)) == \
+            os.path.normcase(os.path.abspath(target)):
+        return True
+    try:
+        return os.path.samefile(source, target)
+    except (OSError, AttributeError):
+        return False
+
+
+class Converter(object):
+    """
+    Texture converter backend.
+
+    A converter runs one process per batch of jobs. Backends that can
+    convert many files in one invocation set a batch_size bigger than 1,
+    amortizing the process startup, and license checkout, of small
+    textures.
+
+    Kwargs:
+        executable (str): converter executable, defaults to the backend one.
+        batch_size (int): maximum files per invocation.
+        timeout (float): seconds before an invocation is killed, per file
+                         in the batch, None for no limit.
+
+    """
+
+    #: Backend name
+    name = None
+    #: Converter executable, expected in the PATH
+    executable = None
+    #: Converted files extension
+    extension = '.tex'
+    #: Default converter arguments
+    default_args = []
+    #: Maximum files per invocation the backend supports, None if unlimited
+    max_batch_size = 1
+
+    def __init__(self, executable=None, batch_size=None, timeout=None):
+        """Initialize the Converter."""
+        self.timeout = timeout
+        if executable is not None:
+            self.executable = executable
+        if batch_size is None:
+            batch_size = self.max_batch_size or 1
+        if self.max_batch_size:
+            batch_size = min(batch_size, self.max_batch_size)
+        self.batch_size = max(1, batch_size)
+
+    def __repr__(self):
+        return '%s(%r, batch_size=%s)' % (self.__class__.__name__,
+                                          self.executable, self.batch_size)
+
+    def get_target(self, file_path):
+        """
+        Get the converted file path of a texture, next to the source file.
+
+        Args:
+            file_path (str): source texture file path.
+
+        Returns:
+            str. converted file path.
+
+        """
+        return os.path.splitext(file_path)[0] + self.extension
+
+    def is_converted(self, file_path):
+        """
+        Check if a file is already in the converter output format.
+
+        Args:
+            file_path (str): texture file path.
+
+        Returns:
+            bool. True if the file has the converter extension.
+
+        """
+        return os.path.splitext(file_path)[1].lower() == self.extension
+
+    def get_command(self, jobs):
+        """
+        Get the command line converting a batch of jobs.
+
+        Args:
+            jobs (list): ConversionJob list, sharing the same arguments.
+
+        Returns:
+            list. Command line.
+
+        """
+        raise NotImplementedError
+
+    def refuse(self, job):
+        """Fail a job whose target is its source, without running it."""
+        message = 'Not converting %s, its target is the source file' % \
+            job.source
+        logger.error(message)
+        return ConversionResult(job.source, job.target, returncode=1,
+                                stderr=message)
+
+    def convert(self, jobs):
+        """
+        Convert a batch of jobs in a single invocation.
+
+        When a batch fails, its files are converted again one at a time,
+        a partly written target is not a successful conversion. Jobs whose
+        target is their source file are failed, and not run.
+
+        Args:
+            jobs (list): ConversionJob list, sharing the same arguments.
+
+        Returns:
+            list. ConversionResult per job, in the jobs order.
+
+        """
+        refused = [job for job in jobs if is_same_file(job.source, job.target)]
+        if refused:
+            results = dict((job.source, self.refuse(job)) for job in refused)
+            remaining = [job for job in jobs if job.source not in results]
+            if remaining:
+                results.update((result.source, result)
+                               for result in self.convert(remaining))
+            return [results[job.source] for job in jobs]
+        for job in jobs:
+            # Do not write through a hardlink shared with deduplicated
+            # textures
+            try:
+                if os.stat(job.target).st_nlink > 1:
+                    os.remove(job.target)
+            except OSError:
+                pass
+        command = self.get_command(jobs)
+        for job in jobs:
+            logger.info('Converting %s into %s format' %
+                        (os.path.basename(job.source), self.extension))
+        command_result = ldtutils.run_command(
+            command,
+            timeout=self.timeout * len(jobs) if self.timeout else None)
+        stdout = command_result.stdout
+        stderr = command_result.stderr
+        returncode = command_result.returncode
+        if returncode is None:
+            logger.error('%s was not found in the PATH!' % self.executable)
+        elif command_result.timed_out:
+            stderr = 'Killed after %.1f seconds\n%s' % (
+                command_result.duration, stderr)
+        if returncode and len(jobs) > 1:
+            logger.warning('Batch of %s files failed, exit code %s, '
+                           'converting them one at a time' %
+                           (len(jobs), returncode))
+            results = []
+            for job in jobs:
+                results.extend(self.convert([job]))
+            return results
+        duration = command_result.duration / len(jobs)
+        results = []
+        for job in jobs:
+            result = ConversionResult(job.source, job.target,
+                                      command=command,
+                                      returncode=returncode,
+                                      stdout=stdout, stderr=stderr,
+                                      duration=duration)
+            if result.returncode:
+                logger.error('Failed to convert %s, exit code %s:\n%s' %
+                             (job.source, result.returncode, result.stderr))
+            results.append(result)
+        return results
+
+
+class TxMakeConverter(Converter):
+    """Renderman txmake converter, one file per invocation."""
+
+    name = 'txmake'
+    executable = TXMAKE_EXEC
+    extension = '.tex'
+    default_args = TXMAKE_ARGS
+
+    def get_command(self, jobs):
+        """Get the txmake command line of a single job."""
+        job, = jobs
+        return [self.executable] + job.args + [job.source, job.target]
+
+
+class MakeTxConverter(Converter):
+    """OpenImageIO maketx converter, one file per invocation."""
+
+    name = 'maketx'
+    executable = 'maketx'
+    extension = '.tx'
+    default_args = ['--oiio']
+
+    def get_command(self, jobs):
+        """Get the maketx command line of a single job."""
+        job, = jobs
+        return [self.executable] + job.args + [job.source, '-o', job.target]
+
+
+class OiioToolConverter(Converter):
+    """
+    OpenImageIO oiiotool converter, many files per invocation.
+
+    Each file is read, written as a texture with -otex, and popped from the
+    image stack, so memory does not grow with the batch.
+
+    """
+
+    name = 'oiiotool'
+    executable = 'oiiotool'
+    extension = '.tx'
+    default_args = []
+    max_batch_size = None
+
+    def __init__(self, executable=None, batch_size=32, timeout=None):
+        """Initialize the OiioToolConverter."""
+        super(OiioToolConverter, self).__init__(executable, batch_size, timeout)
+
+    def get_command(self, jobs):
+        """Get the oiiotool command line of a batch of jobs."""
+        command = [self.executable]
+        for job in jobs:
+            command += [job.source] + job.args + \
+                ['-otex', job.target, '--pop']
+        return command
+
+
+#: Python stand-in converter, copies each source to its target. Arguments
+#: are followed by "--" and the source and target pairs.
+PYTHON_CONVERTER_SCRIPT = """
+import sys, shutil
+failed = 0
+paths = sys.argv[sys.argv.index('--') + 1:]
+for source, target in zip(paths[::2], paths[1::2]):
+    try:
+        shutil.copyfile(source, target)
+    except (IOError, OSError) as error:
+        sys.stderr.write('%s: %s\\n' % (source, error))
+        failed += 1
+sys.exit(1 if failed else 0)
+"""
+
+
+class PythonConverter(Converter):
+    """
+    Stand-in converter, copying sources to their targets in a python
+    process, for ie: to test conversion batches without renderman.
+
+    """
+
+    name = 'python'
+    executable = sys.executable
+    extension = '.tex'
+    default_args = []
+    max_batch_size = None
+
+    def __init__(self, executable=None, batch_size=32, timeout=None):
+        """Initialize the PythonConverter."""
+        super(PythonConverter, self).__init__(executable, batch_size, timeout)
+
+    def get_command(self, jobs):
+        """Get the stand-in command line of a batch of jobs."""
+        command = [self.executable, '-c', PYTHON_CONVERTER_SCRIPT]
+        command += jobs[0].args + ['--']
+        for job in jobs:
+            command += [job.source, job.target]
+        return command
+
+
+#: Converter backends by name
+CONVERTERS = dict((converter.name, converter) for converter in (
+    TxMakeConverter, MakeTxConverter, OiioToolConverter, PythonConverter))
+
+
+def get_converter(converter=None, **kwargs):
+    """
+    Get a converter backend.
+
+    Kwargs:
+        converter (str or Converter): backend name or instance, defaults
+                                      to txmake.
+        **kwargs: batch_size and timeout, of backends created by name.
+
+    Returns:
+        Converter.
+
+    """
+    if converter is None:
+        converter = TxMakeConverter.name
+    if isinstance(converter, Converter):
+        return converter
+    if converter not in CONVERTERS:
+        raise ValueError('Unknown converter %s, expected one of: %s' %
+                         (converter, ', '.join(sorted(CONVERTERS))))
+    return CONVERTERS[converter](**kwargs)
@@ -0,0 +1,244 @@
+"""
+.. module:: jobqueue
+   :synopsis: Persistent, resumable texture conversion job queue.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+"""
+
+import os
+import json
+import time
+import logging
+import sqlite3
+
+from ldtcommon import CONVERSION_RETRIES
+from ldtcommon import CONVERSION_RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+#: Job states
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ConversionQueue(object):
+    """
+    Conversion jobs in a sqlite database.
+
+    Jobs are pending, running, done or failed. A job left running by a
+    crashed batch is pending again when the queue is opened, and done
+    jobs are not converted again while their source is unchanged, so
+    adding the jobs of an interrupted batch resumes it. Failed jobs are
+    retried, waiting a delay that doubles on each retry.
+
+    Kwargs:
+        path (str): database file path, defaults to an in memory queue.
+        retries (int): retries of a failed job.
+        retry_delay (float): seconds to wait before the first retry.
+
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            source TEXT PRIMARY KEY,
+            target TEXT,
+            args TEXT,
+            size INTEGER,
+            mtime REAL,
+            state TEXT,
+            attempts INTEGER,
+            next_attempt REAL,
+            error TEXT);
+        CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+        """
+
+    def __init__(self, path=':memory:', retries=CONVERSION_RETRIES,
+                 retry_delay=CONVERSION_RETRY_DELAY):
+        """Initialize the ConversionQueue, and open its database."""
+        self.path = path
+        self.retries = retries
+        self.retry_delay = retry_delay
+        if path != ':memory:':
+            folder = os.path.dirname(os.path.abspath(path))
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+        self._connection = sqlite3.connect(path)
+        self._connection.text_factory = str
+        self._connection.executescript(self._SCHEMA)
+        with self._connection:
+            resumed = self._connection.execute(
+                'UPDATE jobs SET state = ? WHERE state = ?',
+                (PENDING, RUNNING)).rowcount
+        if resumed:
+            logger.info('Resuming %s interrupted conversions from %s' %
+                        (resumed, path))
+
+    def close(self):
+        """Close the queue database."""
+        self._connection.close()
+
+    def submit(self, jobs):
+        """
+        Set the conversion jobs of a batch.
+
+        Jobs already done, with the same target and arguments, and an
+        unchanged source, are kept done. Any other job is pending, with
+        its retries reset. Jobs of other batches are removed.
+
+        Args:
+            jobs (list): list of ConversionJob.
+
+        Returns:
+            list. ConversionJob list already done.
+
+        """
+        stored = dict(
+            (row[0], row[1:]) for row in self._connection.execute(
+                'SELECT source, target, args, size, mtime, state FROM jobs'))
+        done = []
+        rows = []
+        sources = set()
+        for job in jobs:
+            sources.add(job.source)
+            try:
+                source_stat = os.stat(job.source)
+                size, mtime = source_stat.st_size, source_stat.st_mtime
+            except OSError:
+                size, mtime = None, None
+            args = json.dumps(job.args)
+            if stored.get(job.source) == (job.target, args, size, mtime, DONE):
+                done.append(job)
+                continue
+            rows.append((job.source, job.target, args, size, mtime,
+                         PENDING, 0, 0.0, None))
+        stale = [(source,) for source in stored if source not in sources]
+        with self._connection:
+            self._connection.executemany(
+                'DELETE FROM jobs WHERE source = ?', stale)
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO jobs (source, target, args, size, '
+                'mtime, state, attempts, next_attempt, error) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return done
+
+    def claim(self, limit=None):
+        """
+        Mark the pending jobs ready to run as running.
+
+        Kwargs:
+            limit (int): maximum number of jobs to claim.
+
+        Returns:
+            list. (source, target, args, source size) tuples.
+
+        """
+        query = ('SELECT source, target, args, size FROM jobs '
+                 'WHERE state = ? AND next_attempt <= ? ORDER BY rowid')
+        parameters = (PENDING, time.time())
+        if limit:
+            query += ' LIMIT ?'
+            parameters += (limit,)
+        jobs = [(source, target, json.loads(args), size)
+                for source, target, args, size in
+                self._connection.execute(query, parameters).fetchall()]
+        with self._connection:
+            self._connection.executemany(
+                'UPDATE jobs SET state = ? WHERE source = ?',
+                [(RUNNING, job[0]) for job in jobs])
+        return jobs
+
+    def done(self, source):
+        """
+        Mark a job as done.
+
+        Args:
+            source (str): job source file path.
+
+        """
+        with self._connection:
+            self._connection.execute(
+                'UPDATE jobs SET state = ?, error = NULL WHERE source = ?',
+                (DONE, source))
+
+    def fail(self, source, error=None, retry=True):
+        """
+        Mark a job as failed, or as pending if it has retries left.
+
+        Args:
+            source (str): job source file path.
+
+        Kwargs:
+            error (str): failure message.
+            retry (bool): False if retrying the job can't succeed.
+
+        Returns:
+            bool. True if the job will be retried.
+
+        """
+        row = self._connection.execute(
+            'SELECT attempts FROM jobs WHERE source = ?', (source,)).fetchone()
+        attempts = (row[0] if row else 0) + 1
+        retry = retry and attempts <= self.retries
+        state = PENDING if retry else FAILED
+        next_attempt = time.time() + self.retry_delay * 2 ** (attempts - 1)
+        with self._connection:
+            self._connection.execute(
+                'UPDATE jobs SET state = ?, attempts = ?, next_attempt = ?, '
+                'error = ? WHERE source = ?',
+                (state, attempts, next_attempt, error, source))
+        return retry
+
+    def next_attempt(self):
+        """
+        Get the time the next pending job is ready to run.
+
+        Returns:
+            float. Time in seconds since the epoch, None if no job is pending.
+
+        """
+        return self._connection.execute(
+            'SELECT MIN(next_attempt) FROM jobs WHERE state = ?',
+            (PENDING,)).fetchone()[0]
+
+    def counts(self):
+        """
+        Get the number of jobs in each state.
+
+        Returns:
+            dict. Job count by state.
+
+        """
+        counts = dict((state, 0) for state in (PENDING, RUNNING, DONE, FAILED))
+        counts.update(self._connection.execute(
+            'SELECT state, COUNT(*) FROM jobs GROUP BY state'))
+        return counts
+
+    def failed(self):
+        """
+        Get the jobs that ran out of retries.
+
+        Returns:
+            list. (source, error) tuples.
+
+        """
+        return self._connection.execute(
+            'SELECT source, error FROM jobs WHERE state = ? ORDER BY rowid',
+            (FAILED,)).fetchall()
+
+    def clear(self, state=DONE):
+        """
+        Remove jobs from the queue.
+
+        Kwargs:
+            state (str): state of the jobs to remove, None for all jobs.
+
+        """
+        with self._connection:
+            if state is None:
+                self._connection.execute('DELETE FROM jobs')
+            else:
+                self._connection.execute(
+                    'DELETE FROM jobs WHERE state = ?', (state,))
@@ -0,0 +1,157 @@
+"""
+.. module:: manifest
+   :synopsis: Texture conversion manifests, to skip up to date conversions.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+"""
+
+import os
+import logging
+
+import ldtutils
+from ldtcommon import CONVERSION_MANIFEST_NAME
+
+logger = logging.getLogger(__name__)
+
+#: Manifest file name, one per source textures folder
+MANIFEST_NAME = CONVERSION_MANIFEST_NAME
+
+
+class ConversionManifest(object):
+    """
+    Conversion records of the source textures in a folder.
+
+    Each record has the source size, mtime and optional content hash,
+    the converter arguments, and the converted file path and mtime.
+    A conversion is up to date when none of those changed.
+
+    Args:
+        folder (str): source textures folder.
+
+    """
+
+    def __init__(self, folder):
+        """Initialize the ConversionManifest, loading it if it exists."""
+        self.folder = folder
+        self.file_path = os.path.join(folder, MANIFEST_NAME)
+        self.records = {}
+        self.modified = False
+        if os.path.isfile(self.file_path):
+            try:
+                self.records = ldtutils.load_json(self.file_path)
+            except ValueError:
+                logger.warning('Invalid conversion manifest, ignoring it: %s'
+                               % self.file_path)
+
+    def is_up_to_date(self, source, target, args, use_hash=False):
+        """
+        Check if a conversion can be skipped.
+
+        Args:
+            source (str): source texture file path.
+            target (str): converted texture file path.
+            args (list): converter arguments.
+
+        Kwargs:
+            use_hash (bool): if the source size or mtime changed, compare
+                             its content hash before reconverting.
+
+        Returns:
+            bool. True if the converted file is up to date.
+
+        """
+        record = self.records.get(os.path.basename(source))
+        if not record:
+            return False
+        if record.get('target') != target or \
+                record.get('args') != list(args):
+            return False
+        try:
+            source_stat = os.stat(source)
+            target_mtime = os.stat(target).st_mtime
+        except OSError:
+            return False
+        if record.get('target_mtime') != target_mtime:
+            return False
+        if record.get('size') == source_stat.st_size and \
+                record.get('mtime') == source_stat.st_mtime:
+            return True
+        if use_hash and record.get('hash') and \
+                record.get('size') == source_stat.st_size and \
+                record['hash'] == ldtutils.get_file_hash(source):
+            # Touched, but not modified, keep the new mtime
+            record['mtime'] = source_stat.st_mtime
+            self.modified = True
+            return True
+        return False
+
+    def record(self, source, target, args, use_hash=False):
+        """
+        Record a successful conversion.
+
+        Args:
+            source (str): source texture file path.
+            target (str): converted texture file path.
+            args (list): converter arguments.
+
+        Kwargs:
+            use_hash (bool): record the source content hash.
+
+        """
+        try:
+            source_stat = os.stat(source)
+            target_mtime = os.stat(target).st_mtime
+        except OSError:
+            logger.warning('Could not record conversion of %s' % source)
+            return
+        self.records[os.path.basename(source)] = {
+            'size': source_stat.st_size,
+            'mtime': source_stat.st_mtime,
+            'hash': ldtutils.get_file_hash(source) if use_hash else None,
+            'args': list(args),
+            'target': target,
+            'target_mtime': target_mtime,
+        }
+        self.modified = True
+
+    def save(self):
+        """Save the manifest, if it was modified."""
+        if not self.modified:
+            return
+        try:
+            ldtutils.save_json(self.file_path, self.records)
+            self.modified = False
+        except (IOError, OSError) as error:
+            logger.warning('Could not save conversion manifest %s: %s' %
+                           (self.file_path, error))
+
+
+class ManifestCache(object):
+    """Load the ConversionManifest of each folder once."""
+
+    def __init__(self):
+        """Initialize the ManifestCache."""
+        self.manifests = {}
+
+    def get(self, file_path):
+        """
+        Get the manifest of a source texture folder.
+
+        Args:
+            file_path (str): source texture file path.
+
+        Returns:
+            ConversionManifest.
+
+        """
+        folder = os.path.dirname(os.path.abspath(file_path))
+        manifest = self.manifests.get(folder)
+        if manifest is None:
+            manifest = self.manifests[folder] = ConversionManifest(folder)
+        return manifest
+
+    def save(self):
+        """Save all modified manifests."""
+        for manifest in self.manifests.values():
+            manifest.save()
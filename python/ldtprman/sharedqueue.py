@@ -0,0 +1,458 @@
+"""
+.. module:: sharedqueue
+   :synopsis: Conversion job queue in a shared folder, for many hosts.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+"""
+
+import os
+import json
+import time
+import bisect
+import socket
+import logging
+import threading
+
+import ldtutils
+from ldtcommon import CONVERSION_RETRIES
+from ldtcommon import CONVERSION_RETRY_DELAY
+from ldtcommon import SHARED_QUEUE_HEARTBEAT
+from ldtcommon import SHARED_QUEUE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+#: Job states, each one is a subfolder of the queue folder
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+STATES = (PENDING, RUNNING, DONE, FAILED)
+
+
+class SharedQueue(object):
+    """
+    Conversion jobs in a shared folder.
+
+    Each job is a json file in the subfolder of its state. Workers on any
+    host claim pending jobs by moving them to the running folder, holding
+    the queue file lock, and heartbeat their claims by touching them.
+    Claims without heartbeat for longer than the timeout are stale, their
+    jobs are pending again, and the lost claim counts as a failed attempt.
+    Times are compared against the shared folder clock, not the host one.
+
+    Args:
+        folder (str): shared queue folder.
+
+    Kwargs:
+        retries (int): retries of a failed job.
+        retry_delay (float): seconds to wait before the first retry.
+        timeout (float): seconds without heartbeat before a claim is stale.
+
+    """
+
+    def __init__(self, folder, retries=CONVERSION_RETRIES,
+                 retry_delay=CONVERSION_RETRY_DELAY,
+                 timeout=SHARED_QUEUE_TIMEOUT):
+        """Initialize the SharedQueue, creating its folders."""
+        self.folder = folder
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.owner = '%s:%s' % (socket.gethostname(), os.getpid())
+        for state in STATES:
+            if not os.path.isdir(self._path(state)):
+                try:
+                    os.makedirs(self._path(state))
+                except OSError:
+                    # Created by another worker
+                    if not os.path.isdir(self._path(state)):
+                        raise
+        self.lock = ldtutils.FileLock(os.path.join(folder, 'queue.lock'))
+        self._claimed = set()
+        self._claimed_lock = threading.Lock()
+        # Pending job ids listing, claimed from until it is exhausted
+        self._pending = None
+
+    def __repr__(self):
+        return 'SharedQueue(%r)' % self.folder
+
+    def _path(self, state, job_id=None):
+        """Return a state folder, or a job file path."""
+        if job_id is None:
+            return os.path.join(self.folder, state)
+        return os.path.join(self.folder, state, '%s.json' % job_id)
+
+    def _job_ids(self, state):
+        """Return the sorted job ids in a state."""
+        return sorted(os.path.splitext(name)[0]
+                      for name in os.listdir(self._path(state))
+                      if name.endswith('.json'))
+
+    def _add_pending(self, job_id):
+        """Add a job id made pending to the pending listing, in order."""
+        if self._pending is not None and job_id not in self._pending:
+            bisect.insort(self._pending, job_id)
+
+    @staticmethod
+    def _claim_key(job):
+        """Return what identifies a claim of a job."""
+        return job.get('owner'), job.get('claimed')
+
+    def _read(self, state, job_id):
+        """Return a job, None if it is not in that state anymore."""
+        try:
+            return ldtutils.load_json(self._path(state, job_id))
+        except (IOError, OSError, ValueError):
+            return None
+
+    def now(self):
+        """
+        Get the current time of the shared folder clock.
+
+        Returns:
+            float. Time in seconds since the epoch.
+
+        """
+        clock_path = os.path.join(self.folder, 'clock')
+        with open(clock_path, 'a'):
+            os.utime(clock_path, None)
+        return os.stat(clock_path).st_mtime
+
+    def get_settings(self):
+        """
+        Get the batch settings, for ie: the converter name.
+
+        Returns:
+            dict. Settings, empty if none were saved.
+
+        """
+        settings_path = os.path.join(self.folder, 'settings.json')
+        if not os.path.isfile(settings_path):
+            return {}
+        return ldtutils.load_json(settings_path)
+
+    def submit(self, jobs, duplicates=None, settings=None):
+        """
+        Add conversion jobs to the queue, in dispatch order.
+
+        Args:
+            jobs (list): list of ConversionJob.
+
+        Kwargs:
+            duplicates (dict): duplicate ConversionJob lists, by the source
+                               of the job to run, linked by the workers.
+            settings (dict): batch settings, for ie: the converter name.
+
+        Returns:
+            int. Number of jobs added.
+
+        """
+        duplicates = duplicates or {}
+        with self.lock:
+            if settings is not None:
+                ldtutils.save_json(os.path.join(self.folder, 'settings.json'),
+                                   settings)
+            job_ids = [int(job_id) for state in STATES
+                       for job_id in self._job_ids(state)]
+            next_id = max(job_ids) + 1 if job_ids else 0
+            for index, job in enumerate(jobs):
+                try:
+                    size = os.path.getsize(job.source)
+                except OSError:
+                    size = None
+                ldtutils.save_json(
+                    self._path(PENDING, '%08d' % (next_id + index)),
+                    {'source': job.source, 'target': job.target,
+                     'args': job.args, 'size': size, 'attempts': 0,
+                     'not_before': 0.0,
+                     'duplicates': [
+                         [duplicate.source, duplicate.target]
+                         for duplicate in duplicates.get(job.source, [])]})
+        return len(jobs)
+
+    def reclaim(self):
+        """
+        Make the jobs of stale claims pending again, or failed if they
+        have no retries left. A stale claim is a failed attempt, so a job
+        that kills its workers is not retried forever.
+
+        Returns:
+            int. Number of reclaimed jobs.
+
+        """
+        reclaimed = 0
+        with self.lock:
+            now = self.now()
+            for job_id in self._job_ids(RUNNING):
+                try:
+                    heartbeat = os.stat(self._path(RUNNING, job_id)).st_mtime
+                except OSError:
+                    continue
+                if now - heartbeat < self.timeout:
+                    continue
+                job = self._read(RUNNING, job_id)
+                if job is None:
+                    continue
+                job['attempts'] = job.get('attempts', 0) + 1
+                job['error'] = 'Claim of %s lost, no heartbeat for %.0f ' \
+                    'seconds' % (job.get('owner'), now - heartbeat)
+                state = PENDING if job['attempts'] <= self.retries else FAILED
+                logger.warning('Reclaiming job %s as %s, %s' %
+                               (job_id, state, job['error']))
+                ldtutils.save_json(self._path(state, job_id), job)
+                os.remove(self._path(RUNNING, job_id))
+                if state == PENDING:
+                    self._add_pending(job_id)
+                reclaimed += 1
+        return reclaimed
+
+    def claim(self, limit=1):
+        """
+        Claim pending jobs ready to run.
+
+        The pending folder is listed once, and claimed from until no job
+        of the listing is left, or ready to run, listing it on every claim
+        is slow on network file systems with many jobs.
+
+        Args:
+            limit (int): maximum number of jobs to claim.
+
+        Returns:
+            list. (job id, job dict) tuples.
+
+        """
+        claimed = []
+        with self.lock:
+            now = self.now()
+            listed = self._pending is None
+            while True:
+                if self._pending is None:
+                    self._pending = self._job_ids(PENDING)
+                remaining = []
+                for index, job_id in enumerate(self._pending):
+                    if len(claimed) >= limit:
+                        remaining.extend(self._pending[index:])
+                        break
+                    job = self._read(PENDING, job_id)
+                    if job is None:
+                        # Claimed by another worker
+                        continue
+                    if job.get('not_before', 0.0) > now:
+                        remaining.append(job_id)
+                        continue
+                    job['owner'] = self.owner
+                    job['claimed'] = now
+                    os.rename(self._path(PENDING, job_id),
+                              self._path(RUNNING, job_id))
+                    # Also sets the first heartbeat
+                    ldtutils.save_json(self._path(RUNNING, job_id), job)
+                    claimed.append((job_id, job))
+                self._pending = remaining
+                # Jobs may have been submitted, or made pending, by other
+                # workers since the listing
+                if claimed or listed:
+                    break
+                self._pending = None
+                listed = True
+        with self._claimed_lock:
+            self._claimed.update(job_id for job_id, job in claimed)
+        return claimed
+
+    def heartbeat(self):
+        """
+        Touch the claims of this worker.
+
+        Returns:
+            list. Job ids whose claim was lost.
+
+        """
+        with self._claimed_lock:
+            claimed = list(self._claimed)
+        lost = []
+        for job_id in claimed:
+            try:
+                os.utime(self._path(RUNNING, job_id), None)
+            except OSError:
+                lost.append(job_id)
+        if lost:
+            logger.warning('Lost the claim of jobs: %s' % ', '.join(lost))
+        return lost
+
+    def _release(self, job_id, job, state):
+        """
+        Move a claimed job to a state, and forget its claim.
+
+        A job reclaimed while running is claimed by another worker, or
+        failed out of retries, only a done job overrides its failure.
+
+        """
+        with self._claimed_lock:
+            self._claimed.discard(job_id)
+        with self.lock:
+            running = self._read(RUNNING, job_id)
+            if running is not None and \
+                    self._claim_key(running) != self._claim_key(job):
+                logger.warning('Job %s was reclaimed while running, and '
+                               'claimed by %s' %
+                               (job_id, running.get('owner')))
+                return
+            if running is None:
+                logger.warning('Job %s was reclaimed while running' % job_id)
+                if state != DONE and \
+                        os.path.exists(self._path(FAILED, job_id)):
+                    return
+            ldtutils.save_json(self._path(state, job_id), job)
+            for other_state in (RUNNING, PENDING, FAILED):
+                if other_state != state and \
+                        os.path.exists(self._path(other_state, job_id)):
+                    os.remove(self._path(other_state, job_id))
+            if state == PENDING:
+                self._add_pending(job_id)
+
+    def done(self, job_id, job, results):
+        """
+        Mark a claimed job as done.
+
+        Args:
+            job_id (str): job id.
+            job (dict): claimed job.
+            results (list): ConversionResult of the job, and its
+                            duplicates.
+
+        """
+        job['results'] = [
+            {'source': result.source, 'target': result.target,
+             'returncode': result.returncode, 'duration': result.duration,
+             'duplicate_of': result.duplicate_of,
+             'error': result.stderr if not result.succeeded else None}
+            for result in results]
+        self._release(job_id, job, DONE)
+
+    def fail(self, job_id, job, error=None, retry=True):
+        """
+        Mark a claimed job as failed, or as pending if it has retries left.
+
+        Args:
+            job_id (str): job id.
+            job (dict): claimed job.
+
+        Kwargs:
+            error (str): failure message.
+            retry (bool): False if retrying the job can't succeed.
+
+        Returns:
+            bool. True if the job will be retried.
+
+        """
+        job['attempts'] = job.get('attempts', 0) + 1
+        job['error'] = error
+        retry = retry and job['attempts'] <= self.retries
+        if retry:
+            job['not_before'] = self.now() + \
+                self.retry_delay * 2 ** (job['attempts'] - 1)
+        self._release(job_id, job, PENDING if retry else FAILED)
+        return retry
+
+    def next_attempt(self):
+        """
+        Get the shared clock time the next pending job is ready to run.
+
+        Returns:
+            float. None if no job is pending.
+
+        """
+        times = [job.get('not_before', 0.0) for job in
+                 (self._read(PENDING, job_id)
+                  for job_id in self._job_ids(PENDING)) if job]
+        return min(times) if times else None
+
+    def jobs(self, state):
+        """
+        Get the jobs in a state.
+
+        Args:
+            state (str): job state.
+
+        Returns:
+            list. (job id, job dict) tuples.
+
+        """
+        jobs = []
+        for job_id in self._job_ids(state):
+            job = self._read(state, job_id)
+            if job is not None:
+                jobs.append((job_id, job))
+        return jobs
+
+    def progress(self):
+        """
+        Get the queue progress.
+
+        Returns:
+            dict. Job count by state, running jobs by owner, stale claims,
+            and done files by host.
+
+        """
+        # Jobs move between states holding the lock, listed without it, a
+        # job moved between two listings would be counted in neither
+        with self.lock:
+            progress = dict((state, len(self._job_ids(state)))
+                            for state in STATES)
+            now = self.now()
+            running = self.jobs(RUNNING)
+        owners = {}
+        stale = 0
+        for job_id, job in running:
+            owner = job.get('owner')
+            owners[owner] = owners.get(owner, 0) + 1
+            try:
+                heartbeat = os.stat(self._path(RUNNING, job_id)).st_mtime
+            except OSError:
+                continue
+            if now - heartbeat >= self.timeout:
+                stale += 1
+        hosts = {}
+        for job_id, job in self.jobs(DONE):
+            host = (job.get('owner') or '').rsplit(':', 1)[0]
+            hosts[host] = hosts.get(host, 0) + len(job.get('results', []))
+        progress['owners'] = owners
+        progress['stale'] = stale
+        progress['done_by_host'] = hosts
+        total = sum(progress[state] for state in STATES)
+        progress['total'] = total
+        progress['finished'] = progress[PENDING] + progress[RUNNING] == 0
+        return progress
+
+
+class Heartbeat(threading.Thread):
+    """
+    Thread touching the claims of a SharedQueue worker.
+
+    Args:
+        queue (SharedQueue): queue to heartbeat.
+
+    Kwargs:
+        interval (float): seconds between heartbeats.
+
+    """
+
+    def __init__(self, queue, interval=SHARED_QUEUE_HEARTBEAT):
+        """Initialize the Heartbeat."""
+        super(Heartbeat, self).__init__(name='SharedQueueHeartbeat')
+        self.daemon = True
+        self.queue = queue
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.queue.heartbeat()
+            except Exception as error:
+                logger.error('Heartbeat failed: %s' % error)
+
+    def stop(self):
+        """Stop the heartbeats."""
+        self._stop_event.set()
+        self.join()
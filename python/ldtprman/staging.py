@@ -0,0 +1,137 @@
+"""
+.. module:: staging
+   :synopsis: Convert textures in a local scratch folder.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+
+import ldtutils
+from ldtcommon import CONVERSION_SCRATCH_FOLDER
+from ldtcommon import CONVERSION_IO_TRANSFERS
+from ldtcommon import CONVERSION_IO_BANDWIDTH
+from ldtprman.converters import ConversionJob, ConversionResult
+
+logger = logging.getLogger(__name__)
+
+
+class StagingArea(object):
+    """
+    Convert textures in a local scratch folder.
+
+    Sources are copied to the scratch folder, converted there, and the
+    converted files are copied next to their final path and renamed into
+    place, so readers never see a partially written texture. Copies from
+    and to the network storage share an IOThrottle, limiting them
+    independently of the conversion workers.
+
+    Kwargs:
+        folder (str): local scratch folder.
+        transfers (int): concurrent network storage transfers.
+        bandwidth (float): network storage bytes per second, None for no
+                           limit.
+        stage_sources (bool): copy the sources to the scratch folder, if
+                              False the converter reads them in place.
+
+    """
+
+    def __init__(self, folder=CONVERSION_SCRATCH_FOLDER,
+                 transfers=CONVERSION_IO_TRANSFERS,
+                 bandwidth=CONVERSION_IO_BANDWIDTH, stage_sources=True):
+        """Initialize the StagingArea."""
+        self.folder = folder
+        self.stage_sources = stage_sources
+        self.throttle = ldtutils.IOThrottle(transfers, bandwidth)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+    def __repr__(self):
+        return 'StagingArea(%r, transfers=%s, bandwidth=%s)' % (
+            self.folder, self.throttle.transfers, self.throttle.bandwidth)
+
+    def publish(self, staged_file_path, file_path):
+        """
+        Atomically move a staged file to its final path.
+
+        Args:
+            staged_file_path (str): scratch file path.
+            file_path (str): final file path.
+
+        """
+        temp_file_path = os.path.join(
+            os.path.dirname(file_path),
+            '.%s.%s.tmp' % (os.path.basename(file_path), os.getpid()))
+        try:
+            ldtutils.copy_file(staged_file_path, temp_file_path,
+                               throttle=self.throttle)
+            if os.name == 'nt' and os.path.exists(file_path):
+                os.remove(file_path)
+            os.rename(temp_file_path, file_path)
+        except (IOError, OSError):
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+            raise
+
+    def convert(self, converter, jobs):
+        """
+        Convert a batch of jobs in a scratch folder.
+
+        Args:
+            converter (Converter): converter backend.
+            jobs (list): ConversionJob list, sharing the same arguments.
+
+        Returns:
+            list. ConversionResult per job, in the jobs order, with the
+            final source and target paths.
+
+        """
+        folder = tempfile.mkdtemp(prefix='ldt_conversion_', dir=self.folder)
+        try:
+            staged_jobs = []
+            errors = {}
+            for index, job in enumerate(jobs):
+                name = '%s_%s' % (index, os.path.basename(job.source))
+                source = job.source
+                if self.stage_sources:
+                    source = os.path.join(folder, name)
+                    try:
+                        ldtutils.copy_file(job.source, source,
+                                           throttle=self.throttle)
+                    except (IOError, OSError) as error:
+                        errors[index] = 'Failed to stage %s: %s' % (
+                            job.source, error)
+                        continue
+                target = os.path.join(
+                    folder, '%s_%s' % (index, os.path.basename(job.target)))
+                staged_jobs.append(
+                    (index, ConversionJob(source, target, job.args)))
+            results = [None] * len(jobs)
+            if staged_jobs:
+                staged_results = converter.convert(
+                    [staged_job for index, staged_job in staged_jobs])
+                for (index, staged_job), result in zip(staged_jobs,
+                                                       staged_results):
+                    job = jobs[index]
+                    if result.succeeded:
+                        try:
+                            self.publish(staged_job.target, job.target)
+                        except (IOError, OSError) as error:
+                            result.returncode = 1
+                            result.stderr = 'Failed to publish %s: %s' % (
+                                job.target, error)
+                    result.source = job.source
+                    result.target = job.target
+                    results[index] = result
+            for index, error in errors.items():
+                logger.error(error)
+                results[index] = ConversionResult(
+                    jobs[index].source, jobs[index].target,
+                    returncode=1, stderr=error)
+            return results
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
@@ -5,20 +5,254 @@
 .. moduleauthor:: Ezequiel Mastrasso
 
 """
+import os
 import re
+import sys
+import json
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import bisect
+import hashlib
 import logging
+import sqlite3
+import threading
+import multiprocessing
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 import ldtutils
 import ldtcommon
 from ldtcommon import TEXTURE_CHANNEL_MATCHING_RATIO
+from ldtcommon import UDIM_START
+from ldtcommon import UDIM_END
+from ldtcommon import UDIM_TOKEN
+from ldtcommon import TEXTURE_TABLE_CHUNK_SIZE
+from ldtcommon import TEXTURE_FILE_PATTERN
+from ldtcommon import FILE_SEARCH_EXCLUDE
+from ldtcommon import FILE_SEARCH_PRUNE
+from ldtcommon import CACHE_FOLDER
+from ldtcommon import LIBRARY_WATCHER_INTERVAL
+from ldtcommon import LIBRARY_WATCHER_SETTLE
+from ldtcommon import NETWORK_FILESYSTEMS
 
 logger = logging.getLogger(__name__)
 
+#: Last integer file path part, delimited by "_" or "."
+UDIM_REGEX = re.compile(r'^(.*)(?<![^._])(\d+)(?![^._])', re.S)
+#: Last UDIM_TOKEN of a udim merged path, delimited as the udims
+UDIM_TOKEN_REGEX = re.compile(
+    r'^(.*)(?<![^._])%s(?![^._])' % re.escape(UDIM_TOKEN), re.S)
+
+
+def split_udim(file_path):
+    """
+    Split a file path into its udim merged path and its udim.
+
+    The udim is the last number of the path delimited by "_" or ".",
+    and must be a valid tile number. Only that part of the path is
+    replaced by UDIM_TOKEN.
+
+    Args:
+        file_path (str): a file path.
+
+    Returns:
+        tuple. udim merged file path, and udim (int). If the file has no udim
+        the file path is returned untouched, and the udim is None.
+
+    """
+    match = UDIM_REGEX.match(file_path)
+    if match is None:
+        return file_path, None
+    udim = int(match.group(2))
+    if udim < UDIM_START or udim > UDIM_END:
+        return file_path, None
+    udim_file_path = '%s%s%s' % (match.group(1),
+                                 UDIM_TOKEN,
+                                 file_path[match.end():])
+    return udim_file_path, udim
+
+
+def format_udim(file_path, udim_format):
+    """
+    Replace the udim of a file path by an application udim token.
+
+    Args:
+        file_path (str): a file path, with a udim tile, or udim merged
+                         with UDIM_TOKEN.
+        udim_format (str): udim token, for ie: '<UDIM>' for maya and prman.
+
+    Returns:
+        str. The file path, untouched if it has no udim.
+
+    """
+    file_path = split_udim(file_path)[0]
+    match = UDIM_TOKEN_REGEX.match(file_path)
+    if match is None:
+        return file_path
+    return '%s%s%s' % (match.group(1), udim_format,
+                       file_path[match.end():])
+
+
+class UdimSet(object):
+    """
+    A udim texture, as a single path template, and the udim tiles present.
+
+    The path has the udim replaced by UDIM_TOKEN, tiles are
+    stored as a sorted integer array.
+
+    Args:
+        path (str): udim merged file path.
+
+    Kwargs:
+        tiles (iterable): udim tiles.
+
+    """
+    __slots__ = ('path', 'tiles')
+
+    def __init__(self, path, tiles=None):
+        """Initialize the UdimSet."""
+        self.path = path
+        self.tiles = array('H', sorted(set(tiles or ())))
+
+    def __repr__(self):
+        return 'UdimSet(%r, %r)' % (self.path, self.tile_ranges())
+
+    def __str__(self):
+        return self.path
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def __iter__(self):
+        return iter(self.tiles)
+
+    def __contains__(self, udim):
+        index = bisect.bisect_left(self.tiles, udim)
+        return index < len(self.tiles) and self.tiles[index] == udim
+
+    def __eq__(self, other):
+        if not isinstance(other, UdimSet):
+            return NotImplemented
+        return self.path == other.path and self.tiles == other.tiles
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def file_paths(self):
+        """
+        Get the file path of each tile.
+
+        Returns:
+            list. File paths, sorted by udim. For sets without tiles
+            the path itself.
+
+        """
+        if not self.tiles:
+            return [self.path]
+        head, tail = self.path.rsplit(UDIM_TOKEN, 1)
+        return ['%s%d%s' % (head, udim, tail) for udim in self.tiles]
+
+    def tile_ranges(self):
+        """
+        Get the tiles as a compact ranges string, for ie: '1001-1040,1051'.
+
+        Returns:
+            str. Comma separated tiles and tile ranges.
+
+        """
+        ranges = []
+        start = previous = None
+        for udim in self.tiles:
+            if previous is not None and udim == previous + 1:
+                previous = udim
+                continue
+            if start is not None:
+                ranges.append(self._format_range(start, previous))
+            start = previous = udim
+        if start is not None:
+            ranges.append(self._format_range(start, previous))
+        return ','.join(ranges)
+
+    @staticmethod
+    def _format_range(start, end):
+        if start == end:
+            return '%d' % start
+        return '%d-%d' % (start, end)
+
+    @classmethod
+    def from_tile_ranges(cls, path, tile_ranges):
+        """
+        Create a UdimSet from a tile ranges string.
+
+        Args:
+            path (str): udim merged file path.
+            tile_ranges (str): tile ranges, as returned by tile_ranges().
+
+        Returns:
+            UdimSet.
+
+        Raises:
+            ValueError. Invalid tile ranges.
+
+        """
+        tiles = []
+        for item in tile_ranges.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            start, _, end = item.partition('-')
+            start = int(start)
+            end = int(end) if end else start
+            if end < start:
+                raise ValueError('Invalid udim range: %s' % item)
+            tiles.extend(range(start, end + 1))
+        return cls(path, tiles)
+
+    @classmethod
+    def group(cls, file_list):
+        """
+        Group a file list into UdimSets, in a single pass.
+
+        Args:
+            file_list (list): A list of file paths.
+
+        Returns:
+            list. UdimSets in order of first appearance in the file_list.
+
+        """
+        groups = {}
+        paths = []
+        for file_path in file_list:
+            udim_file_path, udim = split_udim(file_path)
+            tiles = groups.get(udim_file_path)
+            if tiles is None:
+                tiles = groups[udim_file_path] = []
+                paths.append(udim_file_path)
+            if udim is not None:
+                tiles.append(udim)
+        return [cls(path, groups[path]) for path in paths]
+
 
 class TextureFinder():
     """
     Search files in a folder.
 
+    Every file is parsed once when the finder is created. The parsed tokens
+    are kept per file, and an inverted index of token -> value -> file ids
+    is built from them, so searches are set intersections instead of
+    re-parsing the whole file list.
+
     Args:
         template (str): lucidity like file template.
         file_list (list): A list of file paths
@@ -27,14 +261,176 @@ class TextureFinder():
     texture_template = None
     template = None
     file_list = None
+    #: Parsed tokens per file id, file ids are the file_list indices.
+    parsed_files = None
+    #: Inverted index, {token: {value: set(file ids)}}
+    token_index = None
 
-    def __init__(self, file_list, template=None):
+    def __init__(self, file_list, template=None, parsed_files=None):
         """Initilize the TextureFinder."""
         if template:
             self.texture_template = template
             self.template = ldtcommon.texture_file_template(
                 template)
         self.file_list = file_list
+        self.build_index(parsed_files)
+
+    @classmethod
+    def from_index(cls, texture_index, recursive=True, pattern=None,
+                   extensions=None):
+        """
+        Create a TextureFinder from a TextureIndex, without parsing files.
+
+        Args:
+            texture_index (TextureIndex): an up to date texture index.
+
+        Kwargs:
+            recursive, pattern, extensions: file filters,
+            see TextureIndex.file_list.
+
+        Returns:
+            TextureFinder.
+
+        """
+        file_list, parsed_files = texture_index.parsed_files(
+            recursive=recursive, pattern=pattern, extensions=extensions)
+        return cls(file_list, texture_index.texture_template,
+                   parsed_files=parsed_files)
+
+    def build_index(self, parsed_files=None):
+        """
+        Parse all files in file_list, and build the inverted token index.
+
+        Only string token values are indexed, nested tokens from dotted
+        placeholders are kept in parsed_files but are not searchable.
+
+        Kwargs:
+            parsed_files (list): already parsed tokens per file, for ie:
+                                 from a TextureIndex, to skip parsing.
+
+        """
+        self.parsed_files = []
+        self.token_index = {}
+        self._file_ids = {}
+        if not self.texture_template:
+            for file_id, file_path in enumerate(self.file_list):
+                self._file_ids.setdefault(file_path, file_id)
+            return
+        if parsed_files is None:
+            parsed = self.template.parse_many(self.file_list)
+        else:
+            parsed = parsed_files
+        for file_id, tokens in enumerate(parsed):
+            file_path = self.file_list[file_id]
+            if tokens is None:
+                logger.warning('File did not match template = %s' % file_path)
+                tokens = {}
+            self.parsed_files.append(tokens)
+            self._file_ids.setdefault(file_path, file_id)
+            for key, value in tokens.items():
+                if isinstance(value, dict):
+                    continue
+                values = self.token_index.setdefault(key, {})
+                values.setdefault(value, set()).add(file_id)
+        logger.debug('Texture index built, %s files, %s tokens' %
+                     (len(self.parsed_files), len(self.token_index)))
+
+    def _index_file(self, file_id, tokens, remove=False):
+        """Add or remove a file id from the inverted token index."""
+        for key, value in tokens.items():
+            if isinstance(value, dict):
+                continue
+            values = self.token_index.setdefault(key, {})
+            if remove:
+                file_ids = values.get(value)
+                if file_ids is not None:
+                    file_ids.discard(file_id)
+                    if not file_ids:
+                        del values[value]
+            else:
+                values.setdefault(value, set()).add(file_id)
+
+    def add_files(self, file_list):
+        """
+        Add files to the finder, parsing only the new files.
+
+        Files already in the finder are skipped.
+
+        Args:
+            file_list (list): A list of file paths.
+
+        """
+        file_list = [file_path for file_path in file_list
+                     if file_path not in self._file_ids]
+        if not self.texture_template:
+            parsed = [{}] * len(file_list)
+        else:
+            parsed = self.template.parse_many(file_list)
+        for file_path, tokens in zip(file_list, parsed):
+            if file_path in self._file_ids:
+                continue
+            if tokens is None:
+                logger.warning('File did not match template = %s' % file_path)
+                tokens = {}
+            file_id = len(self.file_list)
+            self.file_list.append(file_path)
+            if self.texture_template:
+                self.parsed_files.append(tokens)
+            self._file_ids[file_path] = file_id
+            self._index_file(file_id, tokens)
+
+    def remove_files(self, file_list):
+        """
+        Remove files from the finder.
+
+        Each removed file is replaced by the last file of the file_list,
+        so removing is independent of the file_list size. This changes
+        the file_list order.
+
+        Args:
+            file_list (list): A list of file paths.
+
+        """
+        for file_path in file_list:
+            file_id = self._file_ids.pop(file_path, None)
+            if file_id is None:
+                continue
+            last_id = len(self.file_list) - 1
+            indexed = bool(self.texture_template)
+            if indexed:
+                self._index_file(
+                    file_id, self.parsed_files[file_id], remove=True)
+            if file_id != last_id:
+                last_path = self.file_list[last_id]
+                self.file_list[file_id] = last_path
+                self._file_ids[last_path] = file_id
+                if indexed:
+                    last_tokens = self.parsed_files[last_id]
+                    self._index_file(last_id, last_tokens, remove=True)
+                    self.parsed_files[file_id] = last_tokens
+                    self._index_file(file_id, last_tokens)
+            self.file_list.pop()
+            if indexed:
+                self.parsed_files.pop()
+
+    def get_tokens(self, file_path):
+        """
+        Get the parsed tokens of a file path.
+
+        Uses the tokens parsed when the index was built, files that
+        are not in the file_list (for ie: merged udim paths) are parsed.
+
+        Args:
+            file_path (str): a path to a file.
+
+        Returns:
+            dict. file path tokens from template
+
+        """
+        file_id = self._file_ids.get(file_path)
+        if file_id is None:
+            return self.parse(file_path)
+        return self.parsed_files[file_id]
 
     def parse(self, file_path):
         """
@@ -74,19 +470,23 @@ class TextureFinder():
             logger.error('Skipping finding keys, no template supplied!')
             return []
 
-        key_count = len(kwargs.items())
-        matchs = []
-        for file_path in self.file_list:
-            tokens = self.parse(file_path)
-            match_count = 0
+        if kwargs:
+            candidates = []
             for key, value in kwargs.items():
-                if key in tokens.keys():
-                    if tokens[key] == str(value):
-                        # Count matchs
-                        match_count = match_count + 1
-            # if matchs == keywords count we found all keys/values
-            if key_count == match_count:
-                matchs.append(file_path)
+                file_ids = self.token_index.get(key, {}).get(str(value))
+                if not file_ids:
+                    candidates = []
+                    break
+                candidates.append(file_ids)
+            # intersect starting from the smallest set
+            candidates.sort(key=len)
+            file_ids = set(candidates[0]) if candidates else set()
+            for other in candidates[1:]:
+                file_ids &= other
+        else:
+            file_ids = range(len(self.file_list))
+        # Keep the file_list order
+        matchs = [self.file_list[file_id] for file_id in sorted(file_ids)]
         if merge_udims:
             return self.merge_udims(matchs)
         else:
@@ -107,22 +507,26 @@ class TextureFinder():
             int: udim
 
         """
-        sequences = re.split("[._]+", file_path)
-        udim = None
-        for s in sequences:
-            try:
-                udim = int(s)
-            except:
-                pass
-        if udim > 1000 and udim < 2000:
-            return udim
-        else:
-            return None
+        return split_udim(file_path)[1]
+
+    def udim_sets(self, file_list=None):
+        """
+        Group the file_list into UdimSets.
+
+        Kwargs:
+            file_list (list): A list of file paths.
+
+        returns:
+            list. A list of UdimSets.
+
+        """
+        if file_list is None:
+            file_list = self.file_list
+        return UdimSet.group(file_list)
 
     def merge_udims(self, file_list=None):
         """
-        TODO make template agnostic, use get_udim instead, make static
-        Return a file_list, with the {udim} part replaced by '<udim>'.
+        Return a file_list, with the udim part replaced by UDIM_TOKEN.
 
         Duplicates are skipped. Optionaly, it can be given an file_list.
         This is handy for cases where you don't want to use the whole
@@ -135,16 +539,7 @@ class TextureFinder():
             list. A list of files merged by udim.
 
         """
-        # If a file_list is not provided, use self.file_list
-        if file_list is None:
-            file_list = self.file_list
-        udim_file_list = []
-        for file_path in file_list:
-            udim = self.get_udim(file_path)
-            udim_file_path = file_path.replace(str(udim), 'udim')
-            if udim_file_path not in udim_file_list:
-                udim_file_list.append(udim_file_path)
-        return udim_file_list
+        return [udim_set.path for udim_set in self.udim_sets(file_list)]
 
     def get_token(self, file_path, token=None):
         """
@@ -159,15 +554,16 @@ class TextureFinder():
             string: Value of the key (token) from the template parsed file.
 
         """
-        return self.parse(file_path)[token]
+        return self.get_tokens(file_path)[token]
 
     def get_channel_plug(self, file_path, shader_type='PxrSurface'):
         """
 
         Match the file channel name with a shader plug.
 
-        Loads the material json from ldtconfig folder, and tries to find
-        a close match using fuzzy wuzz
+        Uses the shader type ChannelResolver, built from the material json
+        in the ldtconfig folder. Tries an exact match first, and then the
+        closest match using fuzzy wuzzy.
 
         Args:
             file_path (str): a file path
@@ -179,21 +575,1093 @@ class TextureFinder():
             string: The name of the shader plug matched 
 
         """
-        # TODO make it iterate the material_mapping keys and find .max()
-        # instead of the first hit
-        materials_config = ldtutils.get_config_materials()
-        logger.debug('TEXTURE_CHANNEL_MATCHING_RATIO = %s' %
-                     TEXTURE_CHANNEL_MATCHING_RATIO)
-        tokens = self.parse(file_path)
+        tokens = self.get_tokens(file_path)
         channel = tokens['channel']
-        for key in materials_config['material_mapping'][shader_type]:
-            ratio = ldtutils.string_matching_ratio(channel, key)
-            logger.debug('Comparing %s with %s. Ratio is %s' %
-                         (channel, key, ratio))
-            if ratio > TEXTURE_CHANNEL_MATCHING_RATIO:
-                logger.debug('Ratio above threshold found. Matched "%s" with "%s".' %
-                             (channel, key))
-                return materials_config['material_mapping']['PxrSurface'][key]
-        logger.debug(
-            'Could not find a match above the ratio for %s' % channel)
-        return
+        return get_channel_resolver(shader_type).resolve(channel)
+
+
+def _flatten_tokens(tokens, prefix=''):
+    """Flatten nested lucidity parsed tokens into dot notation keys."""
+    flat = {}
+    for key, value in tokens.items():
+        if isinstance(value, dict):
+            flat.update(_flatten_tokens(value, '%s%s.' % (prefix, key)))
+        else:
+            flat['%s%s' % (prefix, key)] = value
+    return flat
+
+
+def _encode_columns(keys, parsed, file_list):
+    """
+    Dictionary encode parsed tokens into columns.
+
+    Args:
+        keys (list): template token names.
+        parsed (iterable): lucidity parsed tokens, or None, per file.
+        file_list (list): file paths of the parsed tokens.
+
+    Returns:
+        tuple. values {key: list}, codes {key: array}, and udims array.
+
+    """
+    values = dict((key, []) for key in keys)
+    lookups = dict((key, {}) for key in keys)
+    codes = dict((key, array('i')) for key in keys)
+    udims = array('H')
+    nested = any('.' in key for key in keys)
+    for file_path, tokens in zip(file_list, parsed):
+        udims.append(split_udim(file_path)[1] or 0)
+        if tokens is None:
+            for key in keys:
+                codes[key].append(-1)
+            continue
+        if nested:
+            tokens = _flatten_tokens(tokens)
+        for key in keys:
+            value = tokens.get(key)
+            if value is None:
+                codes[key].append(-1)
+                continue
+            lookup = lookups[key]
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(values[key])
+                values[key].append(value)
+            codes[key].append(code)
+    return values, codes, udims
+
+
+def _parse_chunk(args):
+    """Process pool worker, parse and encode a chunk of files."""
+    pattern, keys, file_list = args
+    template = ldtcommon.texture_file_template(pattern)
+    return _encode_columns(keys, template.parse_many(file_list), file_list)
+
+
+class TextureTable(object):
+    """
+    Columnar table of template parsed texture files.
+
+    Each template token is stored as a column, dictionary encoded
+    as a list of unique values and an integer code per file, -1 for files
+    where the token was not found. The udims are stored as an integer
+    column, 0 for files without udim.
+    When numpy is available columns are numpy arrays, and searches are
+    vectorized comparisons.
+
+    Lists bigger than chunk_size are parsed in chunks, in a process pool.
+
+    Args:
+        file_list (list): A list of file paths
+        template (str): lucidity like file template.
+
+    Kwargs:
+        chunk_size (int): files per chunk when parsing in a process pool.
+        processes (int): process pool size, defaults to the cpu count.
+                         0 to always parse in this process, for ie: inside
+                         dccs where multiprocessing is not available.
+
+    """
+
+    def __init__(self, file_list, template,
+                 chunk_size=TEXTURE_TABLE_CHUNK_SIZE, processes=None):
+        """Initialize the TextureTable, and parse the file list."""
+        self.file_list = list(file_list)
+        self.texture_template = template
+        self.template = ldtcommon.texture_file_template(template)
+        self.tokens = sorted(self.template.keys())
+        self._values = dict((key, []) for key in self.tokens)
+        self._lookups = dict((key, {}) for key in self.tokens)
+        self._codes = dict((key, array('i')) for key in self.tokens)
+        self._udims = array('H')
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        chunks = [self.file_list[index:index + chunk_size]
+                  for index in range(0, len(self.file_list), chunk_size)]
+        if processes and len(chunks) > 1:
+            logger.info('Parsing %s files in %s chunks' %
+                        (len(self.file_list), len(chunks)))
+            args = [(template, self.tokens, chunk) for chunk in chunks]
+            with ldtutils.Dispatcher(workers=min(processes, len(chunks)),
+                                     backend='process') as dispatcher:
+                for encoded in dispatcher.map(_parse_chunk, args):
+                    self._merge(*encoded)
+        else:
+            self._merge(*_encode_columns(
+                self.tokens,
+                self.template.parse_many(self.file_list),
+                self.file_list))
+
+        if numpy is not None:
+            self._codes = dict((key, numpy.array(codes, dtype=numpy.int32))
+                               for key, codes in self._codes.items())
+            self._udims = numpy.array(self._udims, dtype=numpy.uint16)
+
+    def _merge(self, values, codes, udims):
+        """Append an encoded chunk, remapping its codes to the table values."""
+        for key in self.tokens:
+            table_values = self._values[key]
+            lookup = self._lookups[key]
+            remap = []
+            for value in values[key]:
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(table_values)
+                    table_values.append(value)
+                remap.append(code)
+            self._codes[key].extend(
+                remap[code] if code >= 0 else -1 for code in codes[key])
+        self._udims.extend(udims)
+
+    def __len__(self):
+        return len(self.file_list)
+
+    @property
+    def udims(self):
+        """Udim column, 0 for files without udim."""
+        return self._udims
+
+    def values(self, token):
+        """
+        Get the unique values of a token.
+
+        Args:
+            token (str): template token.
+
+        Returns:
+            list. Unique values, indexed by the token codes.
+
+        """
+        return self._values[token]
+
+    def codes(self, token):
+        """
+        Get the dictionary encoded column of a token.
+
+        Args:
+            token (str): template token.
+
+        Returns:
+            array. Index into values(token) per file, -1 if not found.
+
+        """
+        return self._codes[token]
+
+    def column(self, token):
+        """
+        Get a token column as values.
+
+        Args:
+            token (str): template token.
+
+        Returns:
+            array. token value per file, None if not found.
+
+        """
+        values = self._values[token] + [None]
+        if numpy is not None:
+            return numpy.array(values, dtype=object)[self._codes[token]]
+        return [values[code] for code in self._codes[token]]
+
+    def mask(self, **kwargs):
+        """
+        Get the files that match all the given key value pairs.
+
+        Kwargs:
+            **kwargs: key value pairs, to search. The udim key
+                      matches the udim column.
+
+        Returns:
+            array. bool per file, all False if a key is not a template
+            token, as find_key_values finds no files for it.
+
+        """
+        conditions = []
+        for key, value in kwargs.items():
+            if key == 'udim' and key not in self._codes:
+                conditions.append((self._udims, int(value)))
+                continue
+            if key not in self._codes:
+                logger.debug('%s is not a template token' % key)
+                if numpy is not None:
+                    return numpy.zeros(len(self.file_list), dtype=bool)
+                return [False] * len(self.file_list)
+            # -2 never matches, not even files where the token was not found
+            code = self._lookups[key].get(str(value), -2)
+            conditions.append((self._codes[key], code))
+
+        if numpy is not None:
+            mask = numpy.ones(len(self.file_list), dtype=bool)
+            for column, code in conditions:
+                mask &= column == code
+            return mask
+        mask = [True] * len(self.file_list)
+        for column, code in conditions:
+            mask = [match and item == code
+                    for match, item in zip(mask, column)]
+        return mask
+
+    def select(self, **kwargs):
+        """
+        Search for key value pairs, that match file template tokens.
+
+        Kwargs:
+            **kwargs: key value pairs, to search
+
+        returns:
+            list. List of files that match the search criteria
+
+        """
+        mask = self.mask(**kwargs)
+        if numpy is not None:
+            return [self.file_list[index] for index in numpy.flatnonzero(mask)]
+        return [file_path for file_path, match in zip(self.file_list, mask)
+                if match]
+
+
+class TextureIndex(object):
+    """
+    Persistent, incremental index of the texture files under a folder.
+
+    The index is a sqlite database in the CACHE_FOLDER, with a row per
+    folder with its mtime, and a row per file with its size, mtime and
+    template parsed tokens. Updating the index only lists the folders
+    whose mtime changed since the last update, and only parses new files.
+
+    Args:
+        root (str): Folder to index, it is always searched recursively.
+
+    Kwargs:
+        template (str): lucidity like file template. If it is not the
+                        template the index was built with, tokens are
+                        parsed again on the next update.
+        cache_folder (str): Folder where the index database is stored.
+        exclude (iterable): fnmatch patterns of file names to skip.
+        prune (iterable): fnmatch patterns of folder names to not index.
+
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT);
+        CREATE TABLE IF NOT EXISTS folders (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            mtime REAL);
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            folder TEXT,
+            name TEXT,
+            size INTEGER,
+            mtime REAL,
+            tokens TEXT);
+        CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+        """
+
+    def __init__(self, root, template=TEXTURE_FILE_PATTERN, cache_folder=None,
+                 exclude=FILE_SEARCH_EXCLUDE, prune=FILE_SEARCH_PRUNE):
+        """Initialize the TextureIndex, and open its database."""
+        self.root = os.path.abspath(root)
+        self.texture_template = template
+        self.template = None
+        if template:
+            self.template = ldtcommon.texture_file_template(template)
+        self.exclude = tuple(exclude or ())
+        self.prune = tuple(prune or ())
+        if cache_folder is None:
+            cache_folder = CACHE_FOLDER
+        if not os.path.isdir(cache_folder):
+            os.makedirs(cache_folder)
+        root_hash = hashlib.sha1(self.root.encode('utf-8')).hexdigest()
+        self.database_path = os.path.join(
+            cache_folder, 'texture_index_%s.db' % root_hash)
+        # The index can be updated from a LibraryWatcher thread
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(self.database_path,
+                                           check_same_thread=False)
+        self._connection.text_factory = str
+        self._connection.executescript(self._SCHEMA)
+        self._check_settings()
+
+    def _check_settings(self):
+        """Drop the indexed files if the index was built with other settings."""
+        settings = {'root': self.root,
+                    'template': self.texture_template or '',
+                    'exclude': json.dumps(self.exclude),
+                    'prune': json.dumps(self.prune)}
+        stored = dict(self._connection.execute(
+            'SELECT key, value FROM settings'))
+        if stored == settings:
+            return
+        if stored:
+            logger.info('Texture index settings changed, rebuilding: %s' %
+                        self.database_path)
+        with self._connection:
+            self._connection.execute('DELETE FROM folders')
+            self._connection.execute('DELETE FROM files')
+            self._connection.execute('DELETE FROM settings')
+            self._connection.executemany(
+                'INSERT INTO settings (key, value) VALUES (?, ?)',
+                settings.items())
+
+    def close(self):
+        """Close the index database."""
+        with self._lock:
+            self._connection.close()
+
+    def _parse(self, file_path):
+        """Return the json encoded template tokens of a file."""
+        if self.template is None:
+            return None
+        for tokens in self.template.parse_many([file_path]):
+            if tokens is None:
+                return None
+            return json.dumps(tokens)
+
+    def update(self, folders=None):
+        """
+        Update the index with the changes on disk.
+
+        Only folders whose mtime changed are listed again.
+
+        Kwargs:
+            folders (iterable): Only update these folders, and their new or
+                                changed subfolders. They are always listed
+                                again, for ie: folders reported as changed
+                                by a LibraryWatcher.
+
+        Returns:
+            dict. 'added', 'modified' and 'removed' lists of file paths.
+
+        """
+        changes = {'added': [], 'modified': [], 'removed': []}
+        connection = self._connection
+        with self._lock:
+            stored = {}
+            children = {}
+            for path, parent, mtime in connection.execute(
+                    'SELECT path, parent, mtime FROM folders'):
+                stored[path] = mtime
+                children.setdefault(parent, []).append(path)
+
+            if folders is None:
+                pending = [self.root]
+                forced = set()
+            else:
+                pending = [os.path.abspath(folder) for folder in folders]
+                pending = [folder for folder in pending
+                           if folder == self.root or
+                           folder.startswith(self.root + os.sep)]
+                forced = set(pending)
+
+            listed = 0
+            with connection:
+                while pending:
+                    folder = pending.pop()
+                    try:
+                        mtime = os.stat(folder).st_mtime
+                    except OSError:
+                        mtime = None
+                    listing = None
+                    if mtime is not None:
+                        if folder not in forced and stored.get(folder) == mtime:
+                            if folders is None:
+                                pending.extend(children.get(folder, []))
+                            continue
+                        listing = ldtutils.list_folder(folder)
+                    if listing is None:
+                        if folder in stored:
+                            self._remove_folder(folder, children, changes)
+                        continue
+                    listed += 1
+                    _, subfolders, files = listing
+                    subfolders = [
+                        os.path.join(folder, name)
+                        for name, is_symlink in subfolders
+                        if not is_symlink and
+                        not ldtutils.matches_any(name, self.prune)]
+                    self._update_folder_files(folder, files, changes)
+                    connection.execute(
+                        'INSERT OR REPLACE INTO folders (path, parent, mtime) '
+                        'VALUES (?, ?, ?)',
+                        (folder, os.path.dirname(folder), mtime))
+                    for subfolder in set(children.get(folder, [])) - \
+                            set(subfolders):
+                        self._remove_folder(subfolder, children, changes)
+                    pending.extend(subfolders)
+
+        logger.info('Texture index updated, %s folders listed, %s added, '
+                    '%s modified, %s removed' %
+                    (listed, len(changes['added']), len(changes['modified']),
+                     len(changes['removed'])))
+        return changes
+
+    def _remove_folder(self, folder, children, changes):
+        """Remove a folder, its subfolders, and all their files rows."""
+        connection = self._connection
+        pending = [folder]
+        while pending:
+            folder = pending.pop()
+            pending.extend(children.pop(folder, []))
+            for (path,) in connection.execute(
+                    'SELECT path FROM files WHERE folder = ?', (folder,)):
+                changes['removed'].append(path)
+            connection.execute('DELETE FROM files WHERE folder = ?', (folder,))
+            connection.execute('DELETE FROM folders WHERE path = ?', (folder,))
+
+    def folders(self):
+        """
+        Get the indexed folders.
+
+        Returns:
+            list. Folder paths, sorted.
+
+        """
+        with self._lock:
+            return [row[0] for row in self._connection.execute(
+                'SELECT path FROM folders ORDER BY path')]
+
+    def _update_folder_files(self, folder, names, changes):
+        """Sync the files rows of a listed folder."""
+        connection = self._connection
+        indexed = dict(
+            (name, (size, mtime)) for name, size, mtime in connection.execute(
+                'SELECT name, size, mtime FROM files WHERE folder = ?',
+                (folder,)))
+        names = [name for name in names
+                 if not ldtutils.matches_any(name, self.exclude)]
+        for name in set(indexed) - set(names):
+            file_path = os.path.join(folder, name)
+            connection.execute('DELETE FROM files WHERE path = ?', (file_path,))
+            changes['removed'].append(file_path)
+        for name in names:
+            file_path = os.path.join(folder, name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                # broken links, still listed as os.walk does
+                size, mtime = 0, 0.0
+            else:
+                size, mtime = stat.st_size, stat.st_mtime
+            signature = indexed.get(name)
+            if signature is None:
+                connection.execute(
+                    'INSERT INTO files (path, folder, name, size, mtime, tokens)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    (file_path, folder, name, size, mtime,
+                     self._parse(file_path)))
+                changes['added'].append(file_path)
+            elif signature != (size, mtime):
+                connection.execute(
+                    'UPDATE files SET size = ?, mtime = ? WHERE path = ?',
+                    (size, mtime, file_path))
+                changes['modified'].append(file_path)
+
+    def _select(self, columns, recursive=True, pattern=None, extensions=None):
+        """Return filtered files rows, in os.walk top-down order."""
+        query = 'SELECT folder, name, %s FROM files' % columns
+        arguments = ()
+        if not recursive:
+            query += ' WHERE folder = ?'
+            arguments = (self.root,)
+        if extensions is not None:
+            extensions = set(extension.lower() for extension in extensions)
+        rows = []
+        for row in self._connection.execute(query, arguments):
+            name = row[1]
+            if pattern and pattern not in name:
+                continue
+            if extensions is not None and \
+                    os.path.splitext(name)[1].lower() not in extensions:
+                continue
+            rows.append(row)
+        # The files of a folder before its subfolders, folders and files
+        # sorted by name
+        rows.sort(key=lambda row: (row[0].split(os.sep), row[1]))
+        return [row[2:] for row in rows]
+
+    def file_list(self, recursive=True, pattern=None, extensions=None):
+        """
+        Get the indexed files.
+
+        Kwargs:
+            recursive (bool): Include files in subfolders.
+            pattern (str): pattern to match, for ie '.exr'.
+            extensions (iterable): file extensions to match, case insensitive.
+
+        Returns:
+            list. File paths, in os.walk top-down order, sorted by name.
+
+        """
+        with self._lock:
+            return [row[0] for row in self._select(
+                'path', recursive=recursive, pattern=pattern,
+                extensions=extensions)]
+
+    def parsed_files(self, recursive=True, pattern=None, extensions=None):
+        """
+        Get the indexed files and their template parsed tokens.
+
+        Kwargs:
+            recursive, pattern, extensions: file filters, see file_list.
+
+        Returns:
+            tuple. File paths list, and tokens list, None for files that
+            did not match the template.
+
+        """
+        file_list = []
+        parsed_files = []
+        with self._lock:
+            for file_path, tokens in self._select(
+                    'path, tokens', recursive=recursive, pattern=pattern,
+                    extensions=extensions):
+                file_list.append(file_path)
+                parsed_files.append(json.loads(tokens) if tokens else None)
+        return file_list, parsed_files
+
+
+def get_filesystem_type(path):
+    """
+    Get the file system type of the mount a path is in.
+
+    Reads /proc/mounts, only available in linux.
+
+    Args:
+        path (str): a file or folder path.
+
+    Returns:
+        str. File system type, for ie: 'ext4' or 'nfs'. None if unknown.
+
+    """
+    path = os.path.realpath(path)
+    fs_type = None
+    mount_point_length = -1
+    try:
+        with open('/proc/mounts') as handle:
+            for line in handle:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # Spaces in mount points are octal escaped
+                mount_point = fields[1].replace('\\040', ' ')
+                if path != mount_point and \
+                        not path.startswith(mount_point.rstrip('/') + '/'):
+                    continue
+                if len(mount_point) > mount_point_length:
+                    mount_point_length = len(mount_point)
+                    fs_type = fields[2]
+    except (IOError, OSError):
+        return None
+    return fs_type
+
+
+class Inotify(object):
+    """
+    Minimal ctypes inotify wrapper, watching folders for file changes.
+
+    Raises:
+        OSError. inotify is not available.
+
+    """
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+
+    WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+                  IN_ONLYDIR)
+
+    _EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        """Initialize inotify."""
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify is only available in linux')
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        try:
+            self._add_watch = self._libc.inotify_add_watch
+            self._remove_watch = self._libc.inotify_rm_watch
+        except AttributeError:
+            raise OSError(errno.ENOSYS, 'inotify not found in %s' % libc_name)
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                    ctypes.c_uint32]
+        self.fd = self._libc.inotify_init()
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}
+        self._watch_descriptors = {}
+
+    def add_watch(self, path):
+        """
+        Watch a folder.
+
+        Args:
+            path (str): folder path.
+
+        Returns:
+            bool. True if the watch was added.
+
+        """
+        if path in self._watch_descriptors:
+            return True
+        encoded = path
+        if not isinstance(encoded, bytes):
+            encoded = path.encode(sys.getfilesystemencoding())
+        descriptor = self._add_watch(self.fd, encoded, self.WATCH_MASK)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            logger.warning('Could not watch folder %s: %s' %
+                           (path, os.strerror(error)))
+            return False
+        self.watches[descriptor] = path
+        self._watch_descriptors[path] = descriptor
+        return True
+
+    def __contains__(self, path):
+        return path in self._watch_descriptors
+
+    def remove_watch(self, path):
+        """
+        Stop watching a folder.
+
+        Args:
+            path (str): folder path.
+
+        """
+        descriptor = self._watch_descriptors.pop(path, None)
+        if descriptor is not None:
+            self.watches.pop(descriptor, None)
+            self._remove_watch(self.fd, descriptor)
+
+    def read_events(self, timeout=None):
+        """
+        Wait for events, and read them.
+
+        Kwargs:
+            timeout (float): seconds to wait for events, None waits forever.
+
+        Returns:
+            list. (folder path, mask, name) tuples, folder path is None on
+            queue overflows.
+
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        data = os.read(self.fd, 65536)
+        events = []
+        offset = 0
+        header_size = self._EVENT_HEADER.size
+        while offset + header_size <= len(data):
+            descriptor, mask, _, length = self._EVENT_HEADER.unpack_from(
+                data, offset)
+            offset += header_size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if not isinstance(name, str):
+                name = name.decode(sys.getfilesystemencoding())
+            folder = self.watches.get(descriptor)
+            if mask & self.IN_IGNORED:
+                path = self.watches.pop(descriptor, None)
+                self._watch_descriptors.pop(path, None)
+            events.append((folder, mask, name))
+        return events
+
+    def close(self):
+        """Close the inotify file descriptor."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.watches.clear()
+        self._watch_descriptors.clear()
+
+
+class LibraryWatcher(object):
+    """
+    Keep a TextureIndex, and a TextureFinder created from it, up to date.
+
+    Uses inotify to find the folders that changed when it is available
+    and the library is in a local file system, and falls back to polling
+    the TextureIndex, that only lists folders whose mtime changed.
+    Only the changed files are added to, or removed from, the finder.
+
+    Subscribed callbacks are called with the changes dict, as returned by
+    TextureIndex.update(), from the watcher thread. Qt plugins should
+    re-emit them through a signal to handle them in the main thread.
+
+    Args:
+        texture_index (TextureIndex): texture index to keep up to date.
+
+    Kwargs:
+        recursive, pattern, extensions: file filters for the finder,
+        see TextureIndex.file_list.
+        interval (float): polling interval in seconds.
+        use_inotify (bool): use inotify, None to use it if available, and
+                            the library is not in a network file system.
+
+    """
+
+    def __init__(self, texture_index, recursive=True, pattern=None,
+                 extensions=None, interval=LIBRARY_WATCHER_INTERVAL,
+                 use_inotify=None):
+        """Initialize the LibraryWatcher, and update the index."""
+        self.texture_index = texture_index
+        self.recursive = recursive
+        self.pattern = pattern
+        self.extensions = None
+        if extensions is not None:
+            self.extensions = set(extension.lower()
+                                  for extension in extensions)
+        self.interval = interval
+        self.lock = threading.RLock()
+        self._callbacks = []
+        self._thread = None
+        self._stop = threading.Event()
+        self._inotify = None
+
+        if use_inotify is None:
+            fs_type = get_filesystem_type(texture_index.root)
+            use_inotify = fs_type is not None and \
+                fs_type not in NETWORK_FILESYSTEMS
+        if use_inotify:
+            try:
+                self._inotify = Inotify()
+            except OSError as error:
+                logger.warning('inotify not available, polling: %s' % error)
+
+        texture_index.update()
+        if self._inotify is not None:
+            for folder in texture_index.folders():
+                self._inotify.add_watch(folder)
+        self.texture_finder = TextureFinder.from_index(
+            texture_index, recursive=recursive, pattern=pattern,
+            extensions=extensions)
+
+    @property
+    def mode(self):
+        """Watching mode, 'inotify' or 'polling'."""
+        return 'polling' if self._inotify is None else 'inotify'
+
+    def subscribe(self, callback):
+        """
+        Call callback(changes) when the library changes.
+
+        Args:
+            callback (function): function that takes the changes dict.
+
+        """
+        if callback not in self._callbacks:
+            self._callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Stop calling a subscribed callback.
+
+        Args:
+            callback (function): subscribed function.
+
+        """
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def _accept(self, file_path):
+        """Check if a changed file passes the finder file filters."""
+        if not self.recursive and \
+                os.path.dirname(file_path) != self.texture_index.root:
+            return False
+        name = os.path.basename(file_path)
+        if self.pattern and self.pattern not in name:
+            return False
+        if self.extensions is not None and \
+                os.path.splitext(name)[1].lower() not in self.extensions:
+            return False
+        return True
+
+    def apply(self, changes):
+        """
+        Apply index changes to the finder, and notify subscribers.
+
+        Args:
+            changes (dict): 'added', 'modified' and 'removed' file lists.
+
+        Returns:
+            dict. changes that pass the finder file filters.
+
+        """
+        changes = dict((key, [file_path for file_path in file_list
+                              if self._accept(file_path)])
+                       for key, file_list in changes.items())
+        if not any(changes.values()):
+            return changes
+        with self.lock:
+            self.texture_finder.remove_files(changes['removed'])
+            self.texture_finder.add_files(changes['added'])
+        for callback in list(self._callbacks):
+            try:
+                callback(changes)
+            except Exception:
+                logger.exception('Library watcher callback failed')
+        return changes
+
+    def poll(self, timeout=0):
+        """
+        Check for changes once, and apply them.
+
+        Kwargs:
+            timeout (float): seconds to wait for inotify events.
+
+        Returns:
+            dict. applied changes.
+
+        """
+        if self._inotify is None:
+            return self.apply(self.texture_index.update())
+        folders = self._read_changed_folders(timeout)
+        if folders is None:
+            changes = self.texture_index.update()
+            folders = self.texture_index.folders()
+        elif folders:
+            changes = self.texture_index.update(folders=folders)
+        else:
+            return {'added': [], 'modified': [], 'removed': []}
+        self._watch_new_folders(folders)
+        return self.apply(changes)
+
+    def _read_changed_folders(self, timeout):
+        """
+        Read inotify events until they settle.
+
+        Returns:
+            set. changed folders, None if events were lost and the whole
+            library has to be updated.
+
+        """
+        folders = set()
+        events = self._inotify.read_events(timeout)
+        while events:
+            for folder, mask, name in events:
+                if mask & Inotify.IN_Q_OVERFLOW:
+                    logger.warning('inotify queue overflow, updating library')
+                    return None
+                if folder is None:
+                    continue
+                if mask & (Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF):
+                    self._inotify.remove_watch(folder)
+                    folders.add(os.path.dirname(folder))
+                else:
+                    folders.add(folder)
+            events = self._inotify.read_events(LIBRARY_WATCHER_SETTLE)
+        return folders
+
+    def _watch_new_folders(self, folders):
+        """Watch the subfolders of changed folders that are not watched."""
+        pending = list(folders)
+        while pending:
+            listing = ldtutils.list_folder(pending.pop())
+            if not listing:
+                continue
+            folder, subfolders, _ = listing
+            for name, is_symlink in subfolders:
+                subfolder = os.path.join(folder, name)
+                if is_symlink or subfolder in self._inotify or \
+                        ldtutils.matches_any(name, self.texture_index.prune):
+                    continue
+                if self._inotify.add_watch(subfolder):
+                    pending.append(subfolder)
+
+    def _run(self):
+        """Watcher thread loop."""
+        while not self._stop.is_set():
+            try:
+                if self._inotify is None:
+                    self._stop.wait(self.interval)
+                    if self._stop.is_set():
+                        break
+                    self.poll()
+                else:
+                    self.poll(timeout=self.interval)
+            except Exception:
+                logger.exception('Library watcher update failed')
+                self._stop.wait(self.interval)
+
+    def start(self):
+        """Start watching the library in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='LibraryWatcher')
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info('Watching texture library (%s): %s' %
+                    (self.mode, self.texture_index.root))
+
+    def stop(self):
+        """Stop watching the library."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+#: Characters ignored when comparing channel names
+CHANNEL_SEPARATORS_REGEX = re.compile(r'[\W_]+', re.U)
+
+
+def normalize_channel(channel):
+    """
+    Normalize a channel name, for exact channel matching.
+
+    camelCase, snake_case, and kebab-case names are folded into the
+    same lower case form, for ie: 'baseColor', 'base_color' -> 'basecolor'.
+
+    Args:
+        channel (str): channel name.
+
+    Returns:
+        str. Normalized channel name.
+
+    """
+    return CHANNEL_SEPARATORS_REGEX.sub('', channel).lower()
+
+
+class ChannelResolver(object):
+    """
+    Resolve texture channel names to shader plugs, for a single shader type.
+
+    Channels are matched in two tiers. First, an exact match of the
+    normalized channel name against the normalized material mapping keys.
+    Channels without an exact match are fuzzy matched, as they are, against
+    all the keys as they are, and the best scoring key is used if it is
+    above the ratio.
+    Results are memoized per channel.
+
+    Args:
+        mapping (dict): material mapping, {channel name: shader plug}
+
+    Kwargs:
+        ratio (int): fuzzy matching ratio threshold.
+
+    """
+
+    def __init__(self, mapping, ratio=TEXTURE_CHANNEL_MATCHING_RATIO):
+        """Initialize the ChannelResolver, and build its lookup tables."""
+        self.mapping = mapping
+        self.ratio = ratio
+        # Sorted keys, the json key order is not stable between dccs
+        self._keys = sorted(mapping)
+        self._exact = {}
+        for key in self._keys:
+            self._exact.setdefault(normalize_channel(key), mapping[key])
+        self._resolved = {}
+
+    def resolve(self, channel):
+        """
+        Get the shader plug for a channel.
+
+        Args:
+            channel (str): texture channel name.
+
+        Returns:
+            str. shader plug, None if no match was found.
+
+        """
+        return self.resolve_many([channel])[channel]
+
+    def resolve_many(self, channels):
+        """
+        Get the shader plugs for many channels.
+
+        Only unique channels that are not memoized, and have no exact
+        match, go through fuzzy matching.
+
+        Args:
+            channels (iterable): texture channel names.
+
+        Returns:
+            dict. {channel: shader plug}, plugs are None if no
+            match was found.
+
+        """
+        unmatched = []
+        for channel in channels:
+            if channel in self._resolved:
+                continue
+            plug = self._exact.get(normalize_channel(channel))
+            # Memoized as None until it is fuzzy matched
+            self._resolved[channel] = plug
+            if plug is None:
+                unmatched.append(channel)
+        if unmatched:
+            self._resolve_fuzzy(unmatched)
+        return dict((channel, self._resolved[channel]) for channel in channels)
+
+    def _resolve_fuzzy(self, channels):
+        """Fuzzy match channels, and memoize results."""
+        logger.debug('TEXTURE_CHANNEL_MATCHING_RATIO = %s' % self.ratio)
+        # Not normalized, token_set_ratio needs the separators to split
+        # the channel words. Only ratios above self.ratio are used, pairs
+        # that can't reach it are not fully compared
+        all_scores = ldtutils.string_matching_ratios(
+            channels, self._keys, score_cutoff=int(self.ratio) + 1)
+        for channel, scores in zip(channels, all_scores):
+            scores = list(scores)
+            plug = None
+            if scores:
+                best = scores.index(max(scores))
+                logger.debug('Best match for %s is %s. Ratio is %s' %
+                             (channel, self._keys[best], scores[best]))
+                if scores[best] > self.ratio:
+                    plug = self.mapping[self._keys[best]]
+            if plug is None:
+                logger.debug(
+                    'Could not find a match above the ratio for %s' % channel)
+            self._resolved[channel] = plug
+
+
+#: ChannelResolvers per shader type, {shader_type: (mapping, resolver)}
+_channel_resolvers = {}
+
+
+def get_channel_resolver(shader_type='PxrSurface'):
+    """
+    Get the ChannelResolver of a shader type.
+
+    Resolvers are built once per shader type, and rebuilt only
+    when the materials config changes.
+
+    Kargs:
+        shader_type (str): A shader node name to find in the material json
+
+    Returns:
+        ChannelResolver.
+
+    Raises:
+        KeyError. shader_type not found in the material json.
+
+    """
+    materials_config = ldtutils.get_config_materials()
+    mapping = materials_config['material_mapping'][shader_type]
+    entry = _channel_resolvers.get(shader_type)
+    if entry is None or entry[0] is not mapping:
+        entry = (mapping, ChannelResolver(mapping))
+        _channel_resolvers[shader_type] = entry
+    return entry[1]
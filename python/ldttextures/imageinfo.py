@@ -0,0 +1,283 @@
+"""
+.. module:: imageinfo
+   :synopsis: Read image file headers, without decoding pixels.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+"""
+
+import os
+import math
+import struct
+import logging
+
+from ldtcommon import FILE_SEARCH_THREADS
+from ldtutils import Dispatcher
+
+logger = logging.getLogger(__name__)
+
+#: Bytes read from the start of a file, enough for most headers
+HEADER_READ_SIZE = 64 * 1024
+
+#: TIFF tags
+TIFF_NEW_SUBFILE_TYPE = 254
+TIFF_IMAGE_WIDTH = 256
+TIFF_IMAGE_LENGTH = 257
+TIFF_BITS_PER_SAMPLE = 258
+TIFF_SAMPLES_PER_PIXEL = 277
+TIFF_TILE_WIDTH = 322
+TIFF_TILE_LENGTH = 323
+#: TIFF tag types, struct format and size
+TIFF_TYPES = {1: ('B', 1), 3: ('H', 2), 4: ('I', 4), 16: ('Q', 8)}
+#: Maximum TIFF directories followed, to stop on corrupt files
+TIFF_MAX_DIRECTORIES = 64
+
+#: EXR pixel types bit depth, uint, half and float
+EXR_PIXEL_BITS = {0: 32, 1: 16, 2: 32}
+#: EXR tiles level modes
+EXR_ONE_LEVEL = 0
+EXR_RIPMAP_LEVELS = 2
+
+#: PNG channels by color type
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class ImageInfo(object):
+    """
+    Image properties read from a file header.
+
+    Args:
+        file_format (str): 'tiff', 'exr' or 'png'.
+        width (int): full resolution width.
+        height (int): full resolution height.
+        channels (int): channel count.
+        bit_depth (int): bits per channel, the biggest one.
+
+    Kwargs:
+        tiled (bool): True if the pixels are stored in tiles.
+        mip_levels (int): resolution levels, 1 if not mipmapped.
+
+    """
+
+    __slots__ = ('file_format', 'width', 'height', 'channels', 'bit_depth',
+                 'tiled', 'mip_levels')
+
+    def __init__(self, file_format, width, height, channels, bit_depth,
+                 tiled=False, mip_levels=1):
+        """Initialize the ImageInfo."""
+        self.file_format = file_format
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.bit_depth = bit_depth
+        self.tiled = tiled
+        self.mip_levels = mip_levels
+
+    def __repr__(self):
+        return ('ImageInfo(%r, %sx%s, channels=%s, bit_depth=%s, tiled=%s, '
+                'mip_levels=%s)' % (self.file_format, self.width, self.height,
+                                    self.channels, self.bit_depth, self.tiled,
+                                    self.mip_levels))
+
+    @property
+    def pixel_bytes(self):
+        """int. Uncompressed size of the full resolution pixels."""
+        return self.width * self.height * self.channels * self.bit_depth // 8
+
+    @property
+    def is_texture(self):
+        """bool. True if the image is tiled and mipmapped, render ready."""
+        return self.tiled and self.mip_levels > 1
+
+
+def _read_tiff(handle, header):
+    """Return the ImageInfo of a TIFF file."""
+    byte_order = '<' if header[:2] == b'II' else '>'
+    version, = struct.unpack(byte_order + 'H', header[2:4])
+    if version == 42:
+        offset, = struct.unpack(byte_order + 'I', header[4:8])
+        count_format, entry_format, offset_format = 'H', 'HHI4s', 'I'
+        entry_size, value_size = 12, 4
+    elif version == 43:
+        offset, = struct.unpack(byte_order + 'Q', header[8:16])
+        count_format, entry_format, offset_format = 'Q', 'HHQ8s', 'Q'
+        entry_size, value_size = 20, 8
+    else:
+        return None
+    count_size = struct.calcsize(count_format)
+    offset_size = struct.calcsize(offset_format)
+
+    def read(position, size):
+        if position + size <= len(header):
+            return header[position:position + size]
+        handle.seek(position)
+        return handle.read(size)
+
+    def value(tag_type, count, data):
+        type_format, type_size = TIFF_TYPES.get(tag_type, (None, 0))
+        if type_format is None:
+            return None
+        if type_size * count > value_size:
+            data_offset, = struct.unpack(byte_order + offset_format, data)
+            data = read(data_offset, type_size * count)
+        values = struct.unpack(byte_order + type_format * count,
+                               data[:type_size * count])
+        return values
+
+    directories = []
+    visited = set()
+    while offset and offset not in visited and \
+            len(directories) < TIFF_MAX_DIRECTORIES:
+        visited.add(offset)
+        count, = struct.unpack(byte_order + count_format,
+                               read(offset, count_size))
+        entries = read(offset + count_size, count * entry_size)
+        tags = {}
+        for index in range(count):
+            tag, tag_type, tag_count, data = struct.unpack(
+                byte_order + entry_format,
+                entries[index * entry_size:(index + 1) * entry_size])
+            if tag in (TIFF_NEW_SUBFILE_TYPE, TIFF_IMAGE_WIDTH,
+                       TIFF_IMAGE_LENGTH, TIFF_BITS_PER_SAMPLE,
+                       TIFF_SAMPLES_PER_PIXEL, TIFF_TILE_WIDTH,
+                       TIFF_TILE_LENGTH):
+                tags[tag] = value(tag_type, min(tag_count, 16), data)
+        directories.append(tags)
+        offset, = struct.unpack(
+            byte_order + offset_format,
+            read(offset + count_size + count * entry_size, offset_size))
+    if not directories or not directories[0].get(TIFF_IMAGE_WIDTH):
+        return None
+    first = directories[0]
+    # Mip levels are the following reduced resolution directories, flagged
+    # as such, or just smaller than the previous one, as maketx writes them
+    mip_levels = 1
+    previous = first
+    for tags in directories[1:]:
+        reduced = (tags.get(TIFF_NEW_SUBFILE_TYPE) or (0,))[0] & 1
+        smaller = (tags.get(TIFF_IMAGE_WIDTH) or (0,))[0] < \
+            previous[TIFF_IMAGE_WIDTH][0]
+        if not (reduced or smaller) or not tags.get(TIFF_IMAGE_WIDTH):
+            break
+        mip_levels += 1
+        previous = tags
+    return ImageInfo('tiff',
+                     first[TIFF_IMAGE_WIDTH][0],
+                     first[TIFF_IMAGE_LENGTH][0],
+                     (first.get(TIFF_SAMPLES_PER_PIXEL) or (1,))[0],
+                     max(first.get(TIFF_BITS_PER_SAMPLE) or (1,)),
+                     tiled=TIFF_TILE_WIDTH in first,
+                     mip_levels=mip_levels)
+
+
+def _read_exr(handle, header):
+    """Return the ImageInfo of an OpenEXR file."""
+    version, = struct.unpack('<I', header[4:8])
+    tiled = bool(version & 0x200)
+    # Multipart and deep files are converted, without further checks
+    if version & 0x1800:
+        return None
+    position = 8
+    attributes = {}
+    while True:
+        end = header.index(b'\0', position)
+        name = header[position:end]
+        if not name:
+            break
+        type_end = header.index(b'\0', end + 1)
+        size, = struct.unpack('<i', header[type_end + 1:type_end + 5])
+        data_start = type_end + 5
+        if data_start + size > len(header):
+            raise ValueError('Header bigger than %s bytes' % len(header))
+        attributes[name] = header[data_start:data_start + size]
+        position = data_start + size
+    x_min, y_min, x_max, y_max = struct.unpack(
+        '<iiii', attributes[b'dataWindow'])
+    width = x_max - x_min + 1
+    height = y_max - y_min + 1
+    bit_depths = []
+    channels = attributes[b'channels']
+    position = 0
+    while channels[position:position + 1] not in (b'\0', b''):
+        end = channels.index(b'\0', position)
+        pixel_type, = struct.unpack('<i', channels[end + 1:end + 5])
+        bit_depths.append(EXR_PIXEL_BITS.get(pixel_type, 32))
+        position = end + 17
+    mip_levels = 1
+    if tiled and b'tiles' in attributes:
+        mode = struct.unpack('<IIB', attributes[b'tiles'])[2]
+        level_mode, rounding_mode = mode & 0xf, mode >> 4
+        if level_mode != EXR_ONE_LEVEL:
+            size = max(width, height)
+            if level_mode == EXR_RIPMAP_LEVELS:
+                size = min(width, height)
+            levels = math.log(max(size, 1), 2)
+            levels = math.ceil(levels) if rounding_mode else \
+                math.floor(levels)
+            mip_levels = int(levels) + 1
+    return ImageInfo('exr', width, height, len(bit_depths),
+                     max(bit_depths or [0]), tiled=tiled,
+                     mip_levels=mip_levels)
+
+
+def _read_png(handle, header):
+    """Return the ImageInfo of a PNG file."""
+    if header[12:16] != b'IHDR':
+        return None
+    width, height, bit_depth, color_type = struct.unpack(
+        '>IIBB', header[16:26])
+    return ImageInfo('png', width, height, PNG_CHANNELS.get(color_type, 1),
+                     bit_depth)
+
+
+def read_image_info(file_path):
+    """
+    Read the properties of an image from its header.
+
+    Supports TIFF, including BigTIFF and .tx textures, OpenEXR and PNG.
+
+    Args:
+        file_path (str): image file path.
+
+    Returns:
+        ImageInfo. None if the format is not supported, or the header
+        could not be read.
+
+    """
+    try:
+        with open(file_path, 'rb') as handle:
+            header = handle.read(HEADER_READ_SIZE)
+            if header[:4] in (b'II*\0', b'MM\0*', b'II+\0', b'MM\0+'):
+                return _read_tiff(handle, header)
+            if header[:4] == b'\x76\x2f\x31\x01':
+                return _read_exr(handle, header)
+            if header[:8] == b'\x89PNG\r\n\x1a\n':
+                return _read_png(handle, header)
+    except (IOError, OSError, ValueError, KeyError, IndexError,
+            struct.error) as error:
+        logger.debug('Could not read the header of %s: %s' %
+                     (file_path, error))
+    return None
+
+
+def read_image_infos(file_list, threads=FILE_SEARCH_THREADS):
+    """
+    Read the properties of many images, in a thread Dispatcher.
+
+    Args:
+        file_list (list): image file paths.
+
+    Kwargs:
+        threads (int): headers read concurrently.
+
+    Returns:
+        dict. ImageInfo, or None, by file path.
+
+    """
+    file_list = list(file_list)
+    if len(file_list) < 2:
+        return dict((file_path, read_image_info(file_path))
+                    for file_path in file_list)
+    with Dispatcher(workers=min(threads, len(file_list))) as dispatcher:
+        return dict(zip(file_list,
+                        dispatcher.map(read_image_info, file_list)))
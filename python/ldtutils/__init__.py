@@ -8,79 +8,169 @@
 from ldtcommon import CONFIG_MATERIALS_JSON
 from ldtcommon import TEXTURE_CHANNEL_MATCHING_RATIO
 from ldtcommon import TEXTURE_MATCHING_RATIO
+from ldtcommon import FILE_SEARCH_THREADS
+from ldtcommon import FILE_SEARCH_EXCLUDE
+from ldtcommon import FILE_SEARCH_PRUNE
+from ldtcommon import COLOR_CACHE_SIZE
+from ldtcommon import MAYAPY_EXEC
+from ldtcommon import MAYA_BATCH_TIMEOUT
 from fuzzywuzzy import fuzz
+from ldtutils.dispatcher import Dispatcher, Future, CommandResult
+from ldtutils.dispatcher import DispatcherError, TaskTimeoutError
+from ldtutils.dispatcher import CancelledError, as_completed, run_command
+from ldtutils import mayabatch
+from ldtutils import fuzzymatch
 import subprocess
 import multiprocessing
+import threading
+import fnmatch
+import hashlib
+import time
+import shutil
+import copy
 import sys
 import json
 import logging
 import os
-import random
+import struct
 import lucidity
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
 
 logger = logging.getLogger(__name__)
 
 
-def create_commands(texture_mapping):
-    default_command = "maya -batch -file someMayaFile.mb -command "
-    commands = []
-    for key, value in texture_mapping:
-        dir, filename = os.path.split(key)
-        filename, ext = os.path.splitext(filename)
-        filename = os.path.join(dir, filename + "WithTexture." + ext)
-        commands.append("".format(default_command, "abc_file",
-                                  key, "texture", value, "file -save ", filename))
-    return commands
+def create_commands(texture_mapping, output_folder=None, mayapy=MAYAPY_EXEC,
+                    **kwargs):
+    """
+    Write the mayapy scripts that assemble alembics with their textures.
+
+    Args:
+        texture_mapping (dict): texture set per alembic file path, a list
+                                of texture file paths, or a folder.
+
+    Kwargs:
+        output_folder (str): scenes folder, defaults to each alembic folder.
+        mayapy (str): mayapy executable.
+        kwargs: extra mayabatch.create_jobs arguments.
 
+    Returns:
+        list. Command lines, one per alembic.
 
-def launch_function(func, args):
-    commands = create_commands(args)
-    launch_multiprocess(launch_subprocess, commands)
+    """
+    jobs = mayabatch.create_jobs(texture_mapping, output_folder, **kwargs)
+    return [job.get_command(mayapy) for job in jobs]
 
 
-def launch_subprocess(command):
-    try:
-        subprocess_output = subprocess.check_output(command)
-        logger.info("Subprocess launched\t{out}\nrunning the command\t{command}",
-                    out=subprocess_output,
-                    command=command)
-    except subprocess.CalledProcessError as e:
-        logger.exception(
-            "Error while trying to launch subprocess: {}".format(e.output))
-        raise
+def launch_subprocess(command, timeout=None):
+    """
+    Run a command, and log its output.
+
+    Args:
+        command (list or str): command line, a string runs in a shell.
+
+    Kwargs:
+        timeout (float): seconds before the command is killed.
+
+    Returns:
+        list or str. The command.
+
+    Raises:
+        subprocess.CalledProcessError: if the command failed.
+
+    """
+    result = run_command(command, timeout=timeout)
+    if not result.succeeded:
+        logger.error('Error while trying to launch subprocess %s: %s' %
+                     (command, result.stderr))
+        raise subprocess.CalledProcessError(
+            -1 if result.returncode is None else result.returncode,
+            command, result.stdout)
+    logger.info('Subprocess launched\t%s\nrunning the command\t%s' %
+                (result.stdout, command))
     return command
 
 
-def launch_multiprocess(function, args):
+def launch_multiprocess(function, args, workers=None, timeout=None):
     """
-    :param function: Function to be called inside the multiprocess -- Takes only 1 arg
-    :param args: list/tuple of arguments for above function
-    :return:
+    Run a function on each argument, in child processes.
+
+    Args:
+        function (callable): function called with each argument.
+        args (iterable): arguments, one per call.
+
+    Kwargs:
+        workers (int): concurrent processes, defaults to half the cpu count.
+        timeout (float): seconds each call can run.
+
+    Returns:
+        int. 0 if all calls succeeded, 1 otherwise.
+
     """
     multiprocessing.freeze_support()
-    pool = multiprocessing.Pool(processes=int(multiprocessing.cpu_count()/2))
-    logger.debug("Pool created")
-    try:
-        pool_process = pool.map_async(function, (args))
-    except Exception as e:
-        msg = "Error while trying to launch process in pool: {}".format(e)
-        logger.exception(msg)
-        raise
-    finally:
-        pool.close()
-        pool.join()
-    try:
-        logger.info("output from the process: {pool_out}",
-                    out=pool_process.successful())
-        return 0
-    except AssertionError:
-        logger.exception("Couldn't communicate with the process poll created; \
-        No output from processes fetched")
-        return 1
+    if workers is None:
+        workers = max(1, multiprocessing.cpu_count() // 2)
+    failed = 0
+    with Dispatcher(workers=workers, backend='process',
+                    timeout=timeout) as dispatcher:
+        futures = [dispatcher.submit(function, arg) for arg in args]
+        for future in futures:
+            error = future.exception()
+            if error is not None:
+                failed += 1
+                logger.error('Process %s%r failed: %r\n%s' %
+                             (getattr(function, '__name__', function),
+                              future.args, error, future.traceback or ''))
+    logger.info('%s processes finished, %s failed' % (len(futures), failed))
+    return 1 if failed else 0
+
+
+def map_textures_to_alembic(texture_mapping, output_folder=None,
+                             workers=None, timeout=MAYA_BATCH_TIMEOUT,
+                             mayapy=MAYAPY_EXEC, **kwargs):
+    """
+    Assemble alembics with their textures, in headless mayapy jobs.
 
+    Each alembic gets a <name>WithTexture.mb scene, with a material per
+    surfacing object. Jobs run in parallel, and write their output to a
+    <name>WithTexture.log file, next to their script.
+
+    Args:
+        texture_mapping (dict): texture set per alembic file path, a list
+                                of texture file paths, or a folder.
+
+    Kwargs:
+        output_folder (str): scenes folder, defaults to each alembic folder.
+        workers (int): concurrent mayapy processes.
+        timeout (float): seconds before a job is killed.
+        mayapy (str): mayapy executable.
+        kwargs: extra mayabatch.create_jobs arguments.
+
+    Returns:
+        dict. Scene path per alembic path, None if its job failed.
 
-def map_textures_to_alembic(texture_mapping):
-    launch_subprocess(command)
+    """
+    jobs = mayabatch.create_jobs(texture_mapping, output_folder, **kwargs)
+    mayabatch.run_jobs(jobs, workers=workers, timeout=timeout, mayapy=mayapy)
+    return dict((job.alembic, job.scene if job.succeeded else None)
+                for job in jobs)
 
 
 def load_json(file_path):
@@ -96,17 +186,457 @@ def load_json(file_path):
     return dictdump
 
 
+class FrozenDict(dict):
+    """
+    Read only dict, used for the shared config cache data.
+
+    Any attempt to modify it raises TypeError. Use copy.deepcopy, or
+    dict(), to get a modifiable copy.
+
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('%s is read only' % self.__class__.__name__)
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return dict((key, copy.deepcopy(value, memo))
+                    for key, value in self.items())
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+def freeze(data):
+    """
+    Return a read only copy of json like data.
+
+    dicts are converted to FrozenDict, and lists to tuples, recursively.
+
+    Args:
+        data: json data.
+
+    """
+    if isinstance(data, dict):
+        return FrozenDict((key, freeze(value)) for key, value in data.items())
+    if isinstance(data, (list, tuple)):
+        return tuple(freeze(value) for value in data)
+    return data
+
+
+class ConfigCache(object):
+    """
+    Process wide cache of config files.
+
+    Each file is loaded once, and only reloaded when its mtime or size
+    changes. The cached data is handed out as read only views,
+    so callers can't corrupt the shared copy.
+
+    Kwargs:
+        loader (function): function that loads a file path, and returns
+                           its data. Defaults to load_json.
+
+    """
+
+    def __init__(self, loader=None):
+        """Initialize the ConfigCache."""
+        self.loader = loader or load_json
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, file_path):
+        """
+        Get the config file data, loading it only if it changed.
+
+        Args:
+            file_path (str): config file path.
+
+        Returns:
+            FrozenDict. Read only config data.
+
+        Raises:
+            OSError, IOError. File not found or not readable.
+
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        signature = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(file_path)
+        if entry and entry[0] == signature:
+            return entry[1]
+        logger.info('Loading config: %s' % file_path)
+        data = freeze(self.loader(file_path))
+        with self._lock:
+            self._entries[file_path] = (signature, data)
+        return data
+
+    def invalidate(self, file_path=None):
+        """
+        Drop cached config data.
+
+        Kwargs:
+            file_path (str): config file to drop, all of them if None.
+
+        """
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(file_path), None)
+
+
+#: Shared config cache, all config loaders should go through it
+CONFIG_CACHE = ConfigCache()
+
+
+def load_config(file_path):
+    """
+    Load a json config file through the shared CONFIG_CACHE.
+
+    Args:
+        file_path (str): Json config file path to open.
+
+    Returns:
+        FrozenDict. Read only config data.
+
+    """
+    return CONFIG_CACHE.get(file_path)
+
+
 def save_json(file_path, data):
     """
     Dump a dict into a json file.
 
+    The file is written next to the destination and renamed into place,
+    so readers never see a partially written file.
+
     Args:
         file_path (str): Json file path to save.
         data (dict): Data to save into the json file.
 
     """
-    # TODO (eze)
-    pass
+    temp_file_path = '%s.%s.tmp' % (file_path, os.getpid())
+    with open(temp_file_path, 'w') as handle:
+        json.dump(data, handle, indent=4, sort_keys=True)
+    os.rename(temp_file_path, file_path)
+
+
+def get_file_hash(file_path, algorithm='sha1', chunk_size=1024 * 1024):
+    """
+    Get the content hash of a file, reading it in chunks.
+
+    Args:
+        file_path (str): File path to hash.
+
+    Kwargs:
+        algorithm (str): hashlib algorithm name.
+        chunk_size (int): bytes read at a time.
+
+    Returns:
+        str. Hex digest.
+
+    """
+    file_hash = hashlib.new(algorithm)
+    with open(file_path, 'rb') as handle:
+        chunk = handle.read(chunk_size)
+        while chunk:
+            file_hash.update(chunk)
+            chunk = handle.read(chunk_size)
+    return file_hash.hexdigest()
+
+
+def get_file_hashes(file_list, threads=FILE_SEARCH_THREADS):
+    """
+    Get the content hash of many files, hashing them in a thread pool.
+
+    Args:
+        file_list (list): File paths to hash.
+
+    Kwargs:
+        threads (int): files hashed concurrently.
+
+    Returns:
+        dict. Hex digest by file path, None for files that can't be read.
+
+    """
+    def file_hash(file_path):
+        try:
+            return get_file_hash(file_path)
+        except (IOError, OSError) as error:
+            logger.warning('Could not hash %s: %s' % (file_path, error))
+            return None
+
+    file_list = list(file_list)
+    if len(file_list) < 2:
+        return dict((file_path, file_hash(file_path))
+                    for file_path in file_list)
+    with Dispatcher(workers=min(threads, len(file_list))) as dispatcher:
+        return dict(zip(file_list, dispatcher.map(file_hash, file_list)))
+
+
+def find_duplicate_files(file_list, threads=FILE_SEARCH_THREADS):
+    """
+    Group byte identical files.
+
+    Only files sharing their size with some other file are hashed.
+
+    Args:
+        file_list (list): File paths to compare.
+
+    Kwargs:
+        threads (int): files hashed concurrently.
+
+    Returns:
+        list. Lists of identical file paths, in the file_list order,
+        for groups with more than one file.
+
+    """
+    by_size = {}
+    for file_path in file_list:
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            continue
+        by_size.setdefault(size, []).append(file_path)
+    candidates = [file_path
+                  for file_paths in by_size.values() if len(file_paths) > 1
+                  for file_path in file_paths]
+    hashes = get_file_hashes(candidates, threads=threads)
+    groups = {}
+    duplicates = []
+    seen = set()
+    for file_path in file_list:
+        file_hash = hashes.get(file_path)
+        if file_hash is None or file_path in seen:
+            continue
+        seen.add(file_path)
+        group = groups.get(file_hash)
+        if group is None:
+            group = groups[file_hash] = []
+            duplicates.append(group)
+        group.append(file_path)
+    return [group for group in duplicates if len(group) > 1]
+
+
+class IOThrottle(object):
+    """
+    Limit concurrent file transfers, and their total bandwidth.
+
+    Kwargs:
+        transfers (int): concurrent transfers, None for no limit.
+        bandwidth (float): bytes per second shared by all transfers,
+                           None for no limit.
+
+    """
+
+    def __init__(self, transfers=None, bandwidth=None):
+        """Initialize the IOThrottle."""
+        self.transfers = transfers
+        self.bandwidth = bandwidth
+        self._semaphore = None
+        if transfers:
+            self._semaphore = threading.BoundedSemaphore(transfers)
+        self._lock = threading.Lock()
+        self._available = 0.0
+
+    def __enter__(self):
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+        return self
+
+    def __exit__(self, *args):
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def consume(self, size):
+        """
+        Wait until size bytes can be transferred within the bandwidth.
+
+        Args:
+            size (int): bytes to transfer.
+
+        """
+        if not self.bandwidth:
+            return
+        with self._lock:
+            now = time.time()
+            start = max(self._available, now)
+            self._available = start + size / float(self.bandwidth)
+        if start > now:
+            time.sleep(start - now)
+
+
+class FileLock(object):
+    """
+    Exclusive lock on a file, shared between processes and hosts.
+
+    Uses posix record locks, that also work on network file systems with
+    lock support, for ie: nfs. Where fcntl is not available the lock only
+    serializes the threads of this process.
+
+    Args:
+        file_path (str): lock file path, created if it doesn't exist.
+
+    """
+
+    def __init__(self, file_path):
+        """Initialize the FileLock."""
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._handle = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            self._handle = open(self.file_path, 'a')
+            if fcntl is not None:
+                fcntl.lockf(self._handle, fcntl.LOCK_EX)
+        except Exception:
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, *args):
+        try:
+            if fcntl is not None:
+                fcntl.lockf(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+        finally:
+            self._handle = None
+            self._lock.release()
+
+
+def copy_file(source, target, throttle=None, chunk_size=1024 * 1024):
+    """
+    Copy a file contents and permissions, optionally throttled.
+
+    Args:
+        source (str): File path to copy.
+        target (str): Copy file path.
+
+    Kwargs:
+        throttle (IOThrottle): transfers and bandwidth limit.
+        chunk_size (int): bytes copied at a time.
+
+    """
+    if throttle is None:
+        throttle = IOThrottle()
+    with throttle:
+        with open(source, 'rb') as source_handle:
+            with open(target, 'wb') as target_handle:
+                chunk = source_handle.read(chunk_size)
+                while chunk:
+                    throttle.consume(len(chunk))
+                    target_handle.write(chunk)
+                    chunk = source_handle.read(chunk_size)
+    shutil.copymode(source, target)
+
+
+def link_file(source, target):
+    """
+    Hardlink a file, copying it if it can't be linked.
+
+    An existing target is replaced.
+
+    Args:
+        source (str): File path to link.
+        target (str): Link file path.
+
+    Returns:
+        bool. True if hardlinked, False if copied.
+
+    """
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+        return True
+    except (OSError, AttributeError):
+        shutil.copy2(source, target)
+        return False
+
+
+class LRUCache(object):
+    """
+    Thread safe, bounded, least recently used cache.
+
+    Kwargs:
+        maxsize (int): entries kept, the least recently used are dropped
+                       first.
+
+    """
+
+    def __init__(self, maxsize=1024):
+        """Initialize the LRUCache."""
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Get a cached value, and mark it as recently used.
+
+        Args:
+            key: cache key.
+
+        Kwargs:
+            default: returned if the key is not cached.
+
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                return default
+            self._entries[key] = value
+            return value
+
+    def put(self, key, value):
+        """
+        Cache a value, dropping the least recently used ones over maxsize.
+
+        Args:
+            key: cache key.
+            value: value to cache.
+
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all the cached values."""
+        with self._lock:
+            self._entries.clear()
+
+
+#: get_random_color cache, keyed by the encoded seed
+COLOR_CACHE = LRUCache(COLOR_CACHE_SIZE)
+
+#: Largest 32 bit value, hash words are divided by it to get 0-1 floats
+_UINT32_MAX = 4294967295.0
+
+
+def _encode_seed(seed):
+    """Get the utf-8 bytes of a seed, the same on python 2 and 3."""
+    if isinstance(seed, bytes):
+        return seed
+    if not isinstance(seed, type(u'')):
+        seed = str(seed)
+        if isinstance(seed, bytes):
+            return seed
+    return seed.encode('utf-8')
 
 
 def get_random_color(seed):
@@ -114,22 +644,45 @@ def get_random_color(seed):
     Return a random color using a seed.
 
     Used by all material creating, and viewport color functions
-    that do not use textures, to have a common color accross dccs
+    that do not use textures, to have a common color accross dccs.
+    The color comes from the sha1 of the seed, so it is the same
+    in every interpreter, and the global random state is left untouched.
 
     Args:
-        seed (str):
+        seed (str): for ie: a surfacing object name, other objects
+                    are converted with str().
 
     Returns:
         tuple, R,G,B colors.
 
     """
-    random.seed(seed + "_r")
-    color_red = random.uniform(0, 1)
-    random.seed(seed + "_g")
-    color_green = random.uniform(0, 1)
-    random.seed(seed + "_b")
-    color_blue = random.uniform(0, 1)
-    return color_red, color_green, color_blue
+    key = _encode_seed(seed)
+    color = COLOR_CACHE.get(key)
+    if color is None:
+        color = tuple(value / _UINT32_MAX for value in
+                      struct.unpack('>3I', hashlib.sha1(key).digest()[:12]))
+        COLOR_CACHE.put(key, color)
+    return color
+
+
+def get_random_colors(seeds):
+    """
+    Return the get_random_color of many seeds, in one call.
+
+    Args:
+        seeds (list): seeds, for ie: surfacing object names.
+
+    Returns:
+        numpy.ndarray. N x 3 float array, or a list of R,G,B tuples
+        if numpy is not available.
+
+    """
+    keys = [_encode_seed(seed) for seed in seeds]
+    if numpy is None:
+        return [get_random_color(key) for key in keys]
+    digests = b''.join(hashlib.sha1(key).digest()[:12] for key in keys)
+    words = numpy.frombuffer(digests, dtype='>u4').reshape(-1, 3)
+    return words / _UINT32_MAX
 
 
 def create_directoy(path):
@@ -158,7 +711,140 @@ def is_directory(path):
         return False
 
 
-def get_files_in_folder(path, recursive=False, pattern=None):
+def list_folder(path):
+    """
+    List a folder, splitting its entries into folders and files.
+
+    Uses scandir when available, entries are in the same order as
+    os.listdir, and classified the same way os.walk does.
+
+    Args:
+        path (str): Folder to list.
+
+    Returns:
+        tuple. path, list of (folder name, is symlink), list of file names.
+        None if the folder could not be listed.
+
+    """
+    folders = []
+    files = []
+    try:
+        if scandir is not None:
+            for entry in scandir(path):
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    folders.append((entry.name, entry.is_symlink()))
+                else:
+                    files.append(entry.name)
+        else:
+            for name in os.listdir(path):
+                entry_path = os.path.join(path, name)
+                if os.path.isdir(entry_path):
+                    folders.append((name, os.path.islink(entry_path)))
+                else:
+                    files.append(name)
+    except OSError:
+        logger.warning('Could not list folder: %s' % path)
+        return None
+    return path, folders, files
+
+
+def matches_any(name, patterns):
+    """
+    Check if a name matches any of the patterns.
+
+    Args:
+        name (str): file or folder name.
+        patterns (iterable): fnmatch patterns, case sensitive.
+
+    Returns:
+        bool. True if any pattern matches.
+
+    """
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(name, pattern):
+            return True
+    return False
+
+
+def iter_files_in_folder(path, recursive=False, pattern=None, extensions=None,
+                         exclude=FILE_SEARCH_EXCLUDE, prune=FILE_SEARCH_PRUNE,
+                         threads=FILE_SEARCH_THREADS):
+    """
+    Search files in a folder, yielding them as they are found.
+
+    Folders are listed in parallel in a thread pool, but files are yielded
+    in the same order as os.walk, top-down. Symlinked folders are not
+    searched into.
+
+    Args:
+        path (str): Path to search.
+
+    Kwards:
+        recursive (bool): Search files recursively in folder.
+        pattern (str): pattern to match, for ie '.exr'.
+        extensions (iterable): file extensions to match, for ie ['.exr', '.tif']
+                               case insensitive.
+        exclude (iterable): fnmatch patterns of file names to skip.
+        prune (iterable): fnmatch patterns of folder names to not search into.
+        threads (int): threads used to list folders.
+
+    Yields:
+        str. File path.
+
+    """
+    logger.info("Searching for files in: %s" % path)
+    logger.info("Searching options: Recursive %s, pattern: %s, extensions: %s" %
+                (recursive, pattern, extensions))
+    if extensions is not None:
+        extensions = set(extension.lower() for extension in extensions)
+    exclude = tuple(exclude or ())
+    prune = tuple(prune or ())
+
+    def accept(name):
+        if pattern and pattern not in name:
+            return False
+        if extensions is not None and \
+                os.path.splitext(name)[1].lower() not in extensions:
+            return False
+        return not matches_any(name, exclude)
+
+    if not recursive:
+        listing = list_folder(path)
+        if listing:
+            for name in listing[2]:
+                if accept(name):
+                    yield os.path.join(path, name)
+        return
+
+    dispatcher = Dispatcher(workers=threads, name='FileSearch')
+    try:
+        # Depth first, subfolders listings are submitted as soon as their
+        # parent is listed, and consumed in os.walk order.
+        pending = [dispatcher.submit(list_folder, path)]
+        while pending:
+            listing = pending.pop().result()
+            if not listing:
+                continue
+            folder, folders, files = listing
+            for name in files:
+                if accept(name):
+                    yield os.path.join(folder, name)
+            subfolders = [
+                dispatcher.submit(list_folder, os.path.join(folder, name))
+                for name, is_symlink in folders
+                if not is_symlink and not matches_any(name, prune)]
+            pending.extend(reversed(subfolders))
+    finally:
+        # Wait for the listing threads, daemon threads still running at
+        # interpreter exit raise on python 2
+        dispatcher.shutdown(wait=True, cancel_pending=True)
+
+
+def get_files_in_folder(path, recursive=False, pattern=None, **kwargs):
     """
     Search files in a folder.
 
@@ -168,29 +854,16 @@ def get_files_in_folder(path, recursive=False, pattern=None):
     Kwards:
         recursive (bool): Search files recursively in folder.
         pattern (str): pattern to match, for ie '.exr'.
+        **kwargs: extensions, exclude, prune and threads,
+                  see iter_files_in_folder.
 
     Returns:
         array. File list
 
     """
-    logger.info("Searching for files in: %s" % path)
-    logger.info("Searching options: Recursive %s, pattern: %s" %
-                (recursive, pattern))
-    file_list = []
-    for path, subdirs, files in os.walk(path):
-        for file in files:
-            # skip .mayaswatchs stuff
-            if ".maya" not in file:
-                if pattern:
-                    if pattern in file:
-                        file_list.append(os.path.join(path, file))
-                        logger.debug(
-                            "File with pattern found, added to the list: %s" % file)
-                else:
-                    file_list.append(os.path.join(path, file))
-                    logger.debug("File added to the list: %s" % file)
-        if not recursive:
-            break
+    file_list = list(iter_files_in_folder(
+        path, recursive=recursive, pattern=pattern, **kwargs))
+    logger.info("Files found: %s" % len(file_list))
     return file_list
 
 
@@ -227,12 +900,36 @@ def string_matching_ratio(stringA, stringB):
     return fuzz.token_set_ratio(stringA, stringB)
 
 
+def string_matching_ratios(strings, choices, score_cutoff=0):
+    """
+    Compare many strings against many choices, see string_matching_ratio.
+
+    Each string is processed once, and duplicated strings are only
+    compared once.
+
+    Args:
+        strings (list): strings to compare.
+        choices (list): strings to compare against.
+
+    Kwargs:
+        score_cutoff (int): ratios below this are 0, and pairs that can't
+                            reach it are not fully compared.
+
+    Returns:
+        numpy.ndarray. len(strings) x len(choices) ratios, or a list of
+        lists if numpy is not available.
+
+    """
+    return fuzzymatch.cdist(strings, choices, scorer=fuzz.token_set_ratio,
+                            score_cutoff=score_cutoff)
+
+
 def get_config_materials():
     """
-    Gets the CONFIG_MATERIALS_JSON as a dict
+    Gets the CONFIG_MATERIALS_JSON as a read only dict
 
     Returns:
-        dict. CONFIG_MATERIALS_JSON
+        FrozenDict. CONFIG_MATERIALS_JSON
 
     """
-    return load_json(CONFIG_MATERIALS_JSON)
+    return load_config(CONFIG_MATERIALS_JSON)
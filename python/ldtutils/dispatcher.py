@@ -0,0 +1,670 @@
+"""
+.. module:: dispatcher
+   :synopsis: Run callables and shell commands concurrently, with futures.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import traceback
+import subprocess
+import multiprocessing
+from collections import deque
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+logger = logging.getLogger(__name__)
+
+#: Future states
+PENDING = 'pending'
+RUNNING = 'running'
+FINISHED = 'finished'
+CANCELLED = 'cancelled'
+
+#: Dispatcher backends
+THREAD = 'thread'
+PROCESS = 'process'
+
+
+class DispatcherError(Exception):
+    """Base dispatcher error."""
+
+
+class TaskTimeoutError(DispatcherError):
+    """A task, or waiting for its result, took longer than its timeout."""
+
+
+class CancelledError(DispatcherError):
+    """The task was cancelled."""
+
+
+class RemoteError(DispatcherError):
+    """A task raised an exception that could not be sent from its process."""
+
+
+class Future(object):
+    """
+    Result of a task submitted to a Dispatcher.
+
+    Args:
+        function (callable): task function.
+        args (tuple): task positional arguments.
+        kwargs (dict): task keyword arguments.
+
+    Kwargs:
+        timeout (float): seconds the task can run, None for no limit.
+
+    """
+
+    def __init__(self, function, args, kwargs, timeout=None):
+        """Initialize the Future."""
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.started = None
+        self.finished = None
+        self._state = PENDING
+        self._result = None
+        self._exception = None
+        self._condition = threading.Condition()
+        self._callbacks = []
+        self.traceback = None
+        # Called to stop the task when it is cancelled while running
+        self._abort = None
+        # Shell commands, run in a worker thread and killed on cancel
+        self._in_thread = False
+        self._command_abort = None
+
+    def __repr__(self):
+        return '<Future %s %s>' % (getattr(self.function, '__name__',
+                                            self.function), self._state)
+
+    @property
+    def state(self):
+        """str. pending, running, finished or cancelled."""
+        return self._state
+
+    def running(self):
+        """bool. True if the task is running."""
+        return self._state == RUNNING
+
+    def done(self):
+        """bool. True if the task finished, failed or was cancelled."""
+        return self._state in (FINISHED, CANCELLED)
+
+    def cancelled(self):
+        """bool. True if the task was cancelled."""
+        return self._state == CANCELLED
+
+    def cancel(self):
+        """
+        Cancel the task.
+
+        Pending tasks never run. Running tasks of the process backend, and
+        shell commands, are terminated. Running tasks of the thread backend
+        can't be stopped, their result is discarded.
+
+        Returns:
+            bool. False if the task was already done.
+
+        """
+        with self._condition:
+            if self.done():
+                return False
+            abort = self._abort if self._state == RUNNING else None
+            self._finish(CANCELLED, exception=CancelledError(
+                'Task %r was cancelled' % self))
+        if abort is not None:
+            abort()
+        return True
+
+    def add_done_callback(self, callback):
+        """
+        Call a function with this future when it is done.
+
+        Args:
+            callback (function): called with the future, right away if it
+                                 is already done.
+
+        """
+        with self._condition:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _start(self, abort=None):
+        """Mark the future as running, returns False if it was cancelled."""
+        with self._condition:
+            if self._state != PENDING:
+                return False
+            self._state = RUNNING
+            self._abort = abort
+            self.started = time.time()
+            return True
+
+    def _finish(self, state=FINISHED, result=None, exception=None):
+        """Set the future result, returns False if it was already done."""
+        with self._condition:
+            if self.done():
+                return False
+            self._state = state
+            self._result = result
+            self._exception = exception
+            self._abort = None
+            self.finished = time.time()
+            callbacks, self._callbacks = self._callbacks, []
+            self._condition.notify_all()
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logger.exception('Future done callback failed')
+        return True
+
+    def _wait(self, timeout):
+        with self._condition:
+            if timeout is None:
+                while not self.done():
+                    # Waiting with a timeout keeps py2 interruptible
+                    self._condition.wait(3600)
+            else:
+                end = time.time() + timeout
+                while not self.done():
+                    remaining = end - time.time()
+                    if remaining <= 0:
+                        raise TaskTimeoutError(
+                            'Waited %s seconds for %r' % (timeout, self))
+                    self._condition.wait(remaining)
+
+    def exception(self, timeout=None):
+        """
+        Wait for the task, and get the exception it raised.
+
+        Kwargs:
+            timeout (float): seconds to wait, None to wait until done.
+
+        Returns:
+            Exception. None if the task succeeded.
+
+        """
+        self._wait(timeout)
+        return self._exception
+
+    def result(self, timeout=None):
+        """
+        Wait for the task, and get its result.
+
+        Kwargs:
+            timeout (float): seconds to wait, None to wait until done.
+
+        Returns:
+            The task result. The exception raised by the task is raised.
+
+        """
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+class CommandResult(object):
+    """
+    Result of a shell command.
+
+    Args:
+        command (list or str): command line.
+
+    Kwargs:
+        returncode (int): exit code, None if the command could not run.
+        stdout (str): standard output.
+        stderr (str): standard error, or the error message if the command
+                      could not run.
+        duration (float): wall time in seconds.
+        timed_out (bool): True if the command was killed at its timeout.
+
+    """
+
+    def __init__(self, command, returncode=None, stdout='', stderr='',
+                 duration=0.0, timed_out=False):
+        """Initialize the CommandResult."""
+        self.command = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.timed_out = timed_out
+
+    def __repr__(self):
+        return 'CommandResult(returncode=%r, duration=%.2f%s)' % (
+            self.returncode, self.duration,
+            ', timed_out=True' if self.timed_out else '')
+
+    @property
+    def succeeded(self):
+        """bool. True if the command exited without errors."""
+        return self.returncode == 0
+
+
+def kill_process(process):
+    """
+    Kill a process, and on posix the children in its process group.
+
+    Args:
+        process (subprocess.Popen): process started by run_command.
+
+    """
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except OSError:
+        pass
+
+
+def run_command(command, timeout=None, process_callback=None, log_file=None,
+                **kwargs):
+    """
+    Run a shell command, and capture its output.
+
+    Args:
+        command (list or str): command line, a string runs in a shell.
+
+    Kwargs:
+        timeout (float): seconds before the command is killed.
+        process_callback (function): called with the Popen object once
+                                     the command started.
+        log_file (str): file path where stdout and stderr are written,
+                        instead of being captured.
+        kwargs: extra subprocess.Popen arguments, for ie: cwd or env.
+
+    Returns:
+        CommandResult.
+
+    """
+    if hasattr(os, 'setsid') and 'preexec_fn' not in kwargs:
+        # Own process group, so a timeout also kills the command children
+        kwargs['preexec_fn'] = os.setsid
+    result = CommandResult(command)
+    start = time.time()
+    if log_file is not None:
+        log_handle = open(log_file, 'w')
+        output = {'stdout': log_handle, 'stderr': subprocess.STDOUT}
+    else:
+        log_handle = None
+        output = {'stdout': subprocess.PIPE, 'stderr': subprocess.PIPE}
+    try:
+        process = subprocess.Popen(command,
+                                   shell=not isinstance(command, (list,
+                                                                  tuple)),
+                                   **dict(output, **kwargs))
+    except OSError as error:
+        if log_handle is not None:
+            log_handle.write('%s\n' % error)
+            log_handle.close()
+        result.stderr = str(error)
+        result.duration = time.time() - start
+        return result
+    if process_callback is not None:
+        process_callback(process)
+    timer = None
+    if timeout is not None:
+        def kill():
+            result.timed_out = True
+            kill_process(process)
+        timer = threading.Timer(timeout, kill)
+        timer.daemon = True
+        timer.start()
+    try:
+        stdout, stderr = process.communicate()
+        result.stdout, result.stderr = stdout or '', stderr or ''
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if log_handle is not None:
+            log_handle.close()
+    result.returncode = process.returncode
+    result.duration = time.time() - start
+    return result
+
+
+def _run_in_process(connection, function, args, kwargs):
+    """Run a task in a child process, and send back its outcome."""
+    try:
+        outcome = (True, function(*args, **kwargs))
+    except BaseException as error:
+        outcome = (False, error, traceback.format_exc())
+    try:
+        connection.send(outcome)
+    except Exception:
+        # The result, or the exception, can't be pickled
+        connection.send((False, RemoteError(
+            'Could not send the outcome: %r' % (outcome[1:],)),
+            outcome[-1] if not outcome[0] else ''))
+    connection.close()
+
+
+class Dispatcher(object):
+    """
+    Run tasks concurrently, returning a Future per task.
+
+    Tasks are callables, or shell commands. At most workers tasks run at
+    the same time, the rest wait in submission order.
+
+    The thread backend runs tasks in worker threads, for io bound tasks,
+    and functions that release the GIL, like subprocesses or hashing.
+    The process backend runs each task in its own child process, so cpu
+    bound python tasks run in parallel, and timed out or cancelled tasks
+    are terminated. Its tasks, their arguments and results must be
+    picklable on platforms without fork.
+
+    Kwargs:
+        workers (int): concurrent tasks, defaults to the cpu count.
+        backend (str): 'thread' or 'process'.
+        timeout (float): default seconds a task can run, None for no limit.
+        name (str): worker threads name, for logging.
+
+    """
+
+    def __init__(self, workers=None, backend=THREAD, timeout=None,
+                 name='Dispatcher'):
+        """Initialize the Dispatcher."""
+        if backend not in (THREAD, PROCESS):
+            raise ValueError('Unknown backend %s, expected %s or %s' %
+                             (backend, THREAD, PROCESS))
+        if not workers:
+            try:
+                workers = multiprocessing.cpu_count()
+            except NotImplementedError:
+                workers = 1
+        self.workers = max(1, int(workers))
+        self.backend = backend
+        self.timeout = timeout
+        self.name = name
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._shutdown = False
+
+    def __repr__(self):
+        return 'Dispatcher(workers=%s, backend=%r)' % (self.workers,
+                                                       self.backend)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, error_traceback):
+        # Do not wait for the remaining tasks when unwinding an error
+        self.shutdown(wait=error is None, cancel_pending=error is not None)
+
+    def _start_worker(self):
+        """Start a worker thread, if all of them are busy."""
+        if len(self._threads) >= self.workers:
+            return
+        thread = threading.Thread(
+            target=self._work,
+            name='%s-%s' % (self.name, len(self._threads)))
+        thread.daemon = True
+        self._threads.append(thread)
+        thread.start()
+
+    def _work(self):
+        """Worker thread loop, runs pending tasks until shutdown."""
+        while True:
+            with self._condition:
+                while not self._pending and not self._shutdown:
+                    self._condition.wait(3600)
+                if not self._pending:
+                    return
+                future = self._pending.popleft()
+            if self.backend == PROCESS and not future._in_thread:
+                self._run_process(future)
+            else:
+                self._run_thread(future)
+
+    def _run_thread(self, future):
+        """Run a task in this worker thread."""
+        if not future._start(abort=future._command_abort):
+            return
+        timer = None
+        if future.timeout is not None:
+            timer = threading.Timer(future.timeout, future._finish, kwargs={
+                'exception': TaskTimeoutError(
+                    '%r ran for more than %s seconds' %
+                    (future, future.timeout))})
+            timer.daemon = True
+            timer.start()
+        try:
+            result = future.function(*future.args, **future.kwargs)
+        except BaseException as error:
+            future._finish(exception=error)
+        else:
+            future._finish(result=result)
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def _run_process(self, future):
+        """Run a task in a child process, waiting for it in this thread."""
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_run_in_process,
+            args=(sender, future.function, future.args, future.kwargs))
+        process.daemon = True
+
+        def abort():
+            if process.is_alive():
+                process.terminate()
+
+        if not future._start(abort=abort):
+            return
+        try:
+            process.start()
+        except Exception as error:
+            future._finish(exception=error)
+            return
+        sender.close()
+        timeout = future.timeout
+        end = time.time() + timeout if timeout is not None else None
+        try:
+            while not future.done():
+                wait = 1.0 if end is None else min(1.0, end - time.time())
+                if wait <= 0:
+                    abort()
+                    future._finish(exception=TaskTimeoutError(
+                        '%r ran for more than %s seconds' %
+                        (future, timeout)))
+                    break
+                if receiver.poll(wait):
+                    try:
+                        outcome = receiver.recv()
+                    except EOFError:
+                        outcome = (False, RemoteError(
+                            'Task process exited with code %s' %
+                            process.exitcode), '')
+                    if outcome[0]:
+                        future._finish(result=outcome[1])
+                    else:
+                        future.traceback = outcome[2]
+                        future._finish(exception=outcome[1])
+                elif not process.is_alive() and not receiver.poll():
+                    future._finish(exception=RemoteError(
+                        'Task process exited with code %s' %
+                        process.exitcode))
+        finally:
+            receiver.close()
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Submit a callable.
+
+        Args:
+            function (callable): task function.
+            args: task positional arguments.
+
+        Kwargs:
+            kwargs: task keyword arguments. A 'task_timeout' keyword sets
+                    the seconds this task can run, instead of the
+                    dispatcher timeout.
+
+        Returns:
+            Future.
+
+        """
+        timeout = kwargs.pop('task_timeout', self.timeout)
+        return self._enqueue(Future(function, args, kwargs, timeout=timeout))
+
+    def _enqueue(self, future):
+        """Add a future to the pending tasks."""
+        with self._condition:
+            if self._shutdown:
+                raise DispatcherError('Dispatcher %r is shut down' % self)
+            self._pending.append(future)
+            self._start_worker()
+            self._condition.notify()
+        return future
+
+    def submit_command(self, command, timeout=None, **kwargs):
+        """
+        Submit a shell command.
+
+        The command runs from a worker thread, whatever the backend, and it
+        is killed at its timeout, or when its future is cancelled.
+
+        Args:
+            command (list or str): command line, a string runs in a shell.
+
+        Kwargs:
+            timeout (float): seconds before the command is killed, defaults
+                             to the dispatcher timeout.
+            kwargs: extra subprocess.Popen arguments, for ie: cwd or env.
+
+        Returns:
+            Future. Its result is a CommandResult.
+
+        """
+        if timeout is None:
+            timeout = self.timeout
+        processes = []
+
+        def abort():
+            for process in processes:
+                kill_process(process)
+
+        def run():
+            return run_command(command, timeout=timeout,
+                               process_callback=processes.append, **kwargs)
+
+        future = Future(run, (), {})
+        # Commands are waited for in a worker thread, whatever the backend
+        future._in_thread = True
+        future._command_abort = abort
+        return self._enqueue(future)
+
+    def map(self, function, iterable, ordered=True, timeout=None):
+        """
+        Run a function on each item of an iterable.
+
+        Args:
+            function (callable): called with each item.
+            iterable (iterable): items.
+
+        Kwargs:
+            ordered (bool): yield results in the items order, if False
+                            yield them as soon as they are done.
+            timeout (float): seconds each task can run, defaults to the
+                             dispatcher timeout.
+
+        Yields:
+            Task results. The first exception raised by a task is raised,
+            and the remaining tasks are cancelled.
+
+        """
+        if timeout is None:
+            timeout = self.timeout
+        futures = [self.submit(function, item, task_timeout=timeout)
+                   for item in iterable]
+        try:
+            if ordered:
+                for future in futures:
+                    yield future.result()
+            else:
+                for future in as_completed(futures):
+                    yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """
+        Stop accepting tasks, and stop the workers once idle.
+
+        Kwargs:
+            wait (bool): wait for the running and pending tasks.
+            cancel_pending (bool): cancel the tasks that didn't start.
+
+        """
+        with self._condition:
+            self._shutdown = True
+            pending = list(self._pending) if cancel_pending else []
+            self._condition.notify_all()
+        for future in pending:
+            future.cancel()
+        if wait:
+            for thread in list(self._threads):
+                while thread.is_alive():
+                    thread.join(1.0)
+
+
+def as_completed(futures, timeout=None):
+    """
+    Yield futures as they are done.
+
+    Args:
+        futures (iterable): futures to wait for.
+
+    Kwargs:
+        timeout (float): seconds to wait for all of them.
+
+    Yields:
+        Future.
+
+    """
+    futures = list(futures)
+    done = queue.Queue()
+    for future in futures:
+        future.add_done_callback(done.put)
+    end = time.time() + timeout if timeout is not None else None
+    for i in range(len(futures)):
+        if end is None:
+            # Waiting with a timeout keeps py2 interruptible
+            while True:
+                try:
+                    future = done.get(timeout=3600)
+                    break
+                except queue.Empty:
+                    continue
+        else:
+            try:
+                future = done.get(timeout=max(0.0, end - time.time()))
+            except queue.Empty:
+                raise TaskTimeoutError('%s of %s futures were not done in '
+                                       '%s seconds' %
+                                       (len(futures) - i, len(futures),
+                                        timeout))
+        yield future
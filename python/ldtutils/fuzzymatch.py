@@ -0,0 +1,329 @@
+"""
+.. module:: fuzzymatch
+   :synopsis: Batch fuzzy string matching, scores many strings at once.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+"""
+
+import os
+import logging
+
+from fuzzywuzzy import fuzz
+from fuzzywuzzy import process
+from fuzzywuzzy import utils
+from fuzzywuzzy import bitparallel
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+
+def _sort_tokens(string):
+    """Get the full processed, sorted tokens string, as token_sort_ratio."""
+    return u' '.join(sorted(utils.full_process(string,
+                                               force_ascii=True).split()))
+
+
+def _sort_token_set(string):
+    """Get the full processed, sorted unique tokens, as token_set_ratio."""
+    return u' '.join(sorted(set(utils.full_process(string,
+                                                   force_ascii=True).split())))
+
+
+def _process_ascii(string):
+    """Get the full processed string, as QRatio."""
+    return utils.full_process(string, force_ascii=True)
+
+
+def _no_process(string):
+    return string
+
+
+#: Scorers with a fast path, and how their strings are prepared
+_PREPARERS = {
+    fuzz.ratio: _no_process,
+    fuzz.QRatio: _process_ascii,
+    fuzz.token_sort_ratio: _sort_tokens,
+    fuzz.token_set_ratio: _sort_token_set,
+}
+
+#: Scorers that run full_process on their strings
+_SELF_PROCESSING = (fuzz.WRatio, fuzz.QRatio, fuzz.UWRatio, fuzz.UQRatio,
+                    fuzz.token_set_ratio, fuzz.token_sort_ratio,
+                    fuzz.partial_token_set_ratio,
+                    fuzz.partial_token_sort_ratio)
+
+#: Fast path scorers that score empty strings as 0, even if both are empty
+_EMPTY_IS_ZERO = (fuzz.QRatio, fuzz.token_set_ratio)
+
+
+def _token_set_score(query_tokens, choice_tokens, score_cutoff=0):
+    """
+    Score two token sets that share tokens, as fuzz.token_set_ratio.
+
+    The intersection string is a prefix of both combined strings, so its
+    longest common subsequence with each of them is its length, and the
+    common prefix of the combined strings is part of theirs. Only the
+    combined strings remainders, after their common prefix, are compared.
+
+    Args:
+        query_tokens (set): query tokens.
+        choice_tokens (set): choice tokens.
+
+    Kwargs:
+        score_cutoff (int): the combined strings aren't compared, if they
+                            can't score this.
+
+    Returns:
+        int. Score.
+
+    """
+    intersection = u' '.join(sorted(query_tokens & choice_tokens))
+    combined_query = (intersection + u' ' + u' '.join(
+        sorted(query_tokens - choice_tokens))).strip()
+    combined_choice = (intersection + u' ' + u' '.join(
+        sorted(choice_tokens - query_tokens))).strip()
+    length = len(intersection)
+    query_length = len(combined_query)
+    choice_length = len(combined_choice)
+    best = 2.0 * length / (length + min(query_length, choice_length))
+    lensum = query_length + choice_length
+    # The combined strings ratio can't be higher than their length ratio
+    highest = 2.0 * min(query_length, choice_length) / lensum
+    if highest > best and utils.intr(100 * highest) >= score_cutoff:
+        prefix = len(os.path.commonprefix([combined_query, combined_choice]))
+        common = prefix + bitparallel.lcs_length(combined_query[prefix:],
+                                                 combined_choice[prefix:])
+        best = max(best, 2.0 * common / lensum)
+    return utils.intr(100 * best)
+
+
+def _score_choice(choice, queries, scorer, score_cutoff, encoded=None,
+                  query_tokens=None):
+    """
+    Score one prepared choice against all the prepared queries.
+
+    The choice is set once as the SequenceMatcher second sequence, so its
+    lookup tables are built once, and reused for all the queries. With the
+    bit-parallel matcher, all the query ratios are computed in one call.
+
+    Args:
+        choice (str): prepared choice string.
+        queries (list): prepared query strings.
+        scorer (function): one of the _PREPARERS scorers.
+        score_cutoff (int): scores below this are 0.
+
+    Kwargs:
+        encoded (EncodedTexts): the queries, encoded for the bit-parallel
+                                matcher.
+        query_tokens (list): the queries token sets, for token_set_ratio.
+
+    Returns:
+        list. Scores, one per query.
+
+    """
+    matcher = fuzz.SequenceMatcher(None, '', choice)
+    choice_tokens = None
+    if scorer is fuzz.token_set_ratio:
+        choice_tokens = set(choice.split())
+    choice_length = len(choice)
+    scores = []
+    # Queries that need a full ratio, scored in one call
+    pending = []
+    for index, query in enumerate(queries):
+        if query == choice:
+            score = 0 if not choice and scorer in _EMPTY_IS_ZERO else 100
+        elif not query or not choice:
+            score = 0
+        elif choice_tokens and not choice_tokens.isdisjoint(
+                query_tokens[index]):
+            # Shared tokens, score the intersection strings as fuzz does,
+            # without them token_set_ratio is the sorted tokens ratio
+            score = _token_set_score(query_tokens[index], choice_tokens,
+                                     score_cutoff)
+        else:
+            query_length = len(query)
+            # The ratio can't be higher than the strings length ratio
+            if score_cutoff and utils.intr(
+                    200.0 * min(query_length, choice_length) /
+                    (query_length + choice_length)) < score_cutoff:
+                scores.append(0)
+                continue
+            if encoded is not None:
+                pending.append(index)
+                scores.append(0)
+                continue
+            matcher.set_seq1(query)
+            # Nor higher than the quick_ratio, the shared characters ratio
+            if score_cutoff and \
+                    utils.intr(100 * matcher.quick_ratio()) < score_cutoff:
+                scores.append(0)
+                continue
+            score = utils.intr(100 * matcher.ratio())
+        scores.append(score if score >= score_cutoff else 0)
+    if pending:
+        ratios = bitparallel.ratios(choice, encoded)
+        for index in pending:
+            score = utils.intr(100 * ratios[index])
+            scores[index] = score if score >= score_cutoff else 0
+    return scores
+
+
+def _unique(strings):
+    """Get the unique strings, and each string index in them."""
+    unique = []
+    indices = []
+    positions = {}
+    for string in strings:
+        position = positions.get(string)
+        if position is None:
+            position = positions[string] = len(unique)
+            unique.append(string)
+        indices.append(position)
+    return unique, indices
+
+
+def cdist(queries, choices, scorer=fuzz.token_set_ratio, processor=None,
+          score_cutoff=0):
+    """
+    Score every query against every choice.
+
+    Gives the same scores as calling the scorer on each pair, but each
+    string is processed and tokenized once, and duplicated strings are
+    only scored once. Scorers other than ratio, QRatio, token_sort_ratio
+    and token_set_ratio are called per unique pair.
+
+    Args:
+        queries (list): query strings.
+        choices (list): choice strings.
+
+    Kwargs:
+        scorer (function): fuzzywuzzy.fuzz scorer.
+        processor (function): called on each string before scoring.
+        score_cutoff (int): scores below this are returned as 0, and
+                            pairs that can't reach it are not fully scored.
+
+    Returns:
+        numpy.ndarray. len(queries) x len(choices) int array, or a list of
+        lists if numpy is not available.
+
+    """
+    queries = list(queries)
+    choices = list(choices)
+    if processor is not None:
+        queries = [processor(query) for query in queries]
+        choices = [processor(choice) for choice in choices]
+    if None in queries or None in choices:
+        raise TypeError('cdist can not score None')
+    preparer = _PREPARERS.get(scorer)
+    if preparer is not None:
+        queries = [preparer(query) for query in queries]
+        choices = [preparer(choice) for choice in choices]
+    unique_queries, query_indices = _unique(queries)
+    unique_choices, choice_indices = _unique(choices)
+    encoded = None
+    if preparer is not None and \
+            fuzz.SequenceMatcher is bitparallel.BitParallelMatcher:
+        encoded = bitparallel.EncodedTexts(unique_queries)
+    query_tokens = None
+    if scorer is fuzz.token_set_ratio:
+        query_tokens = [set(query.split()) for query in unique_queries]
+    # Scored per choice, as columns
+    columns = []
+    for choice in unique_choices:
+        if preparer is not None:
+            columns.append(_score_choice(choice, unique_queries, scorer,
+                                         score_cutoff, encoded, query_tokens))
+        else:
+            column = []
+            for query in unique_queries:
+                score = scorer(query, choice)
+                column.append(score if score >= score_cutoff else 0)
+            columns.append(column)
+    if numpy is not None:
+        unique_scores = numpy.array(columns, dtype=numpy.int32).reshape(
+            len(unique_choices), len(unique_queries)).T
+        return unique_scores[numpy.ix_(numpy.array(query_indices, dtype=int),
+                                       numpy.array(choice_indices, dtype=int))]
+    return [[columns[choice_index][query_index]
+             for choice_index in choice_indices]
+            for query_index in query_indices]
+
+
+def extract_best(queries, choices, processor=process.default_processor,
+                 scorer=process.default_scorer, score_cutoff=0):
+    """
+    Find the best choice for each query, scoring them with cdist.
+
+    Args:
+        queries (list): query strings.
+        choices (list or dict): choices, dict values are matched, as in
+                                fuzzywuzzy.process.extractOne.
+
+    Kwargs:
+        processor (function): called on each string before scoring.
+        scorer (function): fuzzywuzzy.fuzz scorer.
+        score_cutoff (int): best matches below this score are None.
+
+    Returns:
+        list. Per query, a (choice, score) tuple, a (choice, score, key)
+        tuple for dict choices, or None if there was no match.
+
+    """
+    try:
+        items = list(choices.items())
+    except AttributeError:
+        items = None
+        values = list(choices)
+    else:
+        values = [value for key, value in items]
+    if not values:
+        return [None for query in queries]
+    # Don't run full_process twice, as extractOne
+    if processor is utils.full_process and scorer in _SELF_PROCESSING:
+        processor = None
+    scores = cdist(queries, values, scorer=scorer, processor=processor,
+                   score_cutoff=score_cutoff)
+    matches = []
+    for row in scores:
+        row = list(row)
+        score = max(row)
+        # Scores under the cutoff are 0
+        if score_cutoff and not score:
+            matches.append(None)
+            continue
+        index = row.index(score)
+        if items is None:
+            matches.append((values[index], int(score)))
+        else:
+            matches.append((values[index], int(score), items[index][0]))
+    return matches
+
+
+def extract_one(query, choices, processor=process.default_processor,
+                scorer=process.default_scorer, score_cutoff=0):
+    """
+    Find the best choice for a query.
+
+    Same arguments and results as fuzzywuzzy.process.extractOne.
+
+    Args:
+        query (str): query string.
+        choices (list or dict): choices, dict values are matched.
+
+    Kwargs:
+        processor (function): called on each string before scoring.
+        scorer (function): fuzzywuzzy.fuzz scorer.
+        score_cutoff (int): best matches below this score are None.
+
+    Returns:
+        tuple. (choice, score), or (choice, score, key) for dict choices,
+        None if there was no match.
+
+    """
+    return extract_best([query], choices, processor=processor,
+                        scorer=scorer, score_cutoff=score_cutoff)[0]
@@ -0,0 +1,247 @@
+"""
+.. module:: mayabatch
+   :synopsis: Headless mayapy jobs, that assemble alembics with their textures.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+"""
+
+import os
+import json
+import logging
+import multiprocessing
+
+from ldtcommon import LOOKDEVTOOLS_FOLDER
+from ldtcommon import DEFAULT_SHADER
+from ldtcommon import MAYAPY_EXEC
+from ldtcommon import MAYA_BATCH_TIMEOUT
+from ldtutils.dispatcher import Dispatcher, as_completed
+
+logger = logging.getLogger(__name__)
+
+#: Suffix added to the alembic name, for the assembled scene name
+SCENE_SUFFIX = 'WithTexture'
+
+#: mayapy script run by each job, the job settings are embedded as json
+SCRIPT_TEMPLATE = '''\
+# Generated by ldtutils.mayabatch, assembles %(name)s
+import os
+import sys
+import json
+import traceback
+
+JOB = json.loads(%(job)r)
+os.environ.setdefault('LOOKDEVTOOLS', JOB['lookdevtools'])
+sys.path.insert(0, os.path.join(JOB['lookdevtools'], 'python'))
+
+import maya.standalone
+maya.standalone.initialize(name='python')
+
+status = 0
+try:
+    import ldtmaya
+    ldtmaya.assemble_textured_scene(JOB['alembic'], JOB['textures'],
+                                    JOB['scene'],
+                                    shader_type=JOB['shader_type'])
+except Exception:
+    traceback.print_exc()
+    status = 1
+if hasattr(maya.standalone, 'uninitialize'):
+    maya.standalone.uninitialize()
+sys.stdout.flush()
+sys.stderr.flush()
+# mayapy can hang on exit, after uninitialize
+os._exit(status)
+'''
+
+
+class MayaBatchJob(object):
+    """
+    A mayapy job, that imports an alembic, assigns its textures, and
+    saves the scene.
+
+    Args:
+        alembic (str): alembic file path.
+        textures (list or str): texture file paths, or a folder to search
+                                for textures in.
+        scene (str): maya scene to save.
+        script (str): mayapy script path.
+        log (str): job output log path.
+
+    Kwargs:
+        shader_type (str): type of material shader to create.
+
+    """
+
+    def __init__(self, alembic, textures, scene, script, log,
+                 shader_type=DEFAULT_SHADER):
+        """Initialize the MayaBatchJob."""
+        self.alembic = alembic
+        self.textures = textures
+        self.scene = scene
+        self.script = script
+        self.log = log
+        self.shader_type = shader_type
+        #: CommandResult, once the job ran
+        self.result = None
+
+    def __repr__(self):
+        return 'MayaBatchJob(%r, scene=%r)' % (self.alembic, self.scene)
+
+    @property
+    def name(self):
+        """str. Job name, the scene file name without extension."""
+        return os.path.splitext(os.path.basename(self.scene))[0]
+
+    @property
+    def succeeded(self):
+        """bool. True if the job ran without errors, and saved the scene."""
+        return (self.result is not None and self.result.succeeded and
+                os.path.isfile(self.scene))
+
+    def to_dict(self):
+        """
+        Get the job settings, as embedded in its script.
+
+        Returns:
+            dict.
+
+        """
+        return {'alembic': self.alembic,
+                'textures': self.textures,
+                'scene': self.scene,
+                'shader_type': self.shader_type,
+                'lookdevtools': LOOKDEVTOOLS_FOLDER}
+
+    def write_script(self):
+        """Write the job mayapy script."""
+        with open(self.script, 'w') as handle:
+            handle.write(SCRIPT_TEMPLATE % {
+                'name': self.name,
+                'job': json.dumps(self.to_dict(), sort_keys=True)})
+
+    def get_command(self, mayapy=MAYAPY_EXEC):
+        """
+        Get the job command line.
+
+        Kwargs:
+            mayapy (str): mayapy executable.
+
+        Returns:
+            list.
+
+        """
+        return [mayapy, self.script]
+
+
+def get_scene_path(alembic, output_folder=None, extension='.mb'):
+    """
+    Get the assembled scene path of an alembic.
+
+    Args:
+        alembic (str): alembic file path.
+
+    Kwargs:
+        output_folder (str): scenes folder, defaults to the alembic folder.
+        extension (str): scene extension, '.mb' or '.ma'.
+
+    Returns:
+        str. for ie: /out/cabinWithTexture.mb
+
+    """
+    folder, file_name = os.path.split(os.path.abspath(alembic))
+    name = os.path.splitext(file_name)[0]
+    return os.path.join(os.path.abspath(output_folder or folder),
+                        '%s%s%s' % (name, SCENE_SUFFIX, extension))
+
+
+def create_jobs(texture_mapping, output_folder=None, log_folder=None,
+                shader_type=DEFAULT_SHADER, extension='.mb'):
+    """
+    Create the mayapy jobs, and write their scripts.
+
+    Args:
+        texture_mapping (dict): texture set per alembic file path, a list
+                                of texture file paths, or a folder. A list
+                                of (alembic, textures) pairs also works.
+
+    Kwargs:
+        output_folder (str): scenes folder, defaults to each alembic folder.
+        log_folder (str): scripts and logs folder, defaults to each scene
+                          folder.
+        shader_type (str): type of material shader to create.
+        extension (str): scene extension, '.mb' or '.ma'.
+
+    Returns:
+        list. MayaBatchJob list.
+
+    """
+    if hasattr(texture_mapping, 'items'):
+        texture_mapping = sorted(texture_mapping.items())
+    jobs = []
+    for alembic, textures in texture_mapping:
+        alembic = os.path.abspath(alembic)
+        if isinstance(textures, (list, tuple)):
+            textures = [os.path.abspath(path) for path in textures]
+        else:
+            textures = os.path.abspath(textures)
+        scene = get_scene_path(alembic, output_folder, extension)
+        folder = os.path.abspath(log_folder or os.path.dirname(scene))
+        for path in (os.path.dirname(scene), folder):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        name = os.path.splitext(os.path.basename(scene))[0]
+        job = MayaBatchJob(alembic, textures, scene,
+                           os.path.join(folder, name + '.py'),
+                           os.path.join(folder, name + '.log'),
+                           shader_type=shader_type)
+        job.write_script()
+        jobs.append(job)
+    return jobs
+
+
+def run_jobs(jobs, workers=None, timeout=MAYA_BATCH_TIMEOUT,
+             mayapy=MAYAPY_EXEC, callback=None):
+    """
+    Run mayapy jobs in parallel, each job output goes to its log.
+
+    Args:
+        jobs (list): MayaBatchJob list.
+
+    Kwargs:
+        workers (int): concurrent mayapy processes, defaults to half the
+                       cpu count.
+        timeout (float): seconds before a job is killed.
+        mayapy (str): mayapy executable.
+        callback (function): called with each job, as they finish.
+
+    Returns:
+        list. The jobs, with their result set.
+
+    """
+    if workers is None:
+        workers = max(1, multiprocessing.cpu_count() // 2)
+    with Dispatcher(workers=workers, name='MayaBatch') as dispatcher:
+        futures = {}
+        for job in jobs:
+            future = dispatcher.submit_command(job.get_command(mayapy),
+                                               timeout=timeout,
+                                               log_file=job.log)
+            futures[future] = job
+        for future in as_completed(futures):
+            job = futures[future]
+            job.result = future.result()
+            if job.succeeded:
+                logger.info('Assembled %s in %.1f seconds' %
+                            (job.scene, job.result.duration))
+            elif job.result.timed_out:
+                logger.error('Killed %s after %.1f seconds, see %s' %
+                             (job.name, job.result.duration, job.log))
+            else:
+                logger.error('Failed %s, exit code %s, see %s' %
+                             (job.name, job.result.returncode, job.log))
+            if callback is not None:
+                callback(job)
+    failed = len([job for job in jobs if not job.succeeded])
+    logger.info('%s maya jobs finished, %s failed' % (len(jobs), failed))
+    return jobs
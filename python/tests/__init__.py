@@ -0,0 +1,35 @@
+"""
+.. module:: tests
+   :synopsis: Headless tests, no dcc, Qt or display needed.
+
+.. moduleauthor:: Ezequiel Mastrasso
+
+Run them from the python folder with:
+    python -m unittest discover -s tests -t .
+
+LOOKDEVTOOLS defaults to this repository.
+
+"""
+
+import os
+import sys
+
+PYTHON_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('LOOKDEVTOOLS', os.path.dirname(PYTHON_FOLDER))
+if PYTHON_FOLDER not in sys.path:
+    sys.path.insert(0, PYTHON_FOLDER)
+
+
+def write_script(file_path, source):
+    """
+    Write an executable python script, run by this interpreter.
+
+    Args:
+        file_path (str): script path.
+        source (str): script source, without the shebang line.
+
+    """
+    with open(file_path, 'w') as handle:
+        handle.write('#!%s\n%s' % (sys.executable, source))
+    os.chmod(file_path, 0o755)
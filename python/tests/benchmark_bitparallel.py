@@ -0,0 +1,66 @@
+"""
+Times the bit-parallel matcher against difflib, run it as a script:
+
+    python -m tests.benchmark_bitparallel
+
+"""
+
+import difflib
+import timeit
+
+import tests
+import ldtcommon
+from fuzzywuzzy import bitparallel
+from tests.test_bitparallel import random_pairs
+
+
+def benchmark(count=2000, repeat=3, seed=0):
+    """
+    Time ratio() of many pairs, bit-parallel against difflib.
+
+    Kwargs:
+        count (int): number of pairs.
+        repeat (int): runs per backend, the best one is kept.
+        seed (int): random seed.
+
+    Returns:
+        dict. Best seconds per backend.
+
+    """
+    pairs = random_pairs(count, seed, alphabet='abcdefghijklmnop_')
+    pattern = [s2 for s1, s2 in pairs if len(s2) > 20][0]
+    texts = [s1 for s1, s2 in pairs]
+
+    def run(matcher_class):
+        for s1, s2 in pairs:
+            matcher_class(None, s1, s2).ratio()
+
+    def run_reused(matcher_class):
+        matcher = matcher_class(None, '', pattern)
+        for text in texts:
+            matcher.set_seq1(text)
+            matcher.ratio()
+
+    timings = {
+        'difflib': min(timeit.repeat(
+            lambda: run(difflib.SequenceMatcher), number=1, repeat=repeat)),
+        'bitparallel': min(timeit.repeat(
+            lambda: run(bitparallel.BitParallelMatcher), number=1,
+            repeat=repeat)),
+        'difflib, one seq2': min(timeit.repeat(
+            lambda: run_reused(difflib.SequenceMatcher),
+            number=1, repeat=repeat)),
+        'bitparallel, one seq2': min(timeit.repeat(
+            lambda: run_reused(bitparallel.BitParallelMatcher),
+            number=1, repeat=repeat)),
+    }
+    if bitparallel.numpy is not None:
+        timings['bitparallel, numpy ratios'] = min(timeit.repeat(
+            lambda: bitparallel.ratios(pattern, texts), number=1,
+            repeat=repeat))
+    return timings
+
+
+if __name__ == '__main__':
+    for name, seconds in sorted(benchmark().items()):
+        print('%-28s %.4fs' % (name, seconds))
@@ -0,0 +1,128 @@
+"""
+Bit-parallel edit distances, against dynamic programming references.
+"""
+
+import random
+import difflib
+import unittest
+
+import tests
+import ldtcommon
+from fuzzywuzzy import bitparallel
+
+
+def dynamic_lcs(s1, s2):
+    """Reference, dynamic programming, longest common subsequence."""
+    previous = [0] * (len(s2) + 1)
+    for char in s1:
+        current = [0]
+        for position, other in enumerate(s2):
+            if char == other:
+                current.append(previous[position] + 1)
+            else:
+                current.append(max(previous[position + 1], current[-1]))
+        previous = current
+    return previous[-1]
+
+
+def dynamic_levenshtein(s1, s2):
+    """Reference, dynamic programming, Levenshtein distance."""
+    previous = list(range(len(s2) + 1))
+    for row, char in enumerate(s1):
+        current = [row + 1]
+        for position, other in enumerate(s2):
+            current.append(min(previous[position + 1] + 1,
+                               current[-1] + 1,
+                               previous[position] + (char != other)))
+        previous = current
+    return previous[-1]
+
+
+def random_pairs(count, seed=0, alphabet='abcdefgh_ ', max_length=40):
+    """
+    Get random string pairs.
+
+    Args:
+        count (int): number of pairs.
+
+    Kwargs:
+        seed (int): random seed.
+        alphabet (str): characters of the strings.
+        max_length (int): longest string length.
+
+    Returns:
+        list. (str, str) tuples.
+
+    """
+    rng = random.Random(seed)
+    words = []
+    for index in range(count * 2):
+        length = rng.randint(0, max_length)
+        words.append(''.join(rng.choice(alphabet) for char in range(length)))
+    return list(zip(words[::2], words[1::2]))
+
+
+class BitParallelTestCase(unittest.TestCase):
+    """Bit-parallel results equal the reference implementations."""
+
+    def setUp(self):
+        self.pairs = random_pairs(1000) + [
+            ('', ''), ('a', ''), ('', 'abc'), ('abc', 'abc'),
+            ('x' * 70, 'x' * 65 + 'y' * 10), ('kitten', 'sitting')]
+
+    def test_lcs_length(self):
+        for s1, s2 in self.pairs:
+            self.assertEqual(bitparallel.lcs_length(s1, s2),
+                             dynamic_lcs(s1, s2), (s1, s2))
+
+    def test_distance(self):
+        for s1, s2 in self.pairs:
+            self.assertEqual(bitparallel.distance(s1, s2),
+                             dynamic_levenshtein(s1, s2), (s1, s2))
+        self.assertEqual(bitparallel.distance('kitten', 'sitting'), 3)
+
+    def test_lcs_lengths(self):
+        texts = [s1 for s1, s2 in self.pairs]
+        for pattern in ('', 'ab', 'abcdefgh_ ' * 6, 'abcdefgh' * 9):
+            self.assertEqual(
+                list(bitparallel.lcs_lengths(pattern, texts)),
+                [bitparallel.lcs_length(text, pattern) for text in texts],
+                pattern)
+
+    def test_ratio(self):
+        """
+        The ratio equals difflib ratio when difflib matching blocks add up
+        to a longest common subsequence. Elsewhere difflib finds fewer
+        matches, and its ratio is lower.
+
+        """
+        agree = 0
+        for s1, s2 in self.pairs:
+            lcs = dynamic_lcs(s1, s2)
+            matcher = bitparallel.BitParallelMatcher(None, s1, s2)
+            sequence_matcher = difflib.SequenceMatcher(None, s1, s2,
+                                                       autojunk=False)
+            matches = sum(block[2] for block in
+                          sequence_matcher.get_matching_blocks())
+            self.assertLessEqual(matches, lcs, (s1, s2))
+            if matches == lcs:
+                agree += 1
+                self.assertEqual(matcher.ratio(), sequence_matcher.ratio(),
+                                 (s1, s2))
+            else:
+                self.assertGreater(matcher.ratio(), sequence_matcher.ratio(),
+                                   (s1, s2))
+        self.assertGreater(agree, 0)
+        self.assertEqual(bitparallel.ratio('', ''), 1.0)
+
+    def test_ratios(self):
+        texts = [s1 for s1, s2 in self.pairs]
+        pattern = 'abcdefgh_ ' * 3
+        self.assertEqual(
+            list(bitparallel.ratios(pattern,
+                                    bitparallel.EncodedTexts(texts))),
+            [bitparallel.ratio(text, pattern) for text in texts])
+
+
+if __name__ == '__main__':
+    unittest.main()
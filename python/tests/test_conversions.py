@@ -0,0 +1,170 @@
+"""
+Texture conversions, against a stand-in txmake on the PATH.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import tests
+import ldtprman
+from ldtprman.converters import ConversionJob, TxMakeConverter
+from ldtprman.jobqueue import ConversionQueue
+
+#: Stand-in txmake, copies the source to the target. Fails "broken"
+#: sources, "flaky" ones only on their first run, and takes a second on
+#: "slow" ones. Each run records how many runs were active when it started,
+#: in the STAND_IN_TXMAKE_RUNS folder.
+TXMAKE = '''\
+import os
+import sys
+import time
+import shutil
+
+source, target = sys.argv[-2:]
+runs = os.environ['STAND_IN_TXMAKE_RUNS']
+marker = os.path.join(runs, 'running', str(os.getpid()))
+open(marker, 'w').close()
+active = len(os.listdir(os.path.join(runs, 'running')))
+log = os.open(os.path.join(runs, 'active.log'),
+              os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+os.write(log, ('%d\\n' % active).encode('ascii'))
+os.close(log)
+try:
+    time.sleep(1.0 if 'slow' in source else 0.2)
+    if 'broken' in source:
+        sys.stderr.write('txmake: can not read %s\\n' % source)
+        sys.exit(1)
+    flaky = os.path.join(runs, os.path.basename(source) + '.flaky')
+    if 'flaky' in source and not os.path.exists(flaky):
+        open(flaky, 'w').close()
+        sys.stderr.write('txmake: license not available\\n')
+        sys.exit(1)
+    shutil.copyfile(source, target)
+finally:
+    os.remove(marker)
+'''
+
+
+class TxMakeStandIn(unittest.TestCase):
+    """
+    Puts a stand-in txmake script first on the PATH, and creates a
+    textures folder, with a source per name in source_names.
+
+    """
+
+    source_names = ('wood', 'metal', 'slow', 'broken', 'rust', 'paint')
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix='ldtprman_')
+        self.runs = os.path.join(self.folder, 'runs')
+        os.makedirs(os.path.join(self.runs, 'running'))
+        bin_folder = os.path.join(self.folder, 'bin')
+        os.makedirs(bin_folder)
+        tests.write_script(
+            os.path.join(bin_folder, ldtprman.TXMAKE_EXEC), TXMAKE)
+        self.environ = dict(os.environ)
+        os.environ['PATH'] = bin_folder + os.pathsep + os.environ['PATH']
+        os.environ['STAND_IN_TXMAKE_RUNS'] = self.runs
+        self.textures = os.path.join(self.folder, 'textures')
+        os.makedirs(self.textures)
+        self.sources = []
+        for name in self.source_names:
+            file_path = os.path.join(self.textures, '%s.png' % name)
+            with open(file_path, 'w') as handle:
+                handle.write(name)
+            self.sources.append(file_path)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def get_active_runs(self):
+        """Get the active runs count, seen by each txmake run."""
+        with open(os.path.join(self.runs, 'active.log')) as handle:
+            return [int(line) for line in handle.read().split()]
+
+
+class TxMakeStandInTestCase(TxMakeStandIn):
+    """Conversions run by a stand-in txmake script, found on the PATH."""
+
+    workers = 2
+
+    def check_result(self, result):
+        """Check the result of a source, by its name."""
+        name = os.path.splitext(os.path.basename(result.source))[0]
+        self.assertEqual(result.target,
+                         os.path.join(self.textures, '%s.tex' % name))
+        if name == 'broken':
+            self.assertEqual(result.returncode, 1)
+            self.assertFalse(result.succeeded)
+            self.assertIn('txmake: can not read %s' % result.source,
+                          result.stderr)
+            self.assertFalse(os.path.exists(result.target))
+            return
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue(result.succeeded)
+        self.assertEqual(result.stderr, '')
+        if name == 'slow':
+            self.assertGreaterEqual(result.duration, 1.0)
+        else:
+            self.assertGreaterEqual(result.duration, 0.2)
+            self.assertLess(result.duration, 1.0)
+        with open(result.target) as handle:
+            self.assertEqual(handle.read(), name)
+
+    def test_run_queue(self):
+        queue = ConversionQueue(retries=1, retry_delay=0.1)
+        try:
+            queue.submit([ConversionJob(source,
+                                        os.path.splitext(source)[0] + '.tex',
+                                        ldtprman.TXMAKE_ARGS)
+                          for source in self.sources])
+            finished = []
+            results = ldtprman.run_queue(queue, workers=self.workers,
+                                         callback=finished.append)
+            failed = queue.failed()
+        finally:
+            queue.close()
+        self.assertEqual(sorted(results), sorted(self.sources))
+        for result in results.values():
+            self.check_result(result)
+        # Called once per job, the retried one only once it is out of retries
+        self.assertEqual(sorted(result.source for result in finished),
+                         sorted(self.sources))
+        self.assertEqual([source for source, error in failed],
+                         [os.path.join(self.textures, 'broken.png')])
+        # Every source converted once, the broken one retried once
+        active = self.get_active_runs()
+        self.assertEqual(len(active), len(self.sources) + 1)
+        self.assertEqual(max(active), self.workers)
+
+    def test_convert_to_tx(self):
+        sources = [source for source in self.sources if 'broken' not in source]
+        results = ldtprman.convert_to_tx(sources, workers=self.workers,
+                                         converter=TxMakeConverter(),
+                                         precheck=False)
+        self.assertEqual([result.source for result in results], sources)
+        for result in results:
+            self.check_result(result)
+            self.assertFalse(result.skipped)
+        self.assertLessEqual(max(self.get_active_runs()), self.workers)
+        # Up to date, nothing is converted again
+        results = ldtprman.convert_to_tx(sources, workers=self.workers,
+                                         precheck=False)
+        self.assertTrue(all(result.skipped for result in results))
+        self.assertEqual(len(self.get_active_runs()), len(sources))
+
+    def test_missing_txmake(self):
+        os.environ['PATH'] = self.environ.get('PATH', '')
+        converter = TxMakeConverter(executable='ldt_missing_txmake')
+        result, = converter.convert([ConversionJob(
+            self.sources[0], os.path.join(self.textures, 'wood.tex'), [])])
+        self.assertIsNone(result.returncode)
+        self.assertFalse(result.succeeded)
+
+
+if __name__ == '__main__':
+    unittest.main()
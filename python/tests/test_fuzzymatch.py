@@ -0,0 +1,54 @@
+"""
+Batched fuzzy matching scores, against the fuzzywuzzy scorers.
+"""
+
+import random
+import unittest
+
+import tests
+import ldtcommon
+from fuzzywuzzy import fuzz
+from ldtutils import fuzzymatch
+
+#: Channel name words, shared between the queries and the choices
+WORDS = ('base', 'color', 'diffuse', 'specular', 'roughness', 'metallic',
+         'normal', 'bump', 'height', 'emission', 'coat', 'sheen', 'Base',
+         'COLOR', 'spec2', 'a', 'ab')
+
+
+class CdistTestCase(unittest.TestCase):
+    """cdist scores each pair as the scorer does."""
+
+    def setUp(self):
+        rng = random.Random(0)
+        separators = (' ', '_', '.', '  ')
+        self.queries = ['', 'base', 'base_color', 'color base', '_ _']
+        self.choices = ['', 'base', 'Base Color', 'base_color_base']
+        for strings, count in ((self.queries, 120), (self.choices, 40)):
+            for index in range(count):
+                strings.append(rng.choice(separators).join(
+                    rng.choice(WORDS) for word in range(rng.randint(1, 4))))
+
+    def check_scores(self, scorer, score_cutoff):
+        """Check cdist against the scorer, on every pair."""
+        scores = fuzzymatch.cdist(self.queries, self.choices, scorer=scorer,
+                                  score_cutoff=score_cutoff)
+        for row, query in zip(scores, self.queries):
+            for score, choice in zip(row, self.choices):
+                expected = scorer(query, choice)
+                if expected < score_cutoff:
+                    expected = 0
+                self.assertEqual(score, expected, (query, choice))
+
+    def test_token_set_ratio(self):
+        for score_cutoff in (0, 50, 80, 100):
+            self.check_scores(fuzz.token_set_ratio, score_cutoff)
+
+    def test_scorers(self):
+        for scorer in (fuzz.ratio, fuzz.QRatio, fuzz.token_sort_ratio):
+            for score_cutoff in (0, 80):
+                self.check_scores(scorer, score_cutoff)
+
+
+if __name__ == '__main__':
+    unittest.main()
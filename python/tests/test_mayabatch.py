@@ -0,0 +1,95 @@
+"""
+Headless maya batch jobs, run by a stand-in mayapy.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import tests
+from ldtutils import mayabatch
+
+#: Stand-in mayapy, saves the job settings embedded in the script as the
+#: scene. Fails "broken" alembics, and hangs on "hung" ones.
+MAYAPY = '''\
+import sys
+import ast
+import json
+import time
+
+source = open(sys.argv[1]).read()
+line = [line for line in source.splitlines()
+        if line.startswith('JOB = json.loads(')][0]
+job = json.loads(ast.literal_eval(line[len('JOB = json.loads('):-1]))
+print('Assembling %s' % job['alembic'])
+sys.stdout.flush()
+if 'hung' in job['alembic']:
+    time.sleep(3600)
+if 'broken' in job['alembic']:
+    sys.stderr.write('Could not import %s\\n' % job['alembic'])
+    sys.exit(1)
+with open(job['scene'], 'w') as handle:
+    json.dump(job, handle)
+'''
+
+
+class MayaBatchTestCase(unittest.TestCase):
+    """Jobs written, run and reported end to end."""
+
+    timeout = 5.0
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix='mayabatch_')
+        self.mayapy = os.path.join(self.folder, 'mayapy')
+        tests.write_script(self.mayapy, MAYAPY)
+        self.textures = os.path.join(self.folder, 'textures')
+        os.makedirs(self.textures)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_run_jobs(self):
+        mapping = dict(
+            (os.path.join(self.folder, 'abc', '%s.abc' % name), self.textures)
+            for name in ('cabin', 'broken', 'hung'))
+        jobs = mayabatch.create_jobs(
+            mapping, output_folder=os.path.join(self.folder, 'out'),
+            log_folder=os.path.join(self.folder, 'logs'))
+        finished = []
+        mayabatch.run_jobs(jobs, workers=len(jobs), timeout=self.timeout,
+                           mayapy=self.mayapy, callback=finished.append)
+        self.assertEqual(set(finished), set(jobs))
+        jobs = dict((os.path.basename(job.alembic), job) for job in jobs)
+
+        cabin = jobs['cabin.abc']
+        self.assertTrue(cabin.succeeded, cabin.result)
+        self.assertEqual(cabin.scene, os.path.join(
+            self.folder, 'out', 'cabin%s.mb' % mayabatch.SCENE_SUFFIX))
+        # The job settings reach the mayapy script
+        with open(cabin.scene) as handle:
+            self.assertEqual(json.load(handle), cabin.to_dict())
+
+        broken = jobs['broken.abc']
+        self.assertFalse(broken.succeeded)
+        self.assertEqual(broken.result.returncode, 1)
+        self.assertFalse(broken.result.timed_out)
+
+        hung = jobs['hung.abc']
+        self.assertFalse(hung.succeeded)
+        self.assertTrue(hung.result.timed_out)
+        self.assertGreaterEqual(hung.result.duration, self.timeout)
+
+        for job in jobs.values():
+            with open(job.log) as handle:
+                self.assertIn('Assembling %s' % job.alembic, handle.read())
+        with open(broken.log) as handle:
+            self.assertIn('Could not import %s' % broken.alembic,
+                          handle.read())
+        for job in (broken, hung):
+            self.assertFalse(os.path.exists(job.scene))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+"""
+Shared conversion queues, run by many worker processes.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+import tests
+import ldtprman
+from ldtprman.converters import ConversionJob, TxMakeConverter
+from ldtprman.sharedqueue import SharedQueue, PENDING, RUNNING, DONE, FAILED
+from tests.test_conversions import TxMakeStandIn
+
+
+class SharedQueueTestCase(unittest.TestCase):
+    """Claims, reclaims and releases of a single process."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix='ldtqueue_')
+        self.queue = SharedQueue(self.folder, retries=1, retry_delay=0.0,
+                                 timeout=0.5)
+        self.other = SharedQueue(self.folder, retries=1, timeout=0.5)
+        self.other.owner = 'other:1'
+        self.queue.submit([ConversionJob('/textures/%s.png' % name,
+                                         '/textures/%s.tex' % name, [])
+                           for name in ('wood', 'metal', 'rust')])
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def get_job_ids(self, state):
+        """Get the job ids in a state."""
+        return [job_id for job_id, job in self.queue.jobs(state)]
+
+    def test_reclaim_counts_attempts(self):
+        (job_id, job), = self.queue.claim()
+        time.sleep(0.6)
+        self.assertEqual(self.other.reclaim(), 1)
+        self.assertIn(job_id, self.get_job_ids(PENDING))
+        claimed = dict(self.other.claim(3))
+        self.assertEqual(claimed[job_id]['attempts'], 1)
+        self.assertIn('Claim of %s lost' % self.queue.owner,
+                      claimed[job_id]['error'])
+        # Out of retries on the second stale claim
+        time.sleep(0.6)
+        self.assertEqual(self.queue.reclaim(), 3)
+        self.assertEqual(self.get_job_ids(FAILED), [job_id])
+        self.assertEqual(len(self.get_job_ids(PENDING)), 2)
+
+    def test_release_of_a_reclaimed_job(self):
+        (job_id, job), = self.queue.claim()
+        time.sleep(0.6)
+        self.other.reclaim()
+        claimed = dict(self.other.claim(3))
+        # The stale worker finishing does not take the new claim over
+        self.queue.done(job_id, job, [])
+        self.assertEqual(self.get_job_ids(DONE), [])
+        self.assertEqual(sorted(self.get_job_ids(RUNNING)), sorted(claimed))
+        self.other.done(job_id, claimed[job_id], [])
+        self.assertEqual(self.get_job_ids(DONE), [job_id])
+        self.assertNotIn(job_id, self.get_job_ids(RUNNING))
+
+    def test_claim_finds_new_jobs(self):
+        self.assertEqual(len(self.queue.claim(3)), 3)
+        self.other.submit([ConversionJob('/textures/paint.png',
+                                         '/textures/paint.tex', [])])
+        (job_id, job), = self.queue.claim(3)
+        self.assertEqual(job['source'], '/textures/paint.png')
+
+    def test_progress(self):
+        (job_id, job), = self.queue.claim()
+        self.assertTrue(self.queue.fail(job_id, job, 'failed'))
+        progress = self.queue.progress()
+        self.assertEqual((progress[PENDING], progress[RUNNING]), (3, 0))
+        self.assertFalse(progress['finished'])
+        for job_id, job in self.queue.claim(3):
+            self.queue.done(job_id, job, [])
+        progress = self.queue.progress()
+        self.assertTrue(progress['finished'])
+        self.assertEqual(progress[DONE], 3)
+
+
+class SharedWorkersTestCase(TxMakeStandIn):
+    """Two worker processes converting the jobs of one shared queue."""
+
+    source_names = tuple('texture%02d' % index for index in range(10)) + (
+        'flaky', 'stolen')
+    timeout = 1.5
+
+    def run_workers(self, queue_folder, count=2, limit=120.0):
+        """Run worker processes until they finish, return their events."""
+        environ = dict(os.environ)
+        environ['PYTHONPATH'] = tests.PYTHON_FOLDER
+        workers = []
+        for index in range(count):
+            output = tempfile.TemporaryFile()
+            workers.append((subprocess.Popen(
+                [sys.executable, '-m', 'ldtprman', '--shared', queue_folder,
+                 '--work', '--workers', '2', '--timeout', str(self.timeout)],
+                stdout=output, env=environ), output))
+        deadline = time.time() + limit
+        while any(worker.poll() is None for worker, output in workers):
+            if time.time() > deadline:
+                for worker, output in workers:
+                    if worker.poll() is None:
+                        worker.kill()
+                self.fail('Workers did not finish in %s seconds' % limit)
+            time.sleep(0.1)
+        events = []
+        for worker, output in workers:
+            self.assertEqual(worker.returncode, 0)
+            output.seek(0)
+            events.append([json.loads(line) for line in output.read().decode(
+                'utf-8').splitlines()])
+            output.close()
+        return [worker.pid for worker, output in workers], events
+
+    def test_workers(self):
+        queue_folder = os.path.join(self.folder, 'queue')
+        stolen = os.path.join(self.textures, 'stolen.png')
+        # Queued first, to be claimed by a worker that dies, without
+        # heartbeats
+        for sources in ([stolen], [source for source in self.sources
+                                   if source != stolen]):
+            self.assertEqual(ldtprman.submit_shared(
+                sources, queue_folder, converter=TxMakeConverter(),
+                precheck=False), len(sources))
+        dead = SharedQueue(queue_folder)
+        dead.owner = 'dead:0'
+        (job_id, job), = dead.claim()
+        self.assertEqual(job['source'], stolen)
+        pids, events = self.run_workers(queue_folder)
+
+        queue = SharedQueue(queue_folder)
+        progress = queue.progress()
+        self.assertTrue(progress['finished'])
+        self.assertEqual(progress[DONE], len(self.sources))
+        self.assertEqual(progress[FAILED], 0)
+        jobs = dict((job['source'], job) for job_id, job in queue.jobs(DONE))
+        self.assertEqual(sorted(jobs), sorted(self.sources))
+        owners = set(job['owner'].rsplit(':', 1)[1] for job in jobs.values())
+        self.assertEqual(owners, set(str(pid) for pid in pids))
+        # Reclaimed, and retried after a failure
+        self.assertEqual(jobs[stolen]['attempts'], 1)
+        self.assertIn('Claim of dead:0 lost', jobs[stolen]['error'])
+        flaky = os.path.join(self.textures, 'flaky.png')
+        self.assertEqual(jobs[flaky]['attempts'], 1)
+        self.assertIn('license not available', jobs[flaky]['error'])
+        # Every file is reported once, by the worker that converted it
+        reported = [event['source'] for worker_events in events
+                    for event in worker_events if event['event'] == 'file']
+        self.assertEqual(sorted(reported), sorted(self.sources))
+        for worker_events in events:
+            self.assertEqual(worker_events[-1]['event'], 'worker_done')
+            self.assertEqual(worker_events[-1]['failed'], 0)
+        for source in self.sources:
+            with open(os.path.splitext(source)[0] + '.tex') as handle:
+                self.assertEqual(handle.read(), os.path.splitext(
+                    os.path.basename(source))[0])
+        results = ldtprman.finish_shared(queue_folder)
+        self.assertEqual(sorted(result.source for result in results),
+                         sorted(self.sources))
+        self.assertTrue(all(result.succeeded for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()